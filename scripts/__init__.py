@@ -1,2 +1,3 @@
 """会計シミュレーションゲーム"""
+from . import gamelog
 from .player import GameMaster, Player
@@ -0,0 +1,334 @@
+"""決算済みの仕訳をディスク上のセグメントに封印するアーカイブ"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+
+from scripts import journal
+
+# 同時にメモリマップしておくセグメントの上限(マップごとにファイル記述子を1つ使う)
+MAX_OPEN_SEGMENTS = 64
+_open_segments = OrderedDict()  # id(セグメント) -> セグメント(最近読んだものが末尾)
+
+
+def _encode_timestamp(timestamp):
+    if isinstance(timestamp, datetime):
+        return ["datetime", timestamp.isoformat()]
+    if isinstance(timestamp, date):
+        return ["date", timestamp.isoformat()]
+    return ["str", str(timestamp)]
+
+
+def _decode_timestamp(value):
+    kind, text = value
+    if kind == "datetime":
+        return datetime.fromisoformat(text)
+    if kind == "date":
+        return date.fromisoformat(text)
+    return text
+
+
+class ArchiveSegment:
+    """
+    1期分の仕訳を封印した読み取り専用のセグメント
+
+    ファイル構成:
+        MAGIC(8) | ヘッダー長(uint64) | ヘッダー(JSON) | 8バイト境界までの詰め物 | int64列
+    int64列は ヘッダーの "columns" に記載した順に並ぶ:
+        tx_offset / tx_description / tx_timestamp (取引ごと)
+        account / amount / date (仕訳行ごと)
+        description_offset (摘要テーブルの区切り)
+    摘要テーブルはUTF-8のバイト列として最後に置き、読むときに必要な分だけデコードする。
+    ヘッダーには期間名、取引番号の範囲、日付の範囲などの期間インデックスを持つ。
+    """
+    MAGIC = b"ACSGSEG1"
+    TX_COLUMNS = ("tx_offset", "tx_description", "tx_timestamp")
+    POSTING_COLUMNS = ("account", "amount", "date")
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            magic = file.read(len(self.MAGIC))
+            if magic != self.MAGIC:
+                raise ValueError(f"アーカイブセグメントではありません: {path}")
+            (header_length,) = struct.unpack("<Q", file.read(8))
+            header = json.loads(file.read(header_length).decode("UTF-8"))
+        self.period = header["period"]
+        self.first_tx = header["first_tx"]
+        self.tx_count = header["tx_count"]
+        self.posting_count = header["posting_count"]
+        self.first_date = header["first_date"]
+        self.last_date = header["last_date"]
+        self._account_names = header["account_names"]
+        self._timestamps = [_decode_timestamp(value) for value in header["timestamps"]]
+        self._float_amounts = {int(row): amount for row, amount in header["float_amounts"].items()}
+        self._data_offset = header["data_offset"]
+        self._description_count = header["description_count"]
+        self._mmap = None
+        self._columns = None
+
+    def __len__(self):
+        return self.tx_count
+
+    def __getstate__(self):
+        # メモリマップは複製・転送できないため外す(読むときに再びマップされる)
+        state = self.__dict__.copy()
+        state["_mmap"] = None
+        state["_columns"] = None
+        return state
+
+    @property
+    def last_tx(self):
+        """このセグメントの次の取引番号"""
+        return self.first_tx + self.tx_count
+
+    @classmethod
+    def write(cls, path, entries, period, first_tx=0) -> "ArchiveSegment":
+        """
+        取引の列をセグメントファイルに書き出す
+
+        :param entries: {"timestamp", "updates", "description"} の列
+        :param period: 期間名
+        :param first_tx: 先頭の取引の通し番号
+        """
+        account_ids, account_names = {}, []
+        timestamp_ids, timestamps = {}, []
+        description_ids, descriptions = {}, []
+        columns = {name: array("q") for name in cls.TX_COLUMNS + cls.POSTING_COLUMNS}
+        float_amounts = {}
+        first_date = last_date = None
+
+        for entry in entries:
+            timestamp = entry["timestamp"]
+            key = (type(timestamp), timestamp)
+            if key not in timestamp_ids:
+                timestamp_ids[key] = len(timestamps)
+                timestamps.append(_encode_timestamp(timestamp))
+            description = str(entry["description"])
+            if description not in description_ids:
+                description_ids[description] = len(descriptions)
+                descriptions.append(description)
+            day = journal.date_key(timestamp) or 0
+            if day:
+                first_date = day if first_date is None else min(first_date, day)
+                last_date = day if last_date is None else max(last_date, day)
+
+            columns["tx_offset"].append(len(columns["amount"]))
+            columns["tx_description"].append(description_ids[description])
+            columns["tx_timestamp"].append(timestamp_ids[key])
+            for name, amount in entry["updates"]:
+                if name not in account_ids:
+                    account_ids[name] = len(account_names)
+                    account_names.append(name)
+                row = len(columns["amount"])
+                try:
+                    columns["amount"].append(amount)
+                except TypeError:
+                    columns["amount"].append(int(amount))
+                    float_amounts[str(row)] = amount
+                columns["account"].append(account_ids[name])
+                columns["date"].append(day)
+
+        encoded = [description.encode("UTF-8") for description in descriptions]
+        description_offset = array("q", [0])
+        for data in encoded:
+            description_offset.append(description_offset[-1] + len(data))
+
+        ordered = [columns[name] for name in cls.TX_COLUMNS + cls.POSTING_COLUMNS] + [description_offset]
+        header = {
+            "period": period,
+            "first_tx": first_tx,
+            "tx_count": len(columns["tx_offset"]),
+            "posting_count": len(columns["amount"]),
+            "first_date": first_date,
+            "last_date": last_date,
+            "account_names": account_names,
+            "timestamps": timestamps,
+            "float_amounts": float_amounts,
+            "description_count": len(descriptions),
+            "columns": list(cls.TX_COLUMNS + cls.POSTING_COLUMNS) + ["description_offset"],
+            "data_offset": 0
+        }
+        # data_offsetの桁数でヘッダー長が変わるため、収まるまで計算し直す
+        while True:
+            header_bytes = json.dumps(header, ensure_ascii=False).encode("UTF-8")
+            data_offset = len(cls.MAGIC) + 8 + len(header_bytes)
+            data_offset += -data_offset % 8
+            if header["data_offset"] == data_offset:
+                break
+            header["data_offset"] = data_offset
+
+        with open(path, "wb") as file:
+            file.write(cls.MAGIC)
+            file.write(struct.pack("<Q", len(header_bytes)))
+            file.write(header_bytes)
+            file.write(bytes(data_offset - file.tell()))
+            for column in ordered:
+                column.tofile(file)
+            for data in encoded:
+                file.write(data)
+        return cls(path)
+
+    def _map(self):
+        """
+        必要になった時点でファイルをメモリマップする
+        マップしているセグメントが MAX_OPEN_SEGMENTS を超えたら、最も長く読まれていないものを解放する。
+        """
+        if self._columns is not None:
+            _open_segments.move_to_end(id(self))
+            return self._columns
+        while len(_open_segments) >= MAX_OPEN_SEGMENTS:
+            _, oldest = _open_segments.popitem(last=False)
+            oldest.release()
+        with open(self.path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        lengths = [self.tx_count] * len(self.TX_COLUMNS) + [self.posting_count] * len(self.POSTING_COLUMNS)
+        lengths.append(self._description_count + 1)
+        columns = {}
+        offset = self._data_offset
+        for name, length in zip(self.TX_COLUMNS + self.POSTING_COLUMNS + ("description_offset",), lengths):
+            columns[name] = view[offset:offset + 8 * length].cast("q")
+            offset += 8 * length
+        columns["descriptions"] = view[offset:]
+        self._columns = columns
+        _open_segments[id(self)] = self
+        return columns
+
+    def release(self):
+        """メモリマップを解放(次のアクセスで再びマップされる)"""
+        _open_segments.pop(id(self), None)
+        if self._columns is not None:
+            for column in self._columns.values():
+                column.release()
+            self._columns = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _description(self, index):
+        columns = self._map()
+        start, end = columns["description_offset"][index], columns["description_offset"][index + 1]
+        return bytes(columns["descriptions"][start:end]).decode("UTF-8")
+
+    def entry(self, tx_id):
+        """取引1件を従来形式のdictで返す(tx_idはセグメント内の番号)"""
+        columns = self._map()
+        start = columns["tx_offset"][tx_id]
+        end = columns["tx_offset"][tx_id + 1] if tx_id + 1 < self.tx_count else self.posting_count
+        names = self._account_names
+        account, amount = columns["account"], columns["amount"]
+        return {
+            "updates": [(names[account[row]], self._float_amounts.get(row, amount[row]))
+                        for row in range(start, end)],
+            "description": self._description(columns["tx_description"][tx_id]),
+            "timestamp": self._timestamps[columns["tx_timestamp"][tx_id]]
+        }
+
+    def __iter__(self):
+        for tx_id in range(self.tx_count):
+            yield self.entry(tx_id)
+
+
+class JournalArchive:
+    """
+    Ledger 1つ分の封印済みセグメントを管理
+
+    決算ごとの仕訳はいったん列指向の仕訳帳(ColumnarJournal)に溜め、segment_size 件以上になったら
+    1つのセグメントに書き出す(毎回の決算でファイルを作らない)。書き出す前の取引も通し番号で読める。
+    """
+    SEGMENT_SIZE = 4096
+
+    def __init__(self, directory, prefix, chart, segment_size=SEGMENT_SIZE):
+        """
+        :param directory: セグメントを置くディレクトリ
+        :param prefix: セグメントのファイル名の接頭辞(Ledgerごとに一意)
+        :param chart: 勘定科目表(書き出す前の取引を勘定番号で保持するのに使う)
+        :param segment_size: 1つのセグメントにまとめる取引の件数の目安
+        """
+        if segment_size < 1:
+            raise ValueError("セグメントの件数は1以上を指定してください。")
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_size = segment_size
+        self.segments = []
+        self._first_txs = []  # セグメントごとの先頭の取引番号(二分探索用)
+        self._pending = journal.ColumnarJournal(chart)  # まだ書き出していない取引
+        self._pending_periods = []  # 書き出していない決算期間の名前
+        os.makedirs(directory, exist_ok=True)
+
+    def rebind(self, chart):
+        """勘定科目表を差し替える(勘定番号は元の表と同じであること)"""
+        self._pending.rebind(chart)
+
+    def __len__(self):
+        return self._pending_start + len(self._pending)
+
+    @property
+    def _pending_start(self):
+        """書き出していない取引の先頭の通し番号"""
+        return self.segments[-1].last_tx if self.segments else 0
+
+    def seal(self, entries, period):
+        """
+        1期分の取引を封印する(segment_size 件たまったらセグメントに書き出す)
+
+        :return: 書き出したセグメント(まだ書き出していなければNone)
+        """
+        for entry in entries:
+            self._pending.append(entry["updates"], entry["description"], entry["timestamp"])
+        self._pending_periods.append(period)
+        if len(self._pending) >= self.segment_size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """書き出していない取引をセグメントに書き出す(なければNone)"""
+        if not len(self._pending):
+            return None
+        periods = self._pending_periods
+        period = periods[0] if len(periods) == 1 else f"{periods[0]}~{periods[-1]}"
+        path = os.path.join(self.directory, f"{self.prefix}_{len(self.segments):05d}.seg")
+        first_tx = self._pending_start
+        segment = ArchiveSegment.write(path, self._pending, period, first_tx)
+        self.segments.append(segment)
+        self._first_txs.append(first_tx)
+        self._pending.clear()
+        self._pending_periods = []
+        return segment
+
+    def freeze(self) -> list:
+        """以後変更されないもの(書き出したセグメントと、書き出していない取引)"""
+        return self.segments + list(self._pending.freeze())
+
+    def entry(self, tx_index):
+        """通し番号で取引1件を取得"""
+        pending_start = self._pending_start
+        if tx_index >= pending_start:
+            if tx_index - pending_start >= len(self._pending):
+                raise IndexError(f"取引 {tx_index} はアーカイブに存在しません。")
+            return self._pending.entry(tx_index - pending_start)
+        position = bisect_right(self._first_txs, tx_index) - 1
+        if position < 0:
+            raise IndexError(f"取引 {tx_index} はアーカイブに存在しません。")
+        segment = self.segments[position]
+        return segment.entry(tx_index - segment.first_tx)
+
+    def iter_from(self, tx_index):
+        """通し番号 tx_index 以降の取引を順に返す"""
+        for segment in self.segments:
+            if segment.last_tx <= tx_index:
+                continue
+            for local in range(max(0, tx_index - segment.first_tx), segment.tx_count):
+                yield segment.entry(local)
+        for local in range(max(0, tx_index - self._pending_start), len(self._pending)):
+            yield self._pending.entry(local)
+
+    def __iter__(self):
+        for segment in self.segments:
+            yield from segment
+        yield from self._pending
@@ -1,19 +1,82 @@
 """アセット関連の設定ファイル"""
-import random
-from datetime import datetime
+import logging
+from abc import ABCMeta
 
-class Asset:
+import numpy as np
+
+from scripts.cost_layers import FifoCostLayers
+from scripts.movement_log import MovementLog
+
+logger = logging.getLogger(__name__)
+
+class Asset(metaclass=ABCMeta):
     def __init__(self, name, value):
         """基本資産クラス"""
         self.name = name
         self.value = value # 帳簿価額
         self.market_value = value  # 市場価格を初期設定
 
-    def update_market_value(self):
-        """市場価格をランダムに更新"""
+    def update_market_value(self, rng=None):
+        """
+        市場価格をランダムに更新
+
+        :param rng: 乱数のGenerator(省略時は資産の rng、なければ新しいGenerator)
+        """
+        rng = rng or getattr(self, "rng", None) or np.random.default_rng()
         mean = self.value
         std_dev = mean / 10
-        self.market_value = max(0, int(random.gauss(mean, std_dev)))
+        self.set_market_value(max(0, int(rng.normal(mean, std_dev))))
+
+    def set_market_value(self, market_value):
+        """市場価格を設定(MarketEngineからの書き戻し)"""
+        self.market_value = market_value
+
+def declining_annual_factor(useful_life):
+    """
+    200%定率法の1年あたりの残存率 1 - 2/耐用年数(耐用年数の配列も渡せる)
+    耐用年数2年以下では0以下になるため0とし、1日目で残存価額まで償却する。
+    """
+    return np.maximum(1 - 2 / np.asarray(useful_life, dtype=np.float64), 0.0)
+
+
+class DepreciationSchedule:
+    """
+    減価償却の償却表
+    取得からの経過日数に対する減価償却累計額を閉形式で求めるため、
+    どの日付の累計額も O(1) で引け、時間の進め方(1日ずつか、まとめてか)によらず同じ値になる。
+        定額法(straight_line):      (取得価額 - 残存価額) × 経過日数 / 耐用日数
+        定率法(accelerated):        取得価額 × (1 - 2/耐用年数)^(経過日数/365) を残存価額で打ち止め(200%定率法を日割り)
+    定率法の1年目の償却額は取得価額 × 2/耐用年数(耐用年数5年なら40%)になる。
+    累計額は1円未満を切り捨てる。
+    """
+    __slots__ = ("method", "acquisition_cost", "salvage_value", "total_days", "annual_factor")
+
+    def __init__(self, method, acquisition_cost, salvage_value, useful_life):
+        self.method = method
+        self.acquisition_cost = acquisition_cost
+        self.salvage_value = salvage_value
+        self.total_days = useful_life * 365             # 耐用日数
+        self.annual_factor = float(declining_annual_factor(useful_life))  # 定率法の1年あたりの残存率
+
+    def cumulative(self, days) -> int:
+        """経過日数 days 時点の減価償却累計額"""
+        if self.method == "straight_line":
+            days = min(days, self.total_days)
+            return int((self.acquisition_cost - self.salvage_value) * days / self.total_days)
+        remaining = max(self.salvage_value, self.acquisition_cost * self.annual_factor ** (days / 365))
+        return int(self.acquisition_cost - remaining)
+
+
+def cumulative_depreciation(declining, acquisition_cost, salvage_value, total_days, annual_factor, days):
+    """
+    DepreciationSchedule.cumulative の配列版(資産ごとの値を並べた配列を受け取る)
+
+    :param declining: 定率法ならTrueの真偽値配列
+    """
+    straight = (acquisition_cost - salvage_value) * np.minimum(days, total_days) / total_days
+    remaining = np.maximum(salvage_value, acquisition_cost * annual_factor ** (days / 365))
+    return np.where(declining, acquisition_cost - remaining, straight).astype(np.int64)
+
 
 class Tangible(Asset):
     METHODS = {"straight_line", "accelerated"}
@@ -44,41 +107,107 @@ class Tangible(Asset):
         self.method = method 
         self.salvage_value = value * salvage_value_ratio # 残存価額
         self.accumulated_depreciation = 0  # 減価償却累計額
+        self.acquisition_cost = value      # 取得価額
+        self.elapsed_days = 0              # 減価償却を適用した日数
         
         if self.method not in self.METHODS :
             raise ValueError("無効な減価償却方法です")
+        self._reset_schedule()
 
     def set_owner(self, owner_name: str):
         """資産の所有者を設定"""
         if self.owner:
             raise ValueError(f"{self.name} はすでに所有者 {self.owner} が登録されています。")
         self.owner = owner_name
-        print(f"{self.name} の所有者が {owner_name} に設定されました。")
+        logger.info("%s の所有者が %s に設定されました。", self.name, owner_name)
         
     def get_owner(self):
         """資産の所有者を取得"""
         return self.owner
+
+    def reset_cost_basis(self, acquisition_cost):
+        """
+        取得価額を付け替え、減価償却を最初からやり直す
+        (売却・除却された資産を別の所有者が取得し直す場合など、前の所有者の累計額を引き継がない)
+        """
+        self.acquisition_cost = acquisition_cost
+        self.value = acquisition_cost
+        self.salvage_value = acquisition_cost * self.salvage_value_ratio
+        self.accumulated_depreciation = 0
+        self.elapsed_days = 0
+        self._reset_schedule()
+
+    def _reset_schedule(self):
+        self.schedule = DepreciationSchedule(self.method, self.acquisition_cost, self.salvage_value, self.useful_life)
+
+    def cumulative_depreciation(self, days=None) -> int:
+        """経過日数 days 時点の減価償却累計額(省略時は現在)"""
+        return self.schedule.cumulative(self.elapsed_days if days is None else days)
     
     def apply_depreciation(self, days: int = 365):
         """
-        減価償却を適用。指定された日数に基づいて減価償却額を計算。
+        減価償却を適用。償却表から経過日数時点の累計額を引き、前回との差額を当期の償却額とする。
 
         :param days: 時間経過の日数（デフォルトは1年=365日）
         :return: 減価償却額
         """
-        if self.method == "straight_line":
-            depreciation_per_day = (self.value - self.salvage_value) / (self.useful_life * 365)
-        elif self.method == "accelarated":
-            depreciation_per_day = ((self.value - self.accumulated_depreciation) * 2) / (self.useful_life * 365)
-        else:
-            raise ValueError("無効な減価償却方法です")
-
-        total_depreciation = int(depreciation_per_day * days)
-        self.accumulated_depreciation += total_depreciation
-        self.value = max(self.salvage_value, self.value - total_depreciation)
-        print(f"{self.name} の減価償却が適用されました: {total_depreciation} 減価償却累計額: {self.accumulated_depreciation} 残存価額: {self.value}")
+        self.elapsed_days += days
+        return self._depreciate_to(self.schedule.cumulative(self.elapsed_days))
+
+    def _depreciate_to(self, accumulated_depreciation):
+        """減価償却累計額を更新し、増えた分(当期の償却額)を返す"""
+        total_depreciation = accumulated_depreciation - self.accumulated_depreciation
+        self.accumulated_depreciation = accumulated_depreciation
+        self.value = self.acquisition_cost - accumulated_depreciation
+        logger.debug("%s の減価償却が適用されました: %s 減価償却累計額: %s 残存価額: %s",
+                     self.name, total_depreciation, accumulated_depreciation, self.value)
         return total_depreciation
 
+
+def apply_depreciation_batch(tangibles, days: int) -> np.ndarray:
+    """
+    複数の有形固定資産の減価償却をまとめて適用
+
+    償却表の値を配列に並べ、全資産の累計額を1回の配列演算で求めてから書き戻す。
+
+    :param tangibles: Tangibleの列
+    :param days: 時間経過の日数
+    :return: 資産ごとの減価償却額(tangiblesと同じ順)
+    """
+    tangibles = list(tangibles)
+    depreciation = np.zeros(len(tangibles), dtype=np.int64)
+    # AssetTable のビューはテーブルの列に対して一括で適用する
+    tables, objects = {}, []
+    for index, tangible in enumerate(tangibles):
+        table = getattr(tangible, "table", None)
+        if table is None:
+            objects.append(index)
+        else:
+            _, indices, rows = tables.setdefault(id(table), (table, [], []))
+            indices.append(index)
+            rows.append(tangible.row)
+    for table, indices, rows in tables.values():
+        depreciation[indices] = table.apply_depreciation(rows, days)
+    if not objects:
+        return depreciation
+
+    # それ以外は償却表の値を配列に並べて計算する
+    schedules = [tangibles[index].schedule for index in objects]
+    count = len(objects)
+    accumulated = cumulative_depreciation(
+        np.fromiter((schedule.method != "straight_line" for schedule in schedules), dtype=bool, count=count),
+        np.fromiter((schedule.acquisition_cost for schedule in schedules), dtype=np.float64, count=count),
+        np.fromiter((schedule.salvage_value for schedule in schedules), dtype=np.float64, count=count),
+        np.fromiter((schedule.total_days for schedule in schedules), dtype=np.float64, count=count),
+        np.fromiter((schedule.annual_factor for schedule in schedules), dtype=np.float64, count=count),
+        np.fromiter((tangibles[index].elapsed_days + days for index in objects), dtype=np.float64, count=count)
+    )
+    for index, value in zip(objects, accumulated.tolist()):
+        tangible = tangibles[index]
+        tangible.elapsed_days += days
+        depreciation[index] = tangible._depreciate_to(value)
+    return depreciation
+
 class Building(Tangible):
     def __init__(self, name, value, owner, address, 
                  useful_life=40, salvage_value_ratio=0, method="straight_line"):
@@ -93,11 +222,15 @@ class Machine(Tangible):
 
 class Inventory(Asset):
     VALUATIONS = ["FIFO", "GAM", "MAM"] # 先入先出法、総平均法、移動平均法
-    def __init__(self, name, quantity, price, valuation):
+    def __init__(self, name, quantity, price, valuation, clock=None, movement_log=None, rng=None):
         """
         棚卸資産クラス
         評価方法　FIFO: 先入先出法　GAM: 総平均法　MAM: 移動平均法
         (個別法は個別にインスタンスを作ればいいのでは？)
+
+        :param clock: 入出庫記録の日時に使うゲーム内時計(GameClock)
+        :param movement_log: 入出庫記録(省略時は全件をメモリに保持するMovementLog)
+        :param rng: 市場売価の乱数に使うGenerator(GameMaster.rng。省略時は新しいGenerator)
         """
         super().__init__(name, value = quantity*price)
         self.quantity = quantity                                    # 現在の数量
@@ -107,27 +240,41 @@ class Inventory(Asset):
         self.market_sales_price = self.sales_price                  # 正味売却単価(予定)
         self.market_sales_value = self.market_sales_price * price   # 正味売却価額(予定)
         self.valuation = valuation                                  # 棚卸資産の評価方法
-        self.transactions = []                                      # 在庫の追加履歴 list({})
+        self.clock = clock                                          # ゲーム内時計
+        self.rng = rng if rng is not None else np.random.default_rng()  # 市場売価の乱数
+        self.transactions = movement_log if movement_log is not None else MovementLog()  # 在庫の入出庫記録
         if valuation not in self.VALUATIONS:
             raise ValueError("正しい評価方法を選択してください")
 
         if self.valuation == "FIFO":
-            # FIFO用のリストデータ構造を初期化
-            self.inventory_data = [{"quantity": quantity, "price": price}]
+            # FIFO用の原価層を初期化
+            self.inventory_data = FifoCostLayers()
+            self.inventory_data.push(quantity, price)
             
         if self.valuation == "GAM":
             # GAM用のデータ構造を初期化
             self.total_quantity = quantity
             self.total_value = quantity * price
     
-    def _record_transaction(self, description):
-        transaction = {
-            "time": datetime.now(),
-            "description": description,
-            "quantity": self.quantity,
-            "value": self.value
-        }
-        self.transactions.append(transaction)
+    def freeze_history(self) -> list:
+        """
+        以後変更されないオブジェクトを返す(GameMaster.fork() で分岐間に共有する)
+        入出庫記録のセグメントと、先入先出法の原価層の埋まったチャンク。
+        """
+        shared = self.transactions.freeze()
+        if self.valuation == "FIFO":
+            shared.extend(self.inventory_data.freeze())
+        return shared
+
+    def start_branch(self):
+        """分岐した側の資産で呼ぶ(入出庫記録の書き出し先を分ける)"""
+        self.transactions.start_branch()
+
+    def _record_transaction(self, kind, quantity=None, price=None, value=None):
+        """入出庫を記録(摘要は読み出し時に作る)"""
+        self.transactions.record(kind, quantity, price, value,
+                                 self.clock.current_date if self.clock else None,
+                                 self.quantity, self.value)
     
     def update_value(self, new_value):
         """簿価の更新"""
@@ -135,20 +282,21 @@ class Inventory(Asset):
         self.price = self.value / self.quantity
 
     def update_market_sales_price(self):
-        """市場売価をランダムに更新"""
+        """市場売価をランダムに更新(乱数はゲームのGeneratorから引く)"""
         mean = self.sales_price  # 売価を基準にする
         std_dev = mean / 10
-        self.market_sales_price = max(0, int(random.gauss(mean, std_dev))) 
-        description = (f"市場売価が更新されました: {self.market_sales_price}")
-        self._record_transaction(description)        
+        self.set_market_sales_price(max(0, int(self.rng.normal(mean, std_dev))))
+
+    def set_market_sales_price(self, price):
+        """市場売価を設定して記録(MarketEngineからの書き戻し)"""
+        self.market_sales_price = price
+        self._record_transaction("market_price", price=self.market_sales_price)
     
     def update_sales_price(self, new_price):
         """売価の更新"""
         old_price = self.sales_price
         self.sales_price = new_price
-        description = (f"売価更新: 旧売価 {old_price}, 新売価 {new_price}, 在庫数量 {self.quantity}, "
-                       f"在庫簿価 {self.value}")
-        self._record_transaction(description)
+        self._record_transaction("sales_price", price=new_price, value=old_price)
     
     def update_initial_value(self):
         """期首簿価の更新(決算の実行時)"""
@@ -161,8 +309,8 @@ class Inventory(Asset):
         self.quantity += quantity
 
         if self.valuation == "FIFO":
-            # FIFOの場合はリストデータに追加
-            self.inventory_data.append({"quantity": quantity, "price": price})
+            # FIFOの場合は原価層に追加
+            self.inventory_data.push(quantity, price)
         elif self.valuation == "MAM":
             # MAMの場合は新しい平均単価を計算
             self.price = self.value / self.quantity
@@ -173,10 +321,9 @@ class Inventory(Asset):
                 
         if self.valuation == "MAM":
             self.price = self.value / self.quantity
-            description= f"商品の追加: {quantity}, 更新原価(MAM): {self.price}"
+            self._record_transaction("add", quantity, price=self.price)
         else:
-            description = f"商品の追加: {quantity}"
-        self._record_transaction(description)
+            self._record_transaction("add", quantity)
         
     def subtract_inventory(self, quantity: int, sales_price = None):
         """棚卸資産の減少"""
@@ -197,35 +344,14 @@ class Inventory(Asset):
         if quantity > self.quantity:
             raise ValueError("在庫不足です。指定された数量を引き出せません。")
 
-        remaining_quantity = quantity
-        total_cost = 0
-
-        # FIFOの順に在庫を減少
-        while remaining_quantity > 0:
-            if not self.inventory_data:
-                raise ValueError("在庫履歴が不足しています。")
-
-            oldest_transaction = self.inventory_data[0]
-            trans_quantity = oldest_transaction["quantity"]
-            trans_price = oldest_transaction["price"]
-
-            if trans_quantity <= remaining_quantity:
-                # このトランザクション全体を消費
-                total_cost += trans_quantity * trans_price
-                remaining_quantity -= trans_quantity
-                self.inventory_data.pop(0)
-            else:
-                # 一部のみ消費
-                total_cost += remaining_quantity * trans_price
-                oldest_transaction["quantity"] -= remaining_quantity
-                remaining_quantity = 0
+        # FIFOの順に在庫を減少(原価層の累計数量から消費先を求める)
+        total_cost = self.inventory_data.pop_cost(quantity)
 
         self.value -= total_cost
         self.quantity -= quantity
 
         # 減少トランザクションを記録
-        description = f"在庫が {quantity} 単位減少しました。総コスト: {total_cost}"
-        self._record_transaction(description)
+        self._record_transaction("subtract", quantity, value=total_cost)
         # print(f"在庫が {quantity} 単位減少しました。総コスト: {total_cost}")
     
     def _subtract_inventory_mam(self, quantity):
@@ -241,8 +367,7 @@ class Inventory(Asset):
         self.quantity -= quantity
 
         # 減少トランザクションを記録
-        description = f"在庫が {quantity} 単位減少しました。平均単価: {average_price}, 総コスト: {total_cost}"
-        self._record_transaction(description)
+        self._record_transaction("subtract", quantity, price=average_price, value=total_cost)
         
     def _subtract_inventory_gam(self, quantity: int):
         """
@@ -263,8 +388,7 @@ class Inventory(Asset):
         self.quantity -= quantity
 
         # 減少トランザクションを記録
-        description = f"在庫が {quantity} 単位減少しました。平均単価: {average_price}, 総コスト: {total_cost}"
-        self._record_transaction(description)
+        self._record_transaction("subtract", quantity, price=average_price, value=total_cost)
         # print(f"在庫が {quantity} 単位減少しました。平均単価: {average_price}, 総コスト: {total_cost}")
         
     def perform_inventory_adjustment(self, loss):
@@ -287,11 +411,12 @@ class Debt:
     """借入金クラス"""
     # リスクフリーレートの設定(将来的にランダムに動くように関数化)
     RFR = 0.01
+    RISK_PREMIUM = 0.05
     def __init__(self, name, bank, value):
         self.name = name
         self.bank = bank
         self.value = value
-        self.risk_premium = 0.05
+        self.risk_premium = self.RISK_PREMIUM
         self.rate = self.RFR + self.risk_premium # 利率
         
     def repay_debt(self, repay_value):
@@ -300,14 +425,13 @@ class Debt:
             raise ValueError("返済額が借入金額を超えています。")
         
         self.value -= repay_value
-        print(f"{self.name} に {repay_value} 返済されました。残高: {self.value}")
-        self.value =- repay_value
+        logger.info("%s に %s 返済されました。残高: %s", self.name, repay_value, self.value)
         
     def add_interest(self, days: int):
         """利息の追加"""
         interest = (self.value * self.rate) * days / 365
         self.value += interest
-        print(f"{self.name} に {days} 日分の利息が追加されました: {interest} 新しい価値: {self.value}")
+        logger.info("%s に %s 日分の利息が追加されました: %s 新しい価値: %s", self.name, days, interest, self.value)
     
 def main():
     # FIFOのテスト
@@ -0,0 +1,284 @@
+"""有形固定資産を列ごとの配列で保持する資産テーブル"""
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from scripts import asset
+
+
+def _number(value):
+    """列から読んだ値を返す(整数値ならintに戻す)"""
+    value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class _Column:
+    """ビューの属性をテーブルの列に対応付けるディスクリプタ"""
+
+    def __init__(self, column):
+        self.column = column
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return _number(view.table.columns[self.column][view.row])
+
+    def __set__(self, view, value):
+        view.table.columns[self.column][view.row] = value
+
+
+class _InternedColumn(_Column):
+    """文字列を重複を除いたテーブルの番号で保持する列(所有者名など)"""
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return view.table.lookup(self.column, view.table.columns[self.column][view.row])
+
+    def __set__(self, view, value):
+        view.table.columns[self.column][view.row] = view.table.intern(self.column, value)
+
+
+class _MethodColumn(_Column):
+    """減価償却方法(番号で保持)"""
+    METHODS = ("straight_line", "accelerated")
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return self.METHODS[view.table.columns[self.column][view.row]]
+
+    def __set__(self, view, value):
+        view.table.columns[self.column][view.row] = self.METHODS.index(value)
+
+
+class TangibleView:
+    """
+    AssetTable の1行を Tangible と同じ属性・メソッドで扱うための薄いビュー
+    状態は全てテーブルの列にあり、ビュー自体はテーブルと行番号だけを持つ。
+    """
+    __slots__ = ("table", "row")
+
+    name = _InternedColumn("name")
+    owner = _InternedColumn("owner")
+    method = _MethodColumn("method")
+    value = _Column("value")
+    market_value = _Column("market_value")
+    acquisition_cost = _Column("acquisition_cost")
+    salvage_value = _Column("salvage_value")
+    salvage_value_ratio = _Column("salvage_value_ratio")
+    useful_life = _Column("useful_life")
+    accumulated_depreciation = _Column("accumulated_depreciation")
+    elapsed_days = _Column("elapsed_days")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __eq__(self, other):
+        return (isinstance(other, TangibleView)
+                and self.table is other.table and self.row == other.row)
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name!r} row={self.row}>"
+
+    @property
+    def schedule(self) -> asset.DepreciationSchedule:
+        return asset.DepreciationSchedule(self.method, self.acquisition_cost, self.salvage_value, self.useful_life)
+
+    def _reset_schedule(self):
+        # 償却表は参照のたびに列から作るため、保持しているものはない
+        pass
+
+    # 振る舞いは元のクラスと共有する
+    update_market_value = asset.Asset.update_market_value
+    set_market_value = asset.Asset.set_market_value
+    set_owner = asset.Tangible.set_owner
+    get_owner = asset.Tangible.get_owner
+    reset_cost_basis = asset.Tangible.reset_cost_basis
+    cumulative_depreciation = asset.Tangible.cumulative_depreciation
+    apply_depreciation = asset.Tangible.apply_depreciation
+    _depreciate_to = asset.Tangible._depreciate_to
+
+
+class BuildingView(TangibleView):
+    """AssetTable の1行を Building として扱うビュー"""
+    __slots__ = ()
+
+    address = _InternedColumn("address")
+
+
+# ビューを元のクラスの仮想サブクラスにして、isinstance による判定をそのまま通す
+asset.Tangible.register(TangibleView)
+asset.Building.register(BuildingView)
+
+
+class AssetTable(MutableMapping):
+    """
+    GameMaster.asset_registry の代わりに使える、列指向の資産ストア
+
+    有形固定資産(Tangible, Building)は登録時に状態を型付きの列(NumPy配列)へ移し、
+    以後は行番号を持つだけの TangibleView / BuildingView を返す。
+    資産名・所有者名・住所は重複を除いたテーブルの番号で保持する。
+    棚卸資産など列に収まらない資産はオブジェクトのまま保持する。
+    辞書と同じく 資産ID -> 資産 の対応として扱え、登録順に反復する。
+    """
+    COLUMNS = {
+        "kind": np.int8,                 # 行の種類(KINDSの番号、-1は削除済み)
+        "name": np.int32,
+        "owner": np.int32,
+        "address": np.int32,
+        "method": np.int8,
+        "value": np.float64,
+        "market_value": np.float64,
+        "acquisition_cost": np.float64,
+        "salvage_value": np.float64,
+        "salvage_value_ratio": np.float64,
+        "useful_life": np.int32,
+        "accumulated_depreciation": np.int64,
+        "elapsed_days": np.int64
+    }
+    INTERNED = ("name", "owner", "address")
+    KINDS = (TangibleView, BuildingView)
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self):
+        self.columns = {name: np.zeros(self.INITIAL_CAPACITY, dtype=dtype)
+                        for name, dtype in self.COLUMNS.items()}
+        self.size = 0          # 使用済みの行数
+        self._index = {}       # 資産ID -> 行番号(int) または 資産オブジェクト
+        self._strings = {column: [None] for column in self.INTERNED}  # 番号0はNone
+        self._string_ids = {column: {None: 0} for column in self.INTERNED}
+
+    def intern(self, column, value) -> int:
+        """文字列をテーブルに登録して番号を返す"""
+        ids = self._string_ids[column]
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(self._strings[column])
+            self._strings[column].append(value)
+        return index
+
+    def lookup(self, column, index):
+        return self._strings[column][index]
+
+    def _grow(self):
+        capacity = 2 * len(self.columns["kind"])
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def _add_row(self, asset_instance) -> int:
+        if self.size == len(self.columns["kind"]):
+            self._grow()
+        row = self.size
+        self.size += 1
+        self._write_row(row, asset_instance)
+        return row
+
+    def _write_row(self, row, asset_instance):
+        """資産の状態を行に書き込む"""
+        view = self.KINDS[1 if isinstance(asset_instance, asset.Building) else 0](self, row)
+        self.columns["kind"][row] = self.KINDS.index(type(view))
+        for name in ("name", "owner", "method", "value", "market_value", "acquisition_cost",
+                     "salvage_value", "salvage_value_ratio", "useful_life",
+                     "accumulated_depreciation", "elapsed_days"):
+            setattr(view, name, getattr(asset_instance, name))
+        if isinstance(view, BuildingView):
+            view.address = asset_instance.address
+
+    def _view(self, row):
+        return self.KINDS[self.columns["kind"][row]](self, row)
+
+    def __setitem__(self, asset_id, asset_instance):
+        entry = self._index.get(asset_id)
+        if isinstance(asset_instance, asset.Tangible):
+            if type(entry) is int:
+                # 登録済みの行はその場で書き換える(行を増やさず、既存のビューもそのまま使える)
+                self._write_row(entry, asset_instance)
+            else:
+                self._index[asset_id] = self._add_row(asset_instance)
+            return
+        if type(entry) is int:
+            self.columns["kind"][entry] = -1
+        self._index[asset_id] = asset_instance
+
+    def __getitem__(self, asset_id):
+        entry = self._index[asset_id]
+        if type(entry) is int:
+            return self._view(entry)
+        return entry
+
+    def __delitem__(self, asset_id):
+        entry = self._index.pop(asset_id)
+        if type(entry) is int:
+            self.columns["kind"][entry] = -1
+
+    def __contains__(self, asset_id):
+        return asset_id in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def rows(self, kind=None) -> np.ndarray:
+        """使用中の行番号(kind を指定するとその種類のビュークラスの行のみ)"""
+        kinds = self.columns["kind"][:self.size]
+        if kind is None:
+            return np.flatnonzero(kinds >= 0)
+        return np.flatnonzero(kinds == self.KINDS.index(kind))
+
+    def objects(self) -> list:
+        """列に収まらずオブジェクトのまま保持している資産"""
+        return [entry for entry in self._index.values() if type(entry) is not int]
+
+    def apply_depreciation(self, rows, days: int) -> np.ndarray:
+        """
+        指定した行の減価償却を列に対して一括で適用
+
+        :param rows: 行番号の配列
+        :param days: 時間経過の日数
+        :return: 行ごとの減価償却額
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = self.columns
+        elapsed = columns["elapsed_days"][rows] + days
+        useful_life = columns["useful_life"][rows]
+        accumulated = asset.cumulative_depreciation(
+            columns["method"][rows] == _MethodColumn.METHODS.index("accelerated"),
+            columns["acquisition_cost"][rows],
+            columns["salvage_value"][rows],
+            useful_life * 365,
+            asset.declining_annual_factor(useful_life),
+            elapsed
+        )
+        depreciation = accumulated - columns["accumulated_depreciation"][rows]
+        columns["elapsed_days"][rows] = elapsed
+        columns["accumulated_depreciation"][rows] = accumulated
+        columns["value"][rows] = columns["acquisition_cost"][rows] - accumulated
+        return depreciation
+
+    def refresh_market(self, market_engine, days=1):
+        """列の資産とオブジェクトの資産の市場価格を、MarketEngine の1ステップでまとめて更新"""
+        rows = self.rows()
+        objects = self.objects()
+        base, previous = market_engine.collect(objects)
+        prices = market_engine.simulate(
+            np.concatenate([self.columns["value"][rows], base]),
+            np.concatenate([self.columns["market_value"][rows], previous]),
+            days
+        )
+        self.columns["market_value"][rows] = prices[:len(rows)]
+        market_engine.write_back(objects, prices[len(rows):])
+
+    def nbytes(self) -> int:
+        """列の確保済みバイト数"""
+        return sum(column.nbytes for column in self.columns.values())
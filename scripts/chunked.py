@@ -0,0 +1,171 @@
+"""追記専用の列: 固定長のチャンクに分けた配列と、セグメントに封じるリスト"""
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:  # NumPyは任意依存
+    np = None
+
+
+class ChunkedArray:
+    """
+    chunk_size 要素ごとのチャンク(array.array)に分けて保持する追記専用の列
+
+    埋まったチャンクは以後変更せず、末尾のチャンクだけに追記する(既存の要素を再確保・複製しない)。
+    そのため freeze() で返すチャンクは GameMaster.fork() の分岐間でそのまま共有できる。
+    先頭のチャンクは drop_before() で捨てられ、捨てた後も添字は通算のまま変わらない。
+    """
+    __slots__ = ("typecode", "chunk_size", "chunks", "tail", "start")
+
+    def __init__(self, typecode, chunk_size, values=()):
+        self.typecode = typecode
+        self.chunk_size = chunk_size
+        self.chunks = []             # 埋まったチャンク
+        self.tail = array(typecode)  # 追記中のチャンク
+        self.start = 0               # 残っている先頭の要素の添字(捨てたチャンクの要素数)
+        if values:
+            self.extend(values)
+
+    def __len__(self):
+        """捨てた要素を含む通算の要素数"""
+        return self.start + len(self.chunks) * self.chunk_size + len(self.tail)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        chunk, offset = divmod(index - self.start, self.chunk_size)
+        if chunk < len(self.chunks):
+            return self.chunks[chunk][offset]
+        return self.tail[offset]
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+        yield from self.tail
+
+    def _seal(self):
+        self.chunks.append(self.tail)
+        self.tail = array(self.typecode)
+
+    def append(self, value):
+        self.tail.append(value)
+        if len(self.tail) == self.chunk_size:
+            self._seal()
+
+    def extend(self, values):
+        values = array(self.typecode, values)
+        position = 0
+        while position < len(values):
+            room = self.chunk_size - len(self.tail)
+            self.tail.extend(values[position:position + room])
+            position += room
+            if len(self.tail) == self.chunk_size:
+                self._seal()
+
+    def freeze(self) -> list:
+        """以後変更されないチャンク(分岐間で共有できるもの)"""
+        return list(self.chunks)
+
+    def drop_before(self, index) -> int:
+        """添字 index より前の要素だけからなるチャンクを捨て、捨てた要素数を返す"""
+        count = min((index - self.start) // self.chunk_size, len(self.chunks))
+        if count <= 0:
+            return 0
+        del self.chunks[:count]
+        self.start += count * self.chunk_size
+        return count * self.chunk_size
+
+    def converted(self, typecode) -> "ChunkedArray":
+        """型を変えた新しい列を返す(元のチャンクは変更しない)"""
+        result = ChunkedArray(typecode, self.chunk_size)
+        result.chunks = [array(typecode, chunk) for chunk in self.chunks]
+        result.tail = array(typecode, self.tail)
+        result.start = self.start
+        return result
+
+    def _search(self, search, value, lo):
+        """昇順に並んだ列を二分探索する(チャンクを末尾の値で選んでから、チャンクの中を探す)"""
+        lo = max(lo - self.start, 0)
+        size = self.chunk_size
+        first = min(lo // size, len(self.chunks))
+        position = search(self.chunks, value, first, key=lambda chunk: chunk[-1])
+        chunk = self.chunks[position] if position < len(self.chunks) else self.tail
+        base = position * size
+        return self.start + base + search(chunk, value, max(lo - base, 0))
+
+    def bisect_left(self, value, lo=0) -> int:
+        """昇順に並んだ列で、lo 以降に value を挿入できる最も左の添字"""
+        return self._search(bisect_left, value, lo)
+
+    def bisect_right(self, value, lo=0) -> int:
+        """昇順に並んだ列で、lo 以降に value を挿入できる最も右の添字"""
+        return self._search(bisect_right, value, lo)
+
+    def numpy(self):
+        """残っている要素を1つのNumPy配列(コピー)で返す"""
+        if np is None:
+            raise ImportError("numpy() の利用には numpy が必要です。")
+        return np.concatenate([np.frombuffer(chunk, dtype=chunk.typecode) for chunk in self.chunks]
+                              + [np.frombuffer(self.tail, dtype=self.tail.typecode)])
+
+    def nbytes(self):
+        """残っている要素のバイト数"""
+        return (len(self) - self.start) * self.tail.itemsize
+
+
+class SegmentedList:
+    """
+    追記専用のリスト(決算情報・イベントログ・仕入帳など)
+    freeze() した時点までの要素は変更不可のタプル(セグメント)に移し、GameMaster.fork() の分岐間で共有する。
+    読み出しは添字(負の添字・スライスを含む)、len()、反復でリストと同じように使える。
+    """
+    __slots__ = ("segments", "starts", "frozen", "tail")
+
+    def __init__(self, values=()):
+        self.segments = []  # 封じた要素のタプル
+        self.starts = []    # セグメントごとの先頭の添字(二分探索用)
+        self.frozen = 0     # 封じた要素の数
+        self.tail = list(values)
+
+    def __len__(self):
+        return self.frozen + len(self.tail)
+
+    def __iter__(self):
+        return chain(*self.segments, self.tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if index >= self.frozen:
+            return self.tail[index - self.frozen]
+        if index < 0:
+            raise IndexError("添字が範囲外です。")
+        position = bisect_right(self.starts, index) - 1
+        return self.segments[position][index - self.starts[position]]
+
+    def __eq__(self, other):
+        if isinstance(other, (SegmentedList, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        self.tail.extend(values)
+
+    def freeze(self) -> list:
+        """ここまでの要素をセグメントに封じ、全セグメントを返す(以降の追加は新しいリストに入る)"""
+        if self.tail:
+            self.segments.append(tuple(self.tail))
+            self.starts.append(self.frozen)
+            self.frozen += len(self.tail)
+            self.tail = []
+        return list(self.segments)
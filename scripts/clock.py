@@ -0,0 +1,16 @@
+"""ゲーム内時計"""
+
+
+class GameClock:
+    """
+    ゲーム内の現在日時を保持する小さなオブジェクト
+    GameMasterが所有して時間を進め、資産などは参照だけを持つ。
+    """
+    __slots__ = ("current_date",)
+
+    def __init__(self, current_date=None):
+        self.current_date = current_date
+
+    def now(self):
+        """現在のゲーム内日時"""
+        return self.current_date
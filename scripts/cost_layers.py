@@ -0,0 +1,131 @@
+"""棚卸資産の原価層(先入先出法)"""
+from scripts import chunked
+
+
+class FifoCostLayers:
+    """
+    先入先出法の原価層
+    仕入ごとの数量・単価を配列で持ち、数量と原価の累計(期首からの通算)も並べて保持する。
+    払出しは累計数量を二分探索して消費先の層を求めるため、
+    払い出す層の数によらず O(log n) で総原価が決まる。
+    単価・数量が全て整数のうちは累計もint64で持つため、総原価は層ごとに足し上げた場合と完全に一致する。
+    整数でない単価・数量が現れた時点で、該当する列を浮動小数(double)に切り替える。
+    列は CHUNK_SIZE 層ごとのチャンクに分けて持ち、消費し切ったチャンクは捨てる(層の番号は通算のまま)。
+    """
+    CHUNK_SIZE = 1024
+
+    def __init__(self):
+        self._quantities = chunked.ChunkedArray("q", self.CHUNK_SIZE)      # 層ごとの仕入数量
+        self._prices = chunked.ChunkedArray("q", self.CHUNK_SIZE)          # 層ごとの単価
+        self._cum_quantities = chunked.ChunkedArray("q", self.CHUNK_SIZE)  # 層までの数量の累計
+        self._cum_costs = chunked.ChunkedArray("q", self.CHUNK_SIZE)       # 層までの原価の累計
+        self._head = 0              # 消費し切っていない最初の層
+        self._base_quantity = 0     # 詰めて捨てた層までの数量の累計
+        self._base_cost = 0         # 詰めて捨てた層までの原価の累計
+        self._consumed_quantity = 0  # 払出済み数量の累計
+        self._consumed_cost = 0      # 払出済み原価の累計
+
+    def __len__(self):
+        """未消費の層の数"""
+        return len(self._quantities) - self._head
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        """未消費の層を {"quantity": 残数量, "price": 単価} で返す"""
+        for index in range(self._head, len(self._quantities)):
+            remaining = min(self._quantities[index], self._cum_quantities[index] - self._consumed_quantity)
+            yield {"quantity": remaining, "price": self._prices[index]}
+
+    def __repr__(self):
+        return repr(list(self))
+
+    @property
+    def quantity(self):
+        """未消費の数量の合計"""
+        return self._total_quantity() - self._consumed_quantity
+
+    def _has_layers(self):
+        """捨てていない層があるか"""
+        return len(self._cum_quantities) > self._cum_quantities.start
+
+    def _total_quantity(self):
+        return self._cum_quantities[-1] if self._has_layers() else self._base_quantity
+
+    def _total_cost(self):
+        return self._cum_costs[-1] if self._has_layers() else self._base_cost
+
+    def freeze(self) -> list:
+        """以後変更されないチャンク(GameMaster.fork() の分岐間で共有する)"""
+        return [chunk for column in (self._quantities, self._prices, self._cum_quantities, self._cum_costs)
+                for chunk in column.freeze()]
+
+    def _use_float_prices(self):
+        """整数でない単価が現れたら単価と原価累計を浮動小数に切り替える"""
+        self._prices = self._prices.converted("d")
+        self._cum_costs = self._cum_costs.converted("d")
+
+    def _use_float_quantities(self):
+        """整数でない数量が現れたら数量と数量の累計を浮動小数に切り替える(原価も浮動小数になる)"""
+        self._quantities = self._quantities.converted("d")
+        self._cum_quantities = self._cum_quantities.converted("d")
+        if self._prices.typecode == "q":
+            self._use_float_prices()
+
+    def push(self, quantity, price):
+        """仕入れた層を末尾に追加"""
+        if self._quantities.typecode == "q" and quantity != int(quantity):
+            self._use_float_quantities()
+        elif self._quantities.typecode == "q":
+            quantity = int(quantity)
+        if self._prices.typecode == "q" and price != int(price):
+            self._use_float_prices()
+        elif self._prices.typecode == "q":
+            price = int(price)
+        total_quantity, total_cost = self._total_quantity(), self._total_cost()
+        self._quantities.append(quantity)
+        self._prices.append(price)
+        self._cum_quantities.append(total_quantity + quantity)
+        self._cum_costs.append(total_cost + quantity * price)
+
+    def pop_cost(self, quantity):
+        """
+        古い層から quantity を払い出し、その総原価を返す
+
+        :raises ValueError: 未消費の層の数量が足りない場合(層は変更しない)
+        """
+        target = self._consumed_quantity + quantity
+        if target > self._total_quantity():
+            raise ValueError("在庫履歴が不足しています。")
+        if quantity <= 0:
+            return 0
+
+        cum_quantities = self._cum_quantities
+        # target を含む層(累計数量が初めて target 以上になる層)
+        index = cum_quantities.bisect_left(target, self._head)
+        if index > cum_quantities.start:
+            previous_quantity, previous_cost = cum_quantities[index - 1], self._cum_costs[index - 1]
+        else:
+            previous_quantity, previous_cost = self._base_quantity, self._base_cost
+        consumed_cost = previous_cost + (target - previous_quantity) * self._prices[index]
+
+        total_cost = consumed_cost - self._consumed_cost
+        self._consumed_quantity = target
+        self._consumed_cost = consumed_cost
+        # 累計数量が target 以下の層は消費し切った
+        self._head = cum_quantities.bisect_right(target, index)
+        self._compact()
+        return total_cost
+
+    def _compact(self):
+        """消費し切った層だけからなるチャンクを捨てる(累計は通算のまま)"""
+        cum_quantities = self._cum_quantities
+        chunks = min((self._head - cum_quantities.start) // self.CHUNK_SIZE, len(cum_quantities.chunks))
+        if chunks <= 0:
+            return
+        last = cum_quantities.start + chunks * self.CHUNK_SIZE - 1
+        self._base_quantity = cum_quantities[last]
+        self._base_cost = self._cum_costs[last]
+        for column in (self._quantities, self._prices, self._cum_quantities, self._cum_costs):
+            column.drop_before(self._head)
@@ -0,0 +1,218 @@
+"""借入金の台帳(多数の借入をまとめて利息計算・返済する)"""
+import numpy as np
+
+
+class DebtBook:
+    """
+    プレイヤー1人分の借入金台帳
+
+    借入ごとの条件を列(NumPy配列)で保持し、利息の計上と約定返済を全借入について1回の配列演算で行う。
+    利息は日複利で元本に組み入れ、返済は period_days 日ごとの元利均等返済。
+    期日一括返済は term_days 日後に1回だけ返済する元利均等返済として持つ(期日を定めなければ repay() で返済する)。
+    基準日からの残高・支払累計・利息累計は閉形式で求まるため、任意の日付の残高を O(1) で引け、
+    時間の進め方(1日ずつか、まとめてか)によらず同じ値になる。
+    任意の繰上返済を行った借入は、その日を新しい基準日として返済額を計算し直す。
+    """
+    COLUMNS = {
+        "principal": np.float64,     # 基準日の残高
+        "base_day": np.int64,        # 基準日(序数日付)
+        "daily_factor": np.float64,  # 1 + 年利/365
+        "period_days": np.int64,     # 返済の間隔(日)
+        "periods": np.int64,         # 基準日以降の返済回数(0は期日一括)
+        "payment": np.float64,       # 1回あたりの返済額
+        "base_interest": np.float64,  # 基準日までの利息累計
+        "base_paid": np.float64,      # 基準日までの返済累計
+        "active": np.bool_
+    }
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, clock):
+        """
+        :param clock: 基準日と計上日に使うゲーム内時計(GameClock)
+        """
+        self.clock = clock
+        self.columns = {name: np.zeros(self.INITIAL_CAPACITY, dtype=dtype)
+                        for name, dtype in self.COLUMNS.items()}
+        self.size = 0
+        self.banks = []            # 借入ごとの借入先
+        self.posted_interest = 0   # 仕訳に計上済みの利息累計
+        self.posted_payments = 0   # 仕訳に計上済みの約定返済累計
+
+    def __len__(self):
+        return self.size
+
+    def _today(self) -> int:
+        return self.clock.current_date.toordinal()
+
+    def _grow(self):
+        capacity = 2 * len(self.columns["principal"])
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    @staticmethod
+    def _annuity(principal, daily_factor, period_days, periods):
+        """元利均等返済の1回あたりの返済額(periods=0 は一括返済なので0)"""
+        if periods == 0:
+            return 0.0
+        rate = daily_factor ** period_days - 1
+        if rate == 0:
+            return principal / periods
+        return principal * rate / (1 - (1 + rate) ** -periods)
+
+    def borrow(self, bank, principal, rate, periods=0, period_days=30, term_days=None) -> int:
+        """
+        借入を追加し、借入番号を返す
+
+        :param bank: 借入先
+        :param principal: 借入額
+        :param rate: 年利
+        :param periods: 返済回数(0なら期日一括返済。利息は元本に組み入れる)
+        :param period_days: 返済の間隔(日)
+        :param term_days: 期日一括返済の期間(日)。期日に元利合計を約定返済として計上する
+                          (省略時は期日を定めず、repay() で返済する)
+        """
+        if principal <= 0:
+            raise ValueError("借入額は0より大きくなければなりません。")
+        if periods < 0 or period_days <= 0:
+            raise ValueError("返済回数は0以上、返済の間隔は1日以上を指定してください。")
+        if term_days is not None:
+            if periods:
+                raise ValueError("期日(term_days)は期日一括返済(periods=0)の借入にのみ指定できます。")
+            if term_days <= 0:
+                raise ValueError("期日までの日数は1日以上を指定してください。")
+            # 期日一括返済は、期間 term_days の1回払いの元利均等返済と同じ
+            periods, period_days = 1, term_days
+        if self.size == len(self.columns["principal"]):
+            self._grow()
+        loan = self.size
+        self.size += 1
+        daily_factor = 1 + rate / 365
+        row = {
+            "principal": principal,
+            "base_day": self._today(),
+            "daily_factor": daily_factor,
+            "period_days": period_days,
+            "periods": periods,
+            "payment": self._annuity(principal, daily_factor, period_days, periods),
+            "base_interest": 0.0,
+            "base_paid": 0.0,
+            "active": True
+        }
+        for name, value in row.items():
+            self.columns[name][loan] = value
+        self.banks.append(bank)
+        return loan
+
+    def _evaluate(self, day, loans=None):
+        """
+        day 時点の 残高・返済累計・利息累計 を借入ごとの配列で返す(閉形式)
+
+        :param loans: 対象の借入番号の配列(省略時は全て)
+        """
+        if loans is None:
+            loans = slice(0, self.size)
+        columns = self.columns
+        principal = columns["principal"][loans]
+        factor = columns["daily_factor"][loans]
+        period_days = columns["period_days"][loans]
+        periods = columns["periods"][loans]
+        payment = columns["payment"][loans]
+
+        elapsed = np.maximum(day - columns["base_day"][loans], 0)
+        paid_count = np.minimum(elapsed // period_days, periods)
+        growth = factor ** (paid_count * period_days)
+        rate = factor ** period_days - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            annuity_sum = np.where(rate > 0, (growth - 1) / rate, paid_count)
+        # 直近の返済日の残高を、返済日以降の日数分だけ複利で伸ばす
+        balance = (principal * growth - payment * annuity_sum) * factor ** (elapsed - paid_count * period_days)
+        balance = np.where(columns["active"][loans], np.maximum(balance, 0), 0)
+        paid = payment * paid_count
+        interest = columns["base_interest"][loans] + balance + paid - principal
+        interest = np.where(columns["active"][loans], interest, columns["base_interest"][loans])
+        return balance, columns["base_paid"][loans] + paid, interest
+
+    def balances_at(self, day=None) -> np.ndarray:
+        """
+        指定日の借入ごとの残高
+
+        :param day: 日付(date/datetime)または序数日付。省略時は現在
+        """
+        return self._evaluate(self._day_key(day))[0]
+
+    def balance_at(self, day=None) -> float:
+        """指定日の残高の合計"""
+        return float(self.balances_at(day).sum())
+
+    def _day_key(self, day):
+        if day is None:
+            return self._today()
+        if hasattr(day, "toordinal"):
+            return day.toordinal()
+        return day
+
+    def accrue(self):
+        """
+        現在までの利息と約定返済のうち、まだ計上していない分を返す
+
+        :return: (利息, 約定返済額) いずれも全借入の合計(円未満は累計で丸める)
+        """
+        _, paid, interest = self._evaluate(self._today())
+        total_interest = round(float(interest.sum()))
+        total_paid = round(float(paid.sum()))
+        interest_due = total_interest - self.posted_interest
+        payment_due = total_paid - self.posted_payments
+        self.posted_interest = total_interest
+        self.posted_payments = total_paid
+        return interest_due, payment_due
+
+    def repay(self, loan, amount):
+        """
+        借入を任意に繰上返済し、残りの返済額を計算し直す
+        返済額は円単位に丸め、台帳の残高と計上済みの返済累計の両方に同じ額を使う。
+
+        :return: 返済額(円)
+        :raises ValueError: 返済額が残高を超える場合
+        """
+        if not 0 <= loan < self.size or not self.columns["active"][loan]:
+            raise ValueError(f"借入番号 {loan} の借入は存在しません。")
+        today = self._today()
+        balance, paid, interest = (values[0] for values in self._evaluate(today, [loan]))
+        amount = round(amount)
+        if amount > round(balance):
+            raise ValueError("返済額が借入金額を超えています。")
+        columns = self.columns
+        elapsed = today - columns["base_day"][loan]
+        remaining_periods = max(columns["periods"][loan] - elapsed // columns["period_days"][loan], 0)
+        principal = balance - amount
+        if principal < 0.5:
+            principal = 0.0  # 円未満の残りは完済として扱う
+        columns["principal"][loan] = principal
+        columns["base_day"][loan] = today
+        columns["base_interest"][loan] = interest
+        columns["base_paid"][loan] = paid + amount
+        columns["periods"][loan] = remaining_periods
+        columns["payment"][loan] = self._annuity(principal, columns["daily_factor"][loan],
+                                                 columns["period_days"][loan], remaining_periods)
+        # 繰上返済は呼び出し側で仕訳を起こすため計上済みとして扱う
+        self.posted_payments += amount
+        if principal == 0:
+            columns["active"][loan] = False
+        return amount
+
+    def schedule(self, loan):
+        """
+        借入1件の返済予定表を (返済日の序数日付, 返済額, 利息, 元本充当額, 返済後残高) の列で返す
+        """
+        columns = self.columns
+        base_day = int(columns["base_day"][loan])
+        period_days = int(columns["period_days"][loan])
+        payment = float(columns["payment"][loan])
+        growth = float(columns["daily_factor"][loan]) ** period_days
+        balance = float(columns["principal"][loan])
+        for period in range(1, int(columns["periods"][loan]) + 1):
+            interest = balance * (growth - 1)
+            balance = max(balance + interest - payment, 0.0)
+            yield base_day + period * period_days, payment, interest, payment - interest, balance
@@ -0,0 +1,60 @@
+"""ゲーム内メッセージのログ設定
+
+各モジュールは logging.getLogger(__name__) でサブシステムごとのロガー
+(scripts.player, scripts.asset など)を持ち、メッセージは % 形式の引数で渡す。
+文字列の組み立ては出力されるときにだけ行われるため、無効なレベルのメッセージはほぼ無料になる。
+
+    configure("console")    従来の print と同じく標準出力にメッセージだけを表示(既定)
+    configure("headless")   何も出力しない(大量のプレイヤーを回すシミュレーション向け)
+"""
+import logging
+import sys
+
+ROOT_LOGGER = "scripts"
+MODES = {"console", "headless"}
+SILENT = logging.CRITICAL + 1
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """出力の時点の sys.stdout に書き出すハンドラー(print と同じ出力先を追う)"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def configure(mode="console", level=logging.INFO, loggers=None):
+    """
+    ゲームのログ出力を設定
+
+    :param mode: "console" または "headless"
+    :param level: consoleモードで表示する最低レベル
+    :param loggers: サブシステムごとのレベル {"scripts.asset": logging.WARNING, ...}
+    """
+    if mode not in MODES:
+        raise ValueError(f"無効なログモード: {mode}. 有効なモードは {', '.join(sorted(MODES))} です。")
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.propagate = False
+    if mode == "console":
+        handler = ConsoleHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(handler)
+        root.setLevel(level)
+    else:
+        root.addHandler(logging.NullHandler())
+        root.setLevel(SILENT)
+    for name, logger_level in (loggers or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+
+if not logging.getLogger(ROOT_LOGGER).handlers:
+    configure("console")
@@ -0,0 +1,401 @@
+"""仕訳帳(ジャーナル)の格納エンジン"""
+import csv
+import json
+import operator
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime
+from itertools import chain
+
+from scripts import chunked
+
+try:
+    import numpy as np
+except ImportError:  # NumPyは任意依存
+    np = None
+
+
+class ListJournal:
+    """
+    従来形式の仕訳帳: 1取引を1つのdictとしてリストに保持
+    freeze() した時点までの取引は変更不可のタプル(セグメント)に移し、GameMaster.fork() の分岐間で共有する。
+    """
+
+    def __init__(self, chart):
+        """
+        :param chart: 勘定科目表(ChartOfAccounts)
+        """
+        self._chart = chart
+        self.clear()
+
+    def rebind(self, chart):
+        """勘定科目表を差し替える(勘定番号は元の表と同じであること)"""
+        self._chart = chart
+
+    def __len__(self):
+        return self._frozen_count + len(self._entries)
+
+    def __iter__(self):
+        return chain(*self._segments, self._entries)
+
+    def entry(self, tx_id):
+        """取引1件を返す"""
+        if tx_id < 0:
+            tx_id += len(self)
+        if tx_id >= self._frozen_count:
+            return self._entries[tx_id - self._frozen_count]
+        position = bisect_right(self._segment_starts, tx_id) - 1
+        return self._segments[position][tx_id - self._segment_starts[position]]
+
+    def freeze(self) -> tuple:
+        """ここまでの取引をセグメントに封じ、全セグメントを返す(以降の追加は新しいリストに入る)"""
+        if self._entries:
+            self._segments.append(tuple(self._entries))
+            self._segment_starts.append(self._frozen_count)
+            self._frozen_count += len(self._entries)
+            self._entries = []
+        return tuple(self._segments)
+
+    def append(self, updates, description, timestamp):
+        """取引を1件追加"""
+        self._entries.append({
+            "updates": updates,
+            "description": description,
+            "timestamp": timestamp
+        })
+
+    def append_ids(self, ids, amounts, description, timestamp):
+        """勘定番号と金額の列で取引を1件追加"""
+        names = self._chart.names
+        self.append([(names[account_id], amount) for account_id, amount in zip(ids, amounts)],
+                    description, timestamp)
+
+    def extend(self, entries, timestamp):
+        """(updates, description) の列をまとめて追加"""
+        self._entries.extend(
+            {"updates": updates, "description": description, "timestamp": timestamp}
+            for updates, description in entries
+        )
+
+    def clear(self):
+        self._entries = []
+        self._segments = []        # 封じた取引のタプル
+        self._segment_starts = []  # セグメントごとの先頭の取引番号(二分探索用)
+        self._frozen_count = 0
+
+
+class _TextColumn:
+    """
+    文字列の列: chunk_size 件ごとに UTF-8 のバイト列1つと終端位置の配列にまとめる
+    直近に使った INTERN_SIZE 種類の文字列は dict で番号を引き、同じ文字列には同じ番号を返す
+    (取引ごとに異なる摘要ばかりでも、dict の大きさは INTERN_SIZE 件で頭打ちになる)。
+    """
+    INTERN_SIZE = 1024
+    __slots__ = ("chunk_size", "chunks", "ends", "data", "_ids")
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.chunks = []        # 埋まったチャンク: (終端位置の配列, バイト列)
+        self.ends = array("q")  # 追記中のチャンクの各文字列の終端位置
+        self.data = bytearray()
+        self._ids = {}          # 文字列 -> 番号(最近使ったものが末尾)
+
+    def __len__(self):
+        return len(self.chunks) * self.chunk_size + len(self.ends)
+
+    def add(self, text) -> int:
+        """文字列を追加して番号を返す(最近追加した文字列なら既存の番号)"""
+        text = str(text)
+        ids = self._ids
+        index = ids.pop(text, None)
+        if index is None:
+            if len(ids) >= self.INTERN_SIZE:
+                del ids[next(iter(ids))]
+            index = len(self)
+            self.data += text.encode("UTF-8")
+            self.ends.append(len(self.data))
+            if len(self.ends) == self.chunk_size:
+                self.chunks.append((self.ends, bytes(self.data)))
+                self.ends = array("q")
+                self.data = bytearray()
+        ids[text] = index
+        return index
+
+    def __getitem__(self, index):
+        chunk, offset = divmod(index, self.chunk_size)
+        ends, data = self.chunks[chunk] if chunk < len(self.chunks) else (self.ends, self.data)
+        start = ends[offset - 1] if offset else 0
+        return data[start:ends[offset]].decode("UTF-8")
+
+    def freeze(self) -> list:
+        """以後変更されないチャンク"""
+        return list(self.chunks)
+
+    def nbytes(self):
+        sizes = [len(ends) * ends.itemsize + len(data) for ends, data in self.chunks]
+        return sum(sizes) + len(self.ends) * self.ends.itemsize + len(self.data)
+
+
+class ColumnarJournal:
+    """
+    列指向の仕訳帳
+    仕訳1行(posting)ごとに 勘定番号(int32)・金額(int64) を、取引ごとに 先頭行・摘要番号・日時番号 を配列で保持する。
+    取引IDと日付の列は取引ごとの値から求める。
+    摘要は UTF-8 のバイト列にまとめ(最近使った摘要と同じものは共有)、日時は重複を除いたテーブルに格納する。
+    整数でない金額(移動平均法の原価など)は正確な値を別のdictに退避する。
+    列は CHUNK_SIZE 件ごとのチャンクに分けて確保し、埋まったチャンクは freeze() で分岐間に共有する。
+    """
+    CHUNK_SIZE = 4096
+    COLUMNS = ("tx_id", "account", "amount", "date")
+
+    def __init__(self, chart):
+        """
+        :param chart: 勘定科目表(ChartOfAccounts)。勘定番号 <-> 勘定名 の対応に使う
+        """
+        self._chart = chart
+        self._clear_storage()
+
+    def rebind(self, chart):
+        """勘定科目表を差し替える(勘定番号は元の表と同じであること)"""
+        self._chart = chart
+
+    def _clear_storage(self):
+        chunk_size = self.CHUNK_SIZE
+        # 仕訳行ごとの列
+        self._account = chunked.ChunkedArray("i", chunk_size)
+        self._amount = chunked.ChunkedArray("q", chunk_size)
+        self._float_amounts = {}    # 行番号 -> 整数でない金額
+        # 取引ごとの列
+        self._tx_offset = chunked.ChunkedArray("q", chunk_size)    # 取引の先頭行
+        self._tx_description = chunked.ChunkedArray("i", chunk_size)
+        self._tx_timestamp = chunked.ChunkedArray("i", chunk_size)
+        self._descriptions = _TextColumn(chunk_size)
+        # 重複を除いた日時のテーブル(ゲーム内の日付ごとに1件)
+        self._timestamps = []
+        self._timestamp_ids = {}
+        self._timestamp_dates = array("i")  # 日時番号 -> 序数日付(日付でなければ0)
+
+    def __len__(self):
+        return len(self._tx_offset)
+
+    @property
+    def posting_count(self):
+        """仕訳行の総数"""
+        return len(self._amount)
+
+    def _timestamp_id(self, timestamp):
+        key = (type(timestamp), timestamp)
+        index = self._timestamp_ids.get(key)
+        if index is None:
+            index = len(self._timestamps)
+            self._timestamps.append(timestamp)
+            self._timestamp_ids[key] = index
+            self._timestamp_dates.append(self._date_key(timestamp))
+        return index
+
+    @staticmethod
+    def _date_key(timestamp):
+        """日付列に格納する値(序数日付、日付でなければ0)"""
+        if hasattr(timestamp, "toordinal"):
+            return timestamp.toordinal()
+        return 0
+
+    def append(self, updates, description, timestamp):
+        """取引を1件追加"""
+        account_ids = self._chart.ids
+        self.append_ids(
+            [account_ids[name] for name, _ in updates],
+            [amount for _, amount in updates],
+            description, timestamp
+        )
+
+    def append_ids(self, ids, amounts, description, timestamp):
+        """勘定番号と金額の列で取引を1件追加"""
+        start = len(self._amount)
+        for row, (account_id, amount) in enumerate(zip(ids, amounts), start):
+            self._account.append(account_id)
+            try:
+                self._amount.append(amount)
+            except TypeError:
+                self._amount.append(int(amount))
+                self._float_amounts[row] = amount
+
+        self._tx_offset.append(start)
+        self._tx_description.append(self._descriptions.add(description))
+        self._tx_timestamp.append(self._timestamp_id(timestamp))
+
+    def extend(self, entries, timestamp):
+        """(updates, description) の列をまとめて追加"""
+        account_ids = self._chart.ids
+        timestamp_id = self._timestamp_id(timestamp)
+        row = len(self._amount)
+        accounts, amounts, offsets, descriptions = [], [], [], []
+        for updates, description in entries:
+            offsets.append(row)
+            descriptions.append(self._descriptions.add(description))
+            for name, amount in updates:
+                accounts.append(account_ids[name])
+                if not isinstance(amount, int):
+                    try:
+                        amount = operator.index(amount)
+                    except TypeError:
+                        self._float_amounts[row] = amount
+                        amount = int(amount)
+                amounts.append(amount)
+                row += 1
+
+        # 列ごとに一括で追加
+        self._account.extend(accounts)
+        self._amount.extend(amounts)
+        self._tx_offset.extend(offsets)
+        self._tx_description.extend(descriptions)
+        self._tx_timestamp.extend([timestamp_id] * len(offsets))
+
+    def entry(self, tx_id):
+        """取引1件を従来形式のdictで返す"""
+        start = self._tx_offset[tx_id]
+        end = self._tx_offset[tx_id + 1] if tx_id + 1 < len(self._tx_offset) else len(self._amount)
+        names = self._chart.names
+        return {
+            "updates": [(names[self._account[row]], self._amount_at(row)) for row in range(start, end)],
+            "description": self._descriptions[self._tx_description[tx_id]],
+            "timestamp": self._timestamps[self._tx_timestamp[tx_id]]
+        }
+
+    def _amount_at(self, row):
+        if self._float_amounts and row in self._float_amounts:
+            return self._float_amounts[row]
+        return self._amount[row]
+
+    def __iter__(self):
+        for tx_id in range(len(self._tx_offset)):
+            yield self.entry(tx_id)
+
+    def freeze(self) -> tuple:
+        """
+        共有できる履歴を返す(ListJournal と同じインターフェース)
+        埋まったチャンクは以後変更されないため、封じ直さずにそのまま返す(複製されるのは末尾のチャンクのみ)。
+        """
+        shared = []
+        for column in (self._account, self._amount, self._tx_offset, self._tx_description, self._tx_timestamp,
+                       self._descriptions):
+            shared.extend(column.freeze())
+        return tuple(shared)
+
+    def clear(self):
+        self._clear_storage()
+
+    def _tx_counts(self):
+        """取引ごとの仕訳行数(NumPy配列)"""
+        offsets = self._tx_offset.numpy()
+        return np.diff(offsets, append=len(self._amount))
+
+    def column(self, name):
+        """仕訳行の列をNumPy配列(コピー)で返す"""
+        if np is None:
+            raise ImportError("column() の利用には numpy が必要です。")
+        if name not in self.COLUMNS:
+            raise ValueError(f"無効な列名: {name}. 有効な列名は {', '.join(self.COLUMNS)} です。")
+        if name == "tx_id":
+            return np.repeat(np.arange(len(self), dtype=np.int64), self._tx_counts())
+        if name == "date":
+            dates = np.frombuffer(self._timestamp_dates, dtype=np.int32).astype(np.int64)
+            return np.repeat(dates[self._tx_timestamp.numpy()], self._tx_counts())
+        values = getattr(self, f"_{name}").numpy().astype(np.int64)
+        if name == "amount" and self._float_amounts:
+            values = values.astype(np.float64)
+            for row, amount in self._float_amounts.items():
+                values[row] = amount
+        return values
+
+    def columns(self) -> dict:
+        """全ての仕訳行の列をNumPy配列で返す"""
+        return {name: self.column(name) for name in self.COLUMNS}
+
+    def nbytes(self):
+        """配列と摘要のバイト列の使用バイト数"""
+        columns = (self._account, self._amount, self._tx_offset, self._tx_description, self._tx_timestamp,
+                   self._descriptions)
+        return sum(column.nbytes() for column in columns)
+
+
+def date_key(value):
+    """日付(date, datetime, "YYYY-MM-DD")を序数日付に変換。日付でなければNone"""
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            return None
+    if isinstance(value, (date, datetime)):
+        return value.toordinal()
+    return None
+
+
+def filter_entries(entries, start=None, end=None, account=None):
+    """
+    取引をストリームのまま絞り込む
+
+    :param start: この日付以降の取引のみ(両端を含む)
+    :param end: この日付以前の取引のみ
+    :param account: この勘定を含む取引のみ
+    """
+    start_key = date_key(start) if start is not None else None
+    end_key = date_key(end) if end is not None else None
+    for entry in entries:
+        if start_key is not None or end_key is not None:
+            key = date_key(entry["timestamp"])
+            if key is None:
+                continue
+            if start_key is not None and key < start_key:
+                continue
+            if end_key is not None and key > end_key:
+                continue
+        if account is not None and not any(name == account for name, _ in entry["updates"]):
+            continue
+        yield entry
+
+
+def _format_timestamp(timestamp):
+    if isinstance(timestamp, (date, datetime)):
+        return timestamp.isoformat()
+    return str(timestamp)
+
+
+def write_jsonl(entries, file) -> int:
+    """取引を1行1件のJSONで書き出し、書き出した件数を返す"""
+    count = 0
+    for entry in entries:
+        record = {
+            "timestamp": _format_timestamp(entry["timestamp"]),
+            "updates": [[name, amount] for name, amount in entry["updates"]],
+            "description": entry["description"]
+        }
+        file.write(json.dumps(record, ensure_ascii=False))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(entries, file) -> int:
+    """取引を仕訳1行ごとのCSVで書き出し、書き出した件数を返す"""
+    writer = csv.writer(file)
+    writer.writerow(["tx_no", "timestamp", "account", "amount", "description"])
+    count = 0
+    for entry in entries:
+        timestamp = _format_timestamp(entry["timestamp"])
+        for name, amount in entry["updates"]:
+            writer.writerow([count, timestamp, name, amount, entry["description"]])
+        count += 1
+    return count
+
+
+EXPORT_FORMATS = {
+    "jsonl": write_jsonl,
+    "csv": write_csv
+}
+
+
+JOURNAL_ENGINES = {
+    "list": ListJournal,
+    "columnar": ColumnarJournal
+}
@@ -1,5 +1,19 @@
 """会計帳簿システム"""
 import json
+import logging
+import os
+import uuid
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import chain
+
+from scripts import (
+    archive,
+    chunked,
+    journal
+    )
+
+logger = logging.getLogger(__name__)
 
 class Account:
     VALID_CATEGORIES = ["資産", "負債", "純資産", "収益", "費用"]
@@ -27,51 +41,394 @@ class Account:
         """金額をリセット"""
         self.balance = 0
 
-class Ledger:
-    def __init__(self, current_date = "ゲーム内時間") :
-        """勘定元帳クラス"""
-        self.current_date = current_date
-        self._accounts = {}
-        self._transactions = []  # 当期トランザクション履歴(期中)
-        self._last_transactions = [] # 当期トランザクション履歴(期末)
-        self._former_transactions = [] # 前期以前の全トランザクション履歴
-        self._initialize_essential_accounts(file_path="database/essential_account.json")
+# 勘定科目の定義(不変)
+AccountSpec = namedtuple("AccountSpec", ["name", "statement", "category", "sub_category"])
+
+# 既定の勘定科目ファイル(カレントディレクトリではなくリポジトリの位置から解決)
+DEFAULT_CHART_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "essential_account.json")
+
+
+class ChartOfAccounts:
+    """
+    勘定科目表: 勘定名に小さな整数の勘定番号を割り当てる
+    load_chart_of_accounts() で読み込んだものは凍結され、全Ledgerで共有される。
+    Ledgerが勘定を追加する場合はコピーを作ってから追加する(勘定番号は元の表と同じ)。
+    """
+
+    def __init__(self, specs=()):
+        self.names = []  # 勘定番号 -> 勘定名
+        self.ids = {}    # 勘定名 -> 勘定番号
+        self.specs = []  # 勘定番号 -> AccountSpec
+        self.frozen = False
+        self._templates = None
+        self._layout = None
+        for spec in specs:
+            self.add(spec)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def add(self, spec: AccountSpec) -> int:
+        """勘定を登録し勘定番号を返す(同名の勘定は定義を置き換えて既存の番号を返す)"""
+        if self.frozen:
+            raise ValueError("共有されている勘定科目表は変更できません。copy()してから追加してください。")
+        account_id = self.ids.get(spec.name)
+        if account_id is None:
+            account_id = len(self.names)
+            self.ids[spec.name] = account_id
+            self.names.append(spec.name)
+            self.specs.append(spec)
+        else:
+            self.specs[account_id] = spec
+        self._layout = None
+        return account_id
+
+    @property
+    def layout(self) -> "StatementLayout":
+        """財務諸表の配置(初回のみ計算)"""
+        if self._layout is None:
+            self._layout = StatementLayout(self)
+        return self._layout
+
+    def copy(self) -> "ChartOfAccounts":
+        """変更可能なコピーを作成"""
+        return ChartOfAccounts(self.specs)
+
+    def freeze(self) -> "ChartOfAccounts":
+        self.frozen = True
+        return self
+
+    def id_of(self, name) -> int:
+        """勘定名から勘定番号を取得"""
+        if name not in self.ids:
+            raise ValueError(f"勘定名： {name} が存在しません。")
+        return self.ids[name]
+
+    @property
+    def templates(self) -> dict:
+        """STANDARD_TEMPLATES をこの勘定科目表でコンパイルしたもの(初回のみコンパイル)"""
+        if self._templates is None:
+            self._templates = {name: JournalTemplate(name, lines, self)
+                               for name, lines in STANDARD_TEMPLATES.items()}
+        return self._templates
 
-    def _initialize_essential_accounts(self, file_path):
-        """勘定科目の初期設定:essential_account.jsonで管理(12/17)"""
+
+class StatementLayout:
+    """
+    財務諸表の配置
+    勘定ごとに 財務諸表/カテゴリー/サブカテゴリー の置き場所を勘定科目表から1度だけ求めておく。
+    """
+    SECTIONS = {
+        "貸借対照表": {
+            "資産": ("流動資産", "固定資産", "繰延資産"),
+            "負債": ("流動負債", "固定負債"),
+            "純資産": ("株主資本", "評価・換算差額")
+        },
+        "損益計算書": {
+            "収益": ("営業収益", "営業外収益"),
+            "費用": ("営業費用", "営業外費用")
+        }
+    }
+
+    def __init__(self, chart: ChartOfAccounts):
+        statement_of = {category: statement
+                        for statement, categories in self.SECTIONS.items()
+                        for category in categories}
+        # 勘定番号順の (勘定番号, 勘定名, 財務諸表, カテゴリー, サブカテゴリー)
+        self.slots = tuple(
+            (account_id, spec.name, statement_of[spec.category], spec.category, spec.sub_category)
+            for account_id, spec in enumerate(chart.specs)
+        )
+
+    def _empty_statements(self) -> dict:
+        return {
+            statement: {category: {sub_category: {} for sub_category in sub_categories}
+                        for category, sub_categories in categories.items()}
+            for statement, categories in self.SECTIONS.items()
+        }
+
+    def build(self, summary: dict) -> dict:
+        """残高試算表(勘定名 -> 残高)から財務諸表を作成"""
+        statements = self._empty_statements()
+        for _, name, statement, category, sub_category in self.slots:
+            statements[statement][category][sub_category][name] = summary.get(name, 0)
+        return statements
+
+    def build_from_balances(self, balances) -> dict:
+        """勘定番号順の残高から財務諸表を作成"""
+        statements = self._empty_statements()
+        for account_id, name, statement, category, sub_category in self.slots:
+            statements[statement][category][sub_category][name] = balances[account_id]
+        return statements
+
+
+_CHART_CACHE = {}
+
+
+def load_chart_of_accounts(file_path=None) -> ChartOfAccounts:
+    """
+    勘定科目ファイルを読み込み、凍結した勘定科目表を返す
+    同じファイルはプロセス内で1度だけ解析し、以降は同じインスタンスを共有する。
+
+    :param file_path: 勘定科目ファイルのパス、または importlib.resources のリソース
+                      (省略時は DEFAULT_CHART_PATH)
+    """
+    if file_path is None:
+        file_path = DEFAULT_CHART_PATH
+    if hasattr(file_path, "read_text"):
+        key = str(file_path)
+    else:
+        key = os.path.abspath(file_path)
+    chart = _CHART_CACHE.get(key)
+    if chart is not None:
+        return chart
+
+    if hasattr(file_path, "read_text"):
+        data = json.loads(file_path.read_text(encoding="UTF-8"))
+    else:
         with open(file_path, "r", encoding="UTF-8") as file:
             data = json.load(file)
-            accounts = data["essential_accounts"]
+    specs = []
+    for account in data["essential_accounts"]:
+        # カテゴリーの検証はAccountに任せる
+        account = Account(account["name"], account["statement"], account["category"], account["sub_category"])
+        specs.append(AccountSpec(account.name, account.statement, account.category, account.sub_category))
+
+    chart = ChartOfAccounts(specs).freeze()
+    _CHART_CACHE[key] = chart
+    return chart
 
-        for account in accounts:
-            name = account["name"]
-            statement = account["statement"]
-            category = account["category"]
-            sub_category = account["sub_category"]
-            
-            self.add_account(Account(name, statement, category, sub_category))
+
+class JournalTemplate:
+    """
+    コンパイル済みの仕訳テンプレート
+    勘定番号を束縛しておき、記帳時は金額だけを渡す。
+    sign が全行で指定されていれば金額1つで記帳でき(借方: 1, 貸方: -1)、
+    None の行を含む場合は行ごとの金額を渡す。
+    """
+    __slots__ = ("name", "account_names", "account_ids", "signs")
+
+    def __init__(self, name, lines, chart: ChartOfAccounts):
+        if len(lines) < 2:
+            raise ValueError(f"仕訳テンプレートには2つ以上の行が必要です。{name}")
+        self.name = name
+        self.account_names = tuple(account_name for account_name, _ in lines)
+        self.account_ids = tuple(chart.id_of(account_name) for account_name in self.account_names)
+        signs = tuple(sign for _, sign in lines)
+        if None in signs:
+            self.signs = None
+        elif sum(signs) != 0:
+            raise ValueError(f"仕訳テンプレートの符号の合計は0である必要があります。{name}")
+        else:
+            self.signs = signs
+
+    def amounts(self, amounts) -> list:
+        """記帳する金額の列を作成"""
+        if isinstance(amounts, (int, float)):
+            if self.signs is None:
+                raise ValueError(f"テンプレート {self.name} は行ごとの金額が必要です。")
+            return [sign * amounts for sign in self.signs]
+
+        amounts = list(amounts)
+        if len(amounts) != len(self.account_ids):
+            raise ValueError(f"テンプレート {self.name} の行数({len(self.account_ids)})と金額の数が一致しません。")
+        if sum(amounts) != 0:
+            raise ValueError("取引の合計金額は0である必要があります。")
+        return amounts
+
+
+# 頻出する仕訳の形 (勘定名, 符号)
+STANDARD_TEMPLATES = {
+    "capital": (("現金", 1), ("資本金", -1)),
+    "purchase": (("仕入", 1), ("現金", -1)),
+    "sale": (("現金", 1), ("売上高", -1)),
+    "depreciation": (("減価償却費", 1), ("減価償却累計額", -1)),
+    "building_acquisition": (("建物", 1), ("現金", -1)),
+    "borrowing": (("現金", 1), ("借入金", -1)),
+    "repayment": (("借入金", 1), ("現金", -1)),
+    "interest": (("支払利息", 1), ("借入金", -1)),
+    "inventory_audit": (("売上原価", None), ("仕入", None), ("棚卸減耗", None),
+                        ("商品評価損", None), ("棚卸資産", None)),
+}
+
+
+class Ledger:
+    POSTING_CHUNK_SIZE = 4096  # 勘定ごとの索引を確保する単位(埋まったチャンクは分岐間で共有する)
+
+    def __init__(self, current_date = "ゲーム内時間", journal_engine = "list", archive_dir = None,
+                 chart = None, checkpoint_interval = 30, archive_segment_size = archive.JournalArchive.SEGMENT_SIZE) :
+        """勘定元帳クラス
+
+        :param journal_engine: 仕訳帳の格納方式
+                "list":     取引ごとのdictをリストで保持(従来形式)
+                "columnar": 列指向の配列で保持(大量の取引向け)
+        :param archive_dir: 指定すると決算ごとに当期の仕訳をこのディレクトリのセグメントに封印し、
+                            メモリには未決算の期間のみを保持する
+        :param archive_segment_size: 1つのセグメントにまとめる取引の件数(それまではメモリに溜める)
+        :param chart: 勘定科目表(ChartOfAccounts)または勘定科目ファイルのパス
+                      (省略時は共有の既定勘定科目表)
+        :param checkpoint_interval: 残高のチェックポイントを取る間隔(日数)。
+                                    短いほどメモリを使い、balance_as_of() の再生が短くなる
+        """
+        if journal_engine not in journal.JOURNAL_ENGINES:
+            raise ValueError(f"無効な仕訳帳エンジン: {journal_engine}. 有効なエンジンは {', '.join(journal.JOURNAL_ENGINES)} です。")
+        self.current_date = current_date
+        if not isinstance(chart, ChartOfAccounts):
+            chart = load_chart_of_accounts(chart)
+        self._chart = chart
+        self._balances = [0] * len(chart)  # 勘定番号 -> 残高(このLedger固有の状態はこれのみ)
+        self._category_totals = {category: 0 for category in Account.VALID_CATEGORIES}  # カテゴリー別の残高合計
+        self._total_balance = 0  # 全勘定の残高合計(貸借一致なら0)
+        self._version = 0  # 残高が変わるたびに増える版数
+        self._statements_cache = None  # (版数, 財務諸表)
+        self._tx_count = 0  # 封印済みを含む取引の通し件数
+        self._open_tx_start = 0  # 当期の仕訳帳の先頭の取引の通し番号
+        # 残高のチェックポイント: 日付(序数)、その時点の取引の通し番号・決算の回数、残高
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoint_dates = [0]
+        self._checkpoints = [(0, 0, tuple(self._balances))]
+        # 勘定ごとの索引: 勘定番号 -> その勘定を含む取引の通し番号
+        # (決算振替は -(決算番号 + 1) として同じ列に並べる)
+        self._account_postings = [self._new_posting_index() for _ in range(len(chart))]
+        self._closings = chunked.SegmentedList()  # (取引の通し番号, 日時, {勘定番号: 振替額})
+        self._transactions = journal.JOURNAL_ENGINES[journal_engine](chart)  # 当期トランザクション履歴(期中)
+        self._last_transactions = [] # 当期トランザクション履歴(期末)
+        # 前期以前の全トランザクション履歴(archive_dir指定時はディスク上のセグメント)
+        if archive_dir is None:
+            self._former_transactions = []
+        else:
+            self._former_transactions = archive.JournalArchive(archive_dir, prefix=uuid.uuid4().hex, chart=chart,
+                                                                segment_size=archive_segment_size)
+        self.templates = chart.templates  # 標準の仕訳テンプレート(勘定科目表と共有)
 
     def add_account(self, account):
         """新しい勘定を追加"""
-        self._accounts[account.name] = account
+        if self._chart.frozen:
+            # 共有の勘定科目表は変更せず、このLedger用のコピーに追加する
+            self._chart = self._chart.copy()
+            self._transactions.rebind(self._chart)
+            if isinstance(self._former_transactions, archive.JournalArchive):
+                self._former_transactions.rebind(self._chart)
+        spec = AccountSpec(account.name, account.statement, account.category, account.sub_category)
+        if spec.name in self._chart:
+            # 同名の勘定を置き換える場合は旧勘定の残高を合計から除く
+            self._clear_account(spec.name)
+        account_id = self._chart.add(spec)
+        if account_id == len(self._balances):
+            self._balances.append(0)
+            self._account_postings.append(self._new_posting_index())
+        self._update_account_id(account_id, account.balance)
+
+    def _new_posting_index(self):
+        return chunked.ChunkedArray("q", self.POSTING_CHUNK_SIZE)
+
+    def get_balance(self, name):
+        """勘定の残高を返す"""
+        return self._balances[self._chart.id_of(name)]
+
+    def compile_template(self, name, lines) -> JournalTemplate:
+        """
+        仕訳テンプレートをコンパイル
+
+        :param name: テンプレート名
+        :param lines: (勘定名, 符号) のリスト。符号は 1, -1 または None(金額を個別に指定)
+        """
+        return JournalTemplate(name, lines, self._chart)
 
     def _update_account(self, name, amount):
         """(内部使用) 指定された勘定を更新"""
-        if name not in self._accounts:
-            raise ValueError(f"勘定名： {name} が存在しません。")
+        self._update_account_id(self._chart.id_of(name), amount)
+
+    def _update_account_id(self, account_id, amount):
+        """(内部使用) 勘定番号で指定された勘定を更新し、残高合計を追随させる (正: 借方, 負: 貸方)"""
         # 勘定の残高を更新
-        self._accounts[name].update(amount)
-        
+        self._balances[account_id] += amount
+        self._category_totals[self._chart.specs[account_id].category] += amount
+        self._total_balance += amount
+        self._version += 1
+
     def _clear_account(self, name):
-        self._accounts[name].clear()
+        account_id = self._chart.id_of(name)
+        balance = self._balances[account_id]
+        self._category_totals[self._chart.specs[account_id].category] -= balance
+        self._total_balance -= balance
+        self._balances[account_id] = 0
+        self._version += 1
+
+    def get_category_total(self, category) -> int:
+        """カテゴリー(資産/負債/純資産/収益/費用)の残高合計を返す"""
+        if category not in self._category_totals:
+            raise ValueError(f"無効なカテゴリー: {category}. 有効なカテゴリーは {', '.join(Account.VALID_CATEGORIES)} です。")
+        return self._category_totals[category]
+
+    def get_net_income(self) -> int:
+        """当期純利益を返す(利益は正値)"""
+        return -(self._category_totals["収益"] + self._category_totals["費用"])
+
+    def is_balanced(self) -> bool:
+        """全勘定の残高合計が0(貸借一致)かを返す"""
+        return self._total_balance == 0
     
     def _clear_transactions(self):
-        self._transactions = []
+        self._open_tx_start += len(self._transactions)
+        self._transactions.clear()
+
+    def freeze_history(self) -> list:
+        """
+        ここまでの履歴のうち以後変更されないオブジェクトを返す(GameMaster.fork() で分岐間に共有する)
+        仕訳帳の既存の取引、決算振替、チェックポイント、勘定ごとの索引の埋まったチャンク、
+        封印済みセグメント、共有の勘定科目表とテンプレート。
+        """
+        shared = list(self._transactions.freeze())
+        shared.extend(self._closings.freeze())
+        shared.extend(self._checkpoints)
+        for index in self._account_postings:
+            shared.extend(index.freeze())
+        if isinstance(self._former_transactions, archive.JournalArchive):
+            shared.extend(self._former_transactions.freeze())
+        if self._chart.frozen:
+            shared.extend([self._chart, self.templates])
+        return shared
+
+    def start_branch(self):
+        """分岐した側の帳簿で呼ぶ: 以後に封印するセグメントを元の帳簿とは別のファイルに書く"""
+        if isinstance(self._former_transactions, archive.JournalArchive):
+            self._former_transactions.prefix = uuid.uuid4().hex
+
+    def _record_checkpoint(self, date_key):
+        """(内部使用) 現在の残高をチェックポイントとして記録"""
+        self._checkpoint_dates.append(date_key)
+        self._checkpoints.append((self._tx_count, len(self._closings), tuple(self._balances)))
+
+    def _before_posting(self, account_ids_list):
+        """
+        (内部使用) 記帳の直前に呼び、必要ならチェックポイントを取り、
+        勘定ごとの索引に取引を登録して通し件数を進める
+
+        :param account_ids_list: 取引ごとの勘定番号の列
+        """
+        date_key = journal.date_key(self.current_date)
+        if date_key is not None and date_key >= self._checkpoint_dates[-1] + self.checkpoint_interval:
+            self._record_checkpoint(date_key)
+        postings = self._account_postings
+        tx_index = self._tx_count
+        for account_ids in account_ids_list:
+            for account_id in account_ids:
+                index = postings[account_id]
+                # 同じ取引に同じ勘定が複数行あっても1度だけ登録
+                if not index or index[-1] != tx_index:
+                    index.append(tx_index)
+            tx_index += 1
+        self._tx_count = tx_index
 
     def reset_ledger(self):
         """全勘定科目の残高を0にリセット"""
-        for account in self._accounts.values():
-            self._update_account(account.name, 0)
+        for name in self._chart.names:
+            self._update_account(name, 0)
 
     def execute_transaction(self, updates, description=""):
         """取引を実行し、制約を確認"""
@@ -82,17 +439,69 @@ class Ledger:
         if total_amount != 0:
             raise ValueError("取引の合計金額は0である必要があります。")
 
+        account_ids = [self._chart.id_of(name) for name, _ in updates]
+
         # トランザクションを適用
+        self._before_posting([account_ids])
         for name, amount in updates:
             self._update_account(name, amount)
 
         # トランザクション履歴を記録
-        transaction = {
-            "updates": updates,
-            "description": description,
-            "timestamp": self.current_date  # ゲーム上の時間を仮定
-        }
-        self._transactions.append(transaction)
+        self._transactions.append(updates, description, self.current_date)  # ゲーム上の時間を仮定
+
+    def post(self, template: JournalTemplate, amounts, description=""):
+        """
+        コンパイル済みテンプレートで取引を実行
+
+        :param template: compile_template() または self.templates のテンプレート
+        :param amounts: 金額(全行に符号がある場合)または行ごとの金額の列
+        """
+        amounts = template.amounts(amounts)
+        self._before_posting([template.account_ids])
+        for account_id, amount in zip(template.account_ids, amounts):
+            self._update_account_id(account_id, amount)
+
+        self._transactions.append_ids(template.account_ids, amounts, description, self.current_date)
+
+    def execute_transactions(self, batch):
+        """
+        複数の取引をまとめて実行
+        全ての取引を先に検証し、1件でも不正があれば何も適用しない。
+
+        :param batch: (updates, description) または updates のリスト
+        """
+        accounts = self._chart.ids
+        deltas = {}
+        entries = []
+        account_ids_list = []
+        for index, item in enumerate(batch):
+            if isinstance(item, list):
+                updates, description = item, ""
+            else:
+                updates, description = item
+
+            if not isinstance(updates, list) or len(updates) < 2:
+                raise ValueError(f"取引{index}: 取引には2つ以上の更新が必要です。{updates}")
+            total_amount = 0
+            account_ids = []
+            for name, amount in updates:
+                if name not in accounts:
+                    raise ValueError(f"取引{index}: 勘定名： {name} が存在しません。")
+                account_ids.append(accounts[name])
+                total_amount += amount
+                deltas[name] = deltas.get(name, 0) + amount
+            if total_amount != 0:
+                raise ValueError(f"取引{index}: 取引の合計金額は0である必要があります。")
+            entries.append((updates, description))
+            account_ids_list.append(account_ids)
+
+        # 勘定ごとに集計した金額をまとめて適用
+        self._before_posting(account_ids_list)
+        for name, amount in deltas.items():
+            self._update_account(name, amount)
+
+        # トランザクション履歴を一括で記録
+        self._transactions.extend(entries, self.current_date)
 
     def execute_settlement(self) -> dict:
         """
@@ -109,41 +518,147 @@ class Ledger:
         
         self._update_account("利益剰余金", net_income)
         summary["当期純利益"] = -net_income
-        
+        transfers = {self._chart.ids["利益剰余金"]: net_income}
+
         # 帳簿の閉鎖 -> PLの初期化
-        for account in self._accounts.values():
-            if account.statement == "損益計算書":
-                self._clear_account(account.name)  
+        for account_id, spec in enumerate(self._chart.specs):
+            if spec.statement == "損益計算書":
+                transfers[account_id] = -self._balances[account_id]
+                self._clear_account(spec.name)
             else:
                 continue
-        # self._clear_transactions()
-            
+
+        # 決算振替を勘定ごとの索引に記録
+        closing_marker = -(len(self._closings) + 1)
+        for account_id, amount in transfers.items():
+            if amount:
+                self._account_postings[account_id].append(closing_marker)
+        self._closings.append((self._tx_count, self.current_date, transfers))
+        # PL勘定は全て0なので、浮動小数の端数を残さないよう合計も0に戻す
+        self._category_totals["収益"] = 0
+        self._category_totals["費用"] = 0
+        # 当期の仕訳をセグメントに封印し、メモリから解放
+        if isinstance(self._former_transactions, archive.JournalArchive) and len(self._transactions):
+            period = self.current_date.strftime("%Y-%m-%d") if hasattr(self.current_date, "strftime") else str(self.current_date)
+            self._former_transactions.seal(self._transactions, period)
+            self._clear_transactions()
+
         return summary
     
+    def _entry(self, tx_index):
+        """(内部使用) 通し番号で取引1件を取得"""
+        if tx_index >= self._open_tx_start:
+            return self._transactions.entry(tx_index - self._open_tx_start)
+        if not isinstance(self._former_transactions, archive.JournalArchive):
+            raise IndexError(f"取引 {tx_index} の履歴は保持されていません。")
+        return self._former_transactions.entry(tx_index)
+
+    def _iter_account_entries(self, account_id):
+        """(内部使用) 勘定を含む取引と決算振替を発生順に返す: (取引または None, 決算振替または None)"""
+        for marker in self._account_postings[account_id]:
+            if marker >= 0:
+                yield self._entry(marker), None
+            else:
+                yield None, self._closings[-marker - 1]
+
+    def get_account_postings(self, name) -> list:
+        """
+        勘定の明細(総勘定元帳の1勘定分)を返す
+        索引を使うため、計算量はその勘定の仕訳数に比例する。
+
+        :return: {"timestamp", "amount", "balance", "description"} のリスト
+        """
+        account_id = self._chart.id_of(name)
+        postings = []
+        balance = 0
+        for entry, closing in self._iter_account_entries(account_id):
+            if closing is not None:
+                _, timestamp, transfers = closing
+                amount = transfers[account_id]
+                balance += amount
+                postings.append({"timestamp": timestamp, "amount": amount,
+                                 "balance": balance, "description": "決算振替"})
+                continue
+            for line_name, amount in entry["updates"]:
+                if line_name == name:
+                    balance += amount
+                    postings.append({"timestamp": entry["timestamp"], "amount": amount,
+                                     "balance": balance, "description": entry["description"]})
+        return postings
+
+    def _iter_entries_from(self, tx_index):
+        """(内部使用) 通し番号tx_index以降の取引を封印済みのアーカイブから順に返す"""
+        if isinstance(self._former_transactions, archive.JournalArchive):
+            yield from self._former_transactions.iter_from(tx_index)
+        for local in range(max(0, tx_index - self._open_tx_start), len(self._transactions)):
+            yield self._transactions.entry(local)
+
+    def _iter_replay_from(self, tx_index, closing_index):
+        """(内部使用) 取引と決算振替を発生順に返す: (日時, [(勘定番号, 金額)])"""
+        ids = self._chart.ids
+        closings = self._closings
+        for index, entry in enumerate(self._iter_entries_from(tx_index), tx_index):
+            # この取引より前に行った決算の振替を先に返す
+            while closing_index < len(closings) and closings[closing_index][0] <= index:
+                _, timestamp, transfers = closings[closing_index]
+                yield timestamp, transfers.items()
+                closing_index += 1
+            yield entry["timestamp"], [(ids[name], amount) for name, amount in entry["updates"]]
+        for position in range(closing_index, len(closings)):
+            _, timestamp, transfers = closings[position]
+            yield timestamp, transfers.items()
+
+    def balance_as_of(self, date, accounts=None) -> dict:
+        """
+        指定日の営業終了時点の残高を返す
+        直近のチェックポイントから、その日までの取引と決算振替だけを再生する。
+        日付のない取引・決算振替は発生順に再生する。
+
+        :param date: 日付(date, datetime, "YYYY-MM-DD")
+        :param accounts: 勘定名またはそのリスト(省略時は全勘定)
+        :return: 勘定名 -> 残高
+        """
+        date_key = journal.date_key(date)
+        if date_key is None:
+            raise ValueError(f"無効な日付: {date}")
+        if accounts is None:
+            accounts = self._chart.names
+        elif isinstance(accounts, str):
+            accounts = [accounts]
+        account_ids = [self._chart.id_of(name) for name in accounts]
+
+        position = bisect_right(self._checkpoint_dates, date_key) - 1
+        tx_index, closing_index, balances = self._checkpoints[position]
+        balances = list(balances) + [0] * (len(self._chart) - len(balances))
+        for timestamp, amounts in self._iter_replay_from(tx_index, closing_index):
+            entry_key = journal.date_key(timestamp)
+            if entry_key is not None and entry_key > date_key:
+                break
+            for account_id, amount in amounts:
+                balances[account_id] += amount
+
+        return {name: balances[account_id] for name, account_id in zip(accounts, account_ids)}
+
     def _get_trial_balance(self) -> dict:
         """残高試算表の作成"""
-        summary = {}
-        total_revenue = 0
-        total_expense = 0
-        
-        # 勘定残高を集計し、収益と費用を分けて計算
-        for account in self._accounts.values():
-            summary[account.name] = account.net_balance()
-            if account.category == "収益":
-                total_revenue += account.net_balance()
-            elif account.category == "費用":
-                total_expense += account.net_balance()
-                
+        summary = dict(zip(self._chart.names, self._balances))
+        # 収益・費用の合計は記帳時に更新済みの値を読む
+        total_revenue = self._category_totals["収益"]
+        total_expense = self._category_totals["費用"]
+
         # 残高合計の制約確認
-        total_balance = sum(summary.values())
-        if total_balance != 0:
-            print("警告: 財務諸表の残高合計が0ではありません。")
-            
+        if not self.is_balanced():
+            logger.warning("警告: 財務諸表の残高合計が0ではありません。")
+
         return summary, total_revenue, total_expense
     
-    def display_trial_balance(self, summary: dict):
-        """財務状況を表示(残高試算表の作成)"""
-        summary = self.execute_settlement()
+    def display_trial_balance(self, summary: dict = None):
+        """
+        財務状況を表示(残高試算表の作成)
+        表示のみで帳簿は締めない。summaryを省略した場合は現在の残高を表示する。
+        """
+        if summary is None:
+            summary, _, _ = self._get_trial_balance()
         print("\n\n残高試算表:\n")
         for name, balance in summary.items():
             if balance > 0:
@@ -153,37 +668,26 @@ class Ledger:
             else:
                 print(f"{name}: 0")
             
-    def _get_financial_statements(self, summary:dict) -> dict:
-        """貸借対照表と損益計算書を作成"""
-        # summary = self.execute_settlement()
-        # 表示用の辞書を初期化
-        statements = {
-            "貸借対照表": {
-                "資産": {"流動資産": {}, "固定資産": {}, "繰延資産": {}},
-                "負債": {"流動負債": {}, "固定負債": {}},
-                "純資産": {"株主資本": {}, "評価・換算差額": {}}
-            },
-            "損益計算書": {
-                "収益": {"営業収益": {}, "営業外収益": {}},
-                "費用": {"営業費用": {}, "営業外費用": {}}
-            }
-        }
-
-        # 勘定科目をループして各カテゴリー・サブカテゴリーに振り分け
-        for account in self._accounts.values():
-            balance = summary.get(account.name, 0)
-            category = account.category
-
-            if category in ["資産", "負債", "純資産"]:
-                statement = statements["貸借対照表"]
-                statement[category][account.sub_category][account.name] = balance
+    def _get_financial_statements(self, summary:dict = None) -> dict:
+        """
+        貸借対照表と損益計算書を作成
+        summaryを省略した場合は現在の残高から作成し、次に残高が変わるまで同じ結果を再利用する。
+        (再利用されるため、戻り値は読み取り専用として扱うこと)
+        """
+        layout = self._chart.layout
+        if summary is not None:
+            return layout.build(summary)
 
-            elif category in ["収益", "費用"]:
-                statement = statements["損益計算書"]
-                statement[category][account.sub_category][account.name] = balance
-                
+        if self._statements_cache is not None and self._statements_cache[0] == self._version:
+            return self._statements_cache[1]
+        statements = layout.build_from_balances(self._balances)
+        self._statements_cache = (self._version, statements)
         return statements
 
+    def get_financial_statements(self) -> dict:
+        """現在の残高による貸借対照表と損益計算書(読み取り専用)"""
+        return self._get_financial_statements()
+
     def display_financial_statements(self, summary:dict):
         """貸借対照表と損益計算書を表示　12/17:print()による表示"""
         # summary = self.execute_settlement()
@@ -219,21 +723,56 @@ class Ledger:
         # 当期純利益の表示
         print(f"\n当期純利益: {summary['当期純利益']:,}")
 
-    def _get_transaction_history(self):
-        """トランザクション履歴を取得"""
-        return [
+    def iter_transactions(self, start=None, end=None, account=None):
+        """
+        トランザクション履歴を1件ずつ返すジェネレータ(履歴全体のコピーを作らない)
+
+        :param start: この日付以降の取引のみ(date, datetime, "YYYY-MM-DD")
+        :param end: この日付以前の取引のみ
+        :param account: この勘定を含む取引のみ
+        """
+        if account is not None and account in self._chart:
+            # 勘定の索引から該当する取引だけを読む
+            source = (entry for entry, _ in self._iter_account_entries(self._chart.ids[account])
+                      if entry is not None)
+        else:
+            source = chain(self._former_transactions, self._transactions)
+        entries = (
             {
                 "timestamp": tx["timestamp"],
                 "updates": tx["updates"],
                 "description": tx["description"]
             }
-            for tx in self._transactions
-        ]
-        
-    def display_transaction_history(self):
+            for tx in source
+        )
+        return journal.filter_entries(entries, start, end, account)
+
+    def _get_transaction_history(self):
+        """トランザクション履歴を取得"""
+        return list(self.iter_transactions())
+
+    def export_transactions(self, file, format="jsonl", start=None, end=None, account=None) -> int:
+        """
+        トランザクション履歴をストリームで書き出す
+
+        :param file: 出力先のパスまたはファイルライクオブジェクト
+        :param format: "jsonl"(1行1取引) または "csv"(1行1仕訳)
+        :param start, end, account: iter_transactions() と同じ絞り込み条件
+        :return: 書き出した取引の件数
+        """
+        if format not in journal.EXPORT_FORMATS:
+            raise ValueError(f"無効な出力形式: {format}. 有効な形式は {', '.join(journal.EXPORT_FORMATS)} です。")
+        writer = journal.EXPORT_FORMATS[format]
+        entries = self.iter_transactions(start, end, account)
+        if hasattr(file, "write"):
+            return writer(entries, file)
+        with open(file, "w", encoding="UTF-8", newline="") as fp:
+            return writer(entries, fp)
+
+    def display_transaction_history(self, start=None, end=None, account=None):
         """全トランザクション履歴(総勘定元帳)を表示"""
         print("\n\n取引一覧:\n")
-        for tx in self._get_transaction_history():
+        for tx in self.iter_transactions(start, end, account):
             timestamp = tx["timestamp"]
             updates_str = ", ".join([f"{name}: {amount:,}" for name, amount in tx["updates"]])
             description = tx["description"] if tx["description"] else "No description"
@@ -1,12 +1,16 @@
 """プレイヤーの各種管理クラスの記述"""
+import logging
+
 from scripts import (
     asset,
     player
     )
 
+logger = logging.getLogger(__name__)
+
 class Manager:
     """一般マネージャークラス"""
-    def __init__(self, game_master:player.GameMaster, owner_player:player.Player):
+    def __init__(self, game_master:"player.GameMaster", owner_player:"player.Player"):
         self.game_master = game_master
         self.player = owner_player
 
@@ -21,19 +25,18 @@ class SalesManager(Manager):
         """商品の販売"""
         product : asset.Inventory = self.game_master.get_asset_by_id(product_id) 
         if sales_price:
-            print(f"[{self.player.name},{product.name}]**売価が更新されました**　更新後：{sales_price}")
+            logger.info("[%s,%s]**売価が更新されました**　更新後：%s", self.player.name, product.name, sales_price)
             if sales_price <= 0 :
-                print("警告：売価が0以下になっています") 
+                logger.warning("警告：売価が0以下になっています")
         else:
             sales_price = product.sales_price
         
         product.subtract_inventory(quantity, sales_price)   
         sale_value = quantity * sales_price - revert 
         # 勘定元帳への記入
-        self.player.ledger_manager.execute_transaction([
-            ("現金", sale_value),
-            ("売上高", -sale_value)
-        ],  description=f"商品の売上 商品名：{product.name} 個数：{quantity} 単価：{product.sales_price}")
+        self.player.ledger_manager.post(
+            self.player.ledger_manager.templates["sale"], sale_value,
+            description=f"商品の売上 商品名：{product.name} 個数：{quantity} 単価：{product.sales_price}")
     
 
 class PurchaseManager(Manager):
@@ -51,11 +54,10 @@ class PurchaseManager(Manager):
         product.add_inventory(quantity, price, fringe_cost)
         purchase_cost = quantity * price + fringe_cost
         # 仕入帳、勘定元帳への記入
-        self.player.product_lists.append({"name": product.name, "quantity": purchase_cost})
-        self.player.ledger_manager.execute_transaction([
-            ("仕入", purchase_cost),
-            ("現金", -purchase_cost)
-        ], description=f"商品の仕入れ　商品名：{product.name} 個数：{quantity} 単価：{price}")
+        self.player.record_purchase(product_id, product, purchase_cost)
+        self.player.ledger_manager.post(
+            self.player.ledger_manager.templates["purchase"], purchase_cost,
+            description=f"商品の仕入れ　商品名：{product.name} 個数：{quantity} 単価：{price}")
 
 
 
@@ -65,7 +67,10 @@ class BuildingManager(Manager):
         super().__init__(game_master, owner_player)
 
     def aquire_building(self, asset_id: chr, value: int):
-        """建物の(登録＆)取得"""
+        """
+        建物の(登録＆)取得
+        取得価額は value とし、前の所有者の減価償却は引き継がない。
+        """
         target : asset.Building = self.game_master.get_asset_by_id(asset_id)
 
         if value <= 0:
@@ -73,16 +78,17 @@ class BuildingManager(Manager):
 
         # 所有者の登録
         target.set_owner(self.player.name)
+        self.game_master.assign_owner(asset_id, self.player.name)
+        target.reset_cost_basis(value)
 
         asset_info = {"ID": asset_id, "instance": target}
         self.player.portfolio.append(asset_info)
 
-        self.player.ledger_manager.execute_transaction([
-            ("建物", target.value),
-            ("現金", -target.value)
-        ], description=f"建物の取得　建物名：{target.name}")
+        self.player.ledger_manager.post(
+            self.player.ledger_manager.templates["building_acquisition"], value,
+            description=f"建物の取得　建物名：{target.name}")
         
-        print(f"Building instance type: {type(target)}")
+        logger.debug("Building instance type: %s", type(target))
 
     def dispose_building(self, asset_id: str, sales_price: int = None):
         """
@@ -92,7 +98,7 @@ class BuildingManager(Manager):
         :param sales_price: 売却価額 (デフォルトは建物の市場価値)
         """
         # 対象資産を取得
-        asset_info = next((item for item in self.player.portfolio if item["ID"] == asset_id), None)
+        asset_info = self.player.portfolio.get(asset_id)
 
         if not asset_info:
             raise ValueError(f"指定された資産ID({asset_id})はポートフォリオに存在しません。")
@@ -108,7 +114,7 @@ class BuildingManager(Manager):
             sales_price = target_asset.market_value
 
         # 簿価と売却損益の計算
-        book_value = target_asset.value
+        book_value = target_asset.acquisition_cost
         accumulated_depreciation = target_asset.accumulated_depreciation
         net_book_value = book_value - accumulated_depreciation
 
@@ -129,10 +135,53 @@ class BuildingManager(Manager):
                 ("固定資産売却損", loss)
             ], description=f"建物の売却: {target_asset.name}")
 
-        # ポートフォリオから削除
-        self.player.portfolio = [item for item in self.player.portfolio if item["ID"] != asset_id]
+        # ポートフォリオから削除し、所有者を外す
+        self.player.portfolio.remove(asset_id)
+        target_asset.owner = None
+        self.game_master.assign_owner(asset_id, None)
+
+        logger.info("建物 '%s' が売却されました。", target_asset.name)
+
 
-        print(f"建物 '{target_asset.name}' が売却されました。")
+    
+
+class FinanceManager(Manager):
+    """財務部門(借入と返済)"""
+    def __init__(self, game_master, owner_player):
+        super().__init__(game_master, owner_player)
 
+    def borrow(self, bank: str, principal: int, rate: float = None,
+               periods: int = 0, period_days: int = 30, term_days: int = None) -> int:
+        """
+        借入を実行し、借入番号を返す
 
-    
\ No newline at end of file
+        :param rate: 年利(省略時はリスクフリーレート + リスクプレミアム)
+        :param periods: 元利均等返済の回数(0なら期日一括返済)
+        :param period_days: 返済の間隔(日)
+        :param term_days: 期日一括返済の期間(日)。期日の時間経過で元利合計の返済を計上する
+        """
+        if rate is None:
+            rate = asset.Debt.RFR + asset.Debt.RISK_PREMIUM
+        loan = self.player.debt_book.borrow(bank, principal, rate, periods, period_days, term_days)
+        self.player.ledger_manager.post(
+            self.player.ledger_manager.templates["borrowing"], principal,
+            description=f"借入 借入先：{bank} 金額：{principal:,}")
+        return loan
+
+    def repay(self, loan: int, amount: int):
+        """借入の繰上返済(返済額は円単位に丸めて計上)"""
+        amount = self.player.debt_book.repay(loan, amount)
+        self.player.ledger_manager.post(
+            self.player.ledger_manager.templates["repayment"], amount,
+            description=f"借入金の返済 借入先：{self.player.debt_book.banks[loan]} 金額：{amount:,}")
+
+    def post_accruals(self, days: int):
+        """前回からの利息と約定返済を、それぞれ1本の仕訳にまとめて計上"""
+        interest, payment = self.player.debt_book.accrue()
+        ledger_manager = self.player.ledger_manager
+        if interest:
+            ledger_manager.post(ledger_manager.templates["interest"], interest,
+                                description=f"支払利息の計上 ({days}日)")
+        if payment:
+            ledger_manager.post(ledger_manager.templates["repayment"], payment,
+                                description=f"借入金の約定返済 ({days}日)")
@@ -0,0 +1,137 @@
+"""市場価格の確率モデル(全資産の価格をまとめて生成する)"""
+import numpy as np
+
+
+class MarketEngine:
+    """
+    登録済み資産の市場価格をNumPyでまとめて生成するエンジン
+
+    乱数はゲームごとのシード付きGenerator から引くため、同じシードなら同じ価格の推移になる。
+    標準正規乱数は horizon ステップ分を (ステップ, 資産) の行列で先に生成しておき、
+    1回の更新では1行を取り出して価格モデルに通すだけにする。
+    価格モデル:
+        "gaussian":         基準価格 ±10% の正規分布(従来の update_market_value と同じ分布)
+        "gbm":              幾何ブラウン運動(前回の市場価格から対数正規に推移)
+        "mean_reverting":   基準価格へ回帰する推移(Ornstein-Uhlenbeck型)
+    基準価格は 棚卸資産なら売価、それ以外は帳簿価額。
+    """
+    MODELS = {"gaussian", "gbm", "mean_reverting"}
+
+    def __init__(self, seed=None, model="gaussian", horizon=64,
+                 volatility=0.1, drift=0.0, reversion=0.2):
+        """
+        :param seed: 乱数のシード
+        :param model: 価格モデル
+        :param horizon: 先に生成しておくステップ数
+        :param volatility: 変動率(gaussianでは標準偏差/基準価格、gbmでは年率)
+        :param drift: gbmの年率ドリフト
+        :param reversion: mean_revertingの1ステップあたりの回帰の強さ(0〜1)
+        """
+        if model not in self.MODELS:
+            raise ValueError(f"無効な価格モデル: {model}. 有効なモデルは {', '.join(sorted(self.MODELS))} です。")
+        if horizon <= 0:
+            raise ValueError("horizonは1以上を指定してください。")
+        self.model = model
+        self.horizon = horizon
+        self.volatility = volatility
+        self.drift = drift
+        self.reversion = reversion
+        self.rng = np.random.default_rng(seed)
+        self._shocks = np.empty((0, 0))  # 先に生成した標準正規乱数 (ステップ, 資産)
+        self._step = 0                    # 次に使う行
+
+    def _next_shocks(self, size):
+        """次のステップの乱数(資産数が変わったら作り直す)"""
+        if self._shocks.shape[1] != size or self._step >= len(self._shocks):
+            self._shocks = self.rng.standard_normal((self.horizon, size))
+            self._step = 0
+        shocks = self._shocks[self._step]
+        self._step += 1
+        return shocks
+
+    def simulate(self, base, previous, days=1):
+        """
+        1ステップ分の市場価格を計算
+
+        :param base: 基準価格の配列
+        :param previous: 前回の市場価格の配列
+        :param days: ステップの日数(gbmで使用)
+        :return: 新しい市場価格(int64, 0以上)
+        """
+        base = np.asarray(base, dtype=np.float64)
+        # 市場価格がまだ付いていない(0以下の)資産は基準価格から推移させる
+        previous = np.asarray(previous, dtype=np.float64)
+        previous = np.where(previous > 0, previous, base)
+        shocks = self._next_shocks(len(base))
+        match self.model:
+            case "gaussian":
+                prices = base + base * self.volatility * shocks
+            case "gbm":
+                dt = days / 365
+                prices = previous * np.exp((self.drift - self.volatility ** 2 / 2) * dt
+                                           + self.volatility * np.sqrt(dt) * shocks)
+            case "mean_reverting":
+                prices = (previous + self.reversion * (base - previous)
+                          + base * self.volatility * shocks)
+        return np.maximum(np.trunc(prices), 0).astype(np.int64)
+
+    def path(self, base, previous, steps, days=1):
+        """
+        steps ステップ分の価格の推移を (ステップ, 資産) の行列で返す(資産には書き戻さない)
+        """
+        path = np.empty((steps, len(base)), dtype=np.int64)
+        for step in range(steps):
+            previous = path[step] = self.simulate(base, previous, days)
+        return path
+
+    def refresh(self, assets, days=1):
+        """
+        資産の市場価格を更新して書き戻す
+
+        :param assets: 資産の列(GameMaster.asset_registry の値など)
+        :param days: 前回の更新からの日数
+        """
+        assets = list(assets)
+        if not assets:
+            return
+        base, previous = self.collect(assets)
+        self.write_back(assets, self.simulate(base, previous, days))
+
+    @staticmethod
+    def collect(assets):
+        """資産の 基準価格 と 現在の市場価格 を配列で返す"""
+        base = np.fromiter((_base_price(asset_instance) for asset_instance in assets),
+                           dtype=np.float64, count=len(assets))
+        previous = np.fromiter((_market_price(asset_instance) for asset_instance in assets),
+                               dtype=np.float64, count=len(assets))
+        return base, previous
+
+    @staticmethod
+    def write_back(assets, prices):
+        """計算した市場価格を資産に書き戻す"""
+        for asset_instance, price in zip(assets, prices.tolist()):
+            _write_market_price(asset_instance, price)
+
+
+def _is_inventory(asset_instance):
+    return hasattr(asset_instance, "market_sales_price")
+
+
+def _base_price(asset_instance):
+    """基準価格(棚卸資産は売価、それ以外は帳簿価額)"""
+    if _is_inventory(asset_instance):
+        return asset_instance.sales_price
+    return asset_instance.value
+
+
+def _market_price(asset_instance):
+    if _is_inventory(asset_instance):
+        return asset_instance.market_sales_price
+    return asset_instance.market_value
+
+
+def _write_market_price(asset_instance, price):
+    if _is_inventory(asset_instance):
+        asset_instance.set_market_sales_price(price)
+    else:
+        asset_instance.set_market_value(price)
@@ -0,0 +1,134 @@
+"""同じシナリオを乱数の種を変えて多数回実行し、決算の分布を集計する
+
+シナリオは GameMaster を組み立てて時間を進めるモジュールレベルの関数(プロセスプールに渡すため):
+
+    def scenario(replica, rng):
+        game_master = GameMaster(market_engine=market.MarketEngine(seed=rng))  # または GameMaster(seed=rng)
+        player = Player("Player1", game_master)
+        ...
+        game_master.advance_time(365)
+        return game_master
+
+    result = montecarlo.run_batch(scenario, replicas=100_000, seed=42)
+    result.stats["Player1"]["現金"].quantiles
+
+ゲーム内の乱数は全て GameMaster.rng から引くため、rng をゲームに渡せば各回は種だけで決まる。
+シナリオの中で random モジュールを使っても再現できるよう、各回の前に random も同じ種で初期化する。
+各回のゲームはワーカーの中で捨て、マスターには各プレイヤーの直近の決算情報だけを返す。
+マスターは勘定ごとの値を array('d') に追記していき、平均・分位点は最後に一度だけ計算する。
+"""
+from array import array
+from collections import namedtuple
+import logging
+import multiprocessing
+import random
+
+import numpy as np
+
+from scripts import gamelog
+
+logger = logging.getLogger(__name__)
+
+# 勘定1つの分布: 平均、標準偏差、分位点(分位 -> 値)、最小、最大
+AccountStats = namedtuple("AccountStats", ["mean", "std", "quantiles", "min", "max"])
+
+# 集計結果: 実行回数、プレイヤー -> 勘定 -> AccountStats、プレイヤー -> 勘定 -> 各回の値の配列
+BatchResult = namedtuple("BatchResult", ["replicas", "stats", "samples"])
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def final_settlements(game_master) -> dict:
+    """各プレイヤーの直近の決算情報 {プレイヤー名: {勘定: 値}}(既定の集計対象)"""
+    return {player.name: player.ends[-1]["end"] for player in game_master.players if player.ends}
+
+
+def _replica_seed(seed, replica):
+    """replica 番目の乱数の種(SeedSequence.spawn の replica 番目の子と同じ)"""
+    return np.random.SeedSequence(seed, spawn_key=(replica,))
+
+
+def _run_replica(task):
+    scenario, summarize, seed, replica = task
+    seed_sequence = _replica_seed(seed, replica)
+    random.seed(int(seed_sequence.generate_state(1, np.uint64)[0]))
+    rng = np.random.default_rng(seed_sequence)
+    game_master = scenario(replica, rng)
+    return {player: {account: float(value) for account, value in accounts.items()}
+            for player, accounts in summarize(game_master).items()}
+
+
+class Aggregator:
+    """
+    各回の決算情報を受け取り、プレイヤー・勘定ごとの値を array('d') に追記する
+
+    ある回にない勘定は0として扱う(途中で初めて現れた勘定は、それまでの回を0で埋める)。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.samples = {}  # プレイヤー -> 勘定 -> array('d')
+
+    def add(self, summary: dict):
+        for player, accounts in summary.items():
+            columns = self.samples.setdefault(player, {})
+            for account, value in accounts.items():
+                if account not in columns:
+                    columns[account] = array("d", bytes(8 * self.count))
+                columns[account].append(value)
+        self.count += 1
+        # この回に現れなかったプレイヤー・勘定を0で埋めて長さを揃える
+        for columns in self.samples.values():
+            for column in columns.values():
+                if len(column) < self.count:
+                    column.append(0.0)
+
+    def result(self, quantiles=QUANTILES) -> BatchResult:
+        """平均・標準偏差・分位点を計算して集計結果を返す"""
+        stats = {}
+        samples = {}
+        for player, columns in self.samples.items():
+            stats[player] = {}
+            samples[player] = {}
+            for account, column in columns.items():
+                values = np.frombuffer(column, dtype=np.float64)
+                points = np.quantile(values, quantiles) if len(values) else np.full(len(quantiles), np.nan)
+                stats[player][account] = AccountStats(
+                    float(values.mean()), float(values.std()),
+                    dict(zip(quantiles, points.tolist())), float(values.min()), float(values.max()))
+                samples[player][account] = values
+        return BatchResult(self.count, stats, samples)
+
+
+def run_batch(scenario, replicas: int, seed=0, workers: int = None, summarize=final_settlements,
+              chunksize: int = 64, quantiles=QUANTILES) -> BatchResult:
+    """
+    シナリオを replicas 回実行し、決算の分布を集計
+
+    :param scenario: scenario(replica, rng) -> GameMaster(モジュールレベルの関数)
+    :param replicas: 実行回数
+    :param seed: 全体の乱数の種(各回には SeedSequence で独立した種を配る。同じ種なら同じ結果)
+    :param workers: ワーカープロセス数(省略時はCPU数。1ならプロセスを使わずに実行)
+    :param summarize: summarize(game_master) -> {プレイヤー: {勘定: 値}}(既定は直近の決算情報)
+    :param chunksize: ワーカーに一度に渡す回数
+    :param quantiles: 計算する分位
+    """
+    if replicas < 1:
+        raise ValueError("実行回数は1以上を指定してください。")
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers < 1:
+        raise ValueError("ワーカー数は1以上を指定してください。")
+    tasks = ((scenario, summarize, seed, replica) for replica in range(replicas))
+    aggregator = Aggregator()
+    if workers == 1:
+        for task in tasks:
+            aggregator.add(_run_replica(task))
+    else:
+        with multiprocessing.get_context().Pool(workers, initializer=gamelog.configure,
+                                                initargs=("headless",)) as pool:
+            # imap は実行順に結果を返すので、同じ種なら集計結果も同じになる
+            for summary in pool.imap(_run_replica, tasks, chunksize=chunksize):
+                aggregator.add(summary)
+    logger.info("モンテカルロ実行が完了しました (%s回)", aggregator.count)
+    return aggregator.result(quantiles)
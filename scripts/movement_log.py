@@ -0,0 +1,163 @@
+"""棚卸資産の入出庫記録"""
+import json
+import os
+import uuid
+from collections import deque, namedtuple
+from datetime import date, datetime
+from itertools import islice
+
+# 1件の記録: 種類、数量、単価、金額、ゲーム内日時、記録後の在庫数量、記録後の在庫簿価
+Movement = namedtuple("Movement", ["kind", "quantity", "price", "value", "date", "stock_quantity", "stock_value"])
+
+
+def render_description(movement: Movement) -> str:
+    """記録から摘要の文字列を作成(読み出し時にのみ呼ばれる)"""
+    kind = movement.kind
+    if kind == "add":
+        if movement.price is None:
+            return f"商品の追加: {movement.quantity}"
+        return f"商品の追加: {movement.quantity}, 更新原価(MAM): {movement.price}"
+    if kind == "subtract":
+        if movement.price is None:
+            return f"在庫が {movement.quantity} 単位減少しました。総コスト: {movement.value}"
+        return f"在庫が {movement.quantity} 単位減少しました。平均単価: {movement.price}, 総コスト: {movement.value}"
+    if kind == "sales_price":
+        # value には旧売価を記録している
+        return (f"売価更新: 旧売価 {movement.value}, 新売価 {movement.price}, 在庫数量 {movement.stock_quantity}, "
+                f"在庫簿価 {movement.stock_value}")
+    if kind == "market_price":
+        return f"市場売価が更新されました: {movement.price}"
+    return kind
+
+
+def _encode_date(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_date(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+class MovementLog:
+    """
+    入出庫記録
+    生の値だけをタプルで保持し、摘要は読み出すときに作る。
+    retention="all" では freeze() した時点までの記録を変更不可のタプル(セグメント)に移し、
+    GameMaster.fork() の分岐間で共有する。
+    retention="disk" では分岐時点までに書き出したファイルの先頭部分を共有し、
+    分岐した側は start_branch() 以降の記録を別のファイルに書き出す。
+
+    保持方法(retention):
+        "all":  全件をメモリに保持
+        "ring": 直近 maxlen 件のみ保持
+        "disk": spill_size 件たまるごとに spill_path へJSON Linesで書き出す
+        "off":  記録しない
+    """
+    RETENTIONS = ("all", "ring", "disk", "off")
+
+    def __init__(self, retention="all", maxlen=1000, spill_path=None, spill_size=1000):
+        if retention not in self.RETENTIONS:
+            raise ValueError(f"無効な保持方法: {retention}. 有効な保持方法は {', '.join(self.RETENTIONS)} です。")
+        if retention == "disk" and spill_path is None:
+            raise ValueError("retention='disk' には spill_path が必要です。")
+        self.retention = retention
+        self.spill_path = spill_path
+        self.spill_size = spill_size
+        self._spilled = 0    # 書き出した記録の件数(引き継いだファイルの分を含む)
+        self._inherited = []  # 分岐元から引き継いだファイル: (パス, 読む件数)
+        self._segments = []  # 封じた記録のタプル
+        self._frozen = 0     # 封じた記録の件数
+        if retention == "ring":
+            self._records = deque(maxlen=maxlen)
+        else:
+            self._records = []
+
+    def __len__(self):
+        return self._spilled + self._frozen + len(self._records)
+
+    def freeze(self) -> list:
+        """
+        ここまでの記録をセグメントに封じ、全セグメントを返す(retention="all" のみ)
+        直近 maxlen 件だけを持つ "ring" は封じずに空を返す(分岐ごとに複製する)。
+        "disk" はメモリ上の記録をファイルに書き出して空を返す(ファイルの既存の行は以後変更されない)。
+        """
+        if self.retention == "disk":
+            if self._records:
+                self._spill()
+            return []
+        if self.retention != "all":
+            return []
+        if self._records:
+            self._segments.append(tuple(self._records))
+            self._frozen += len(self._records)
+            self._records = []
+        return list(self._segments)
+
+    def start_branch(self):
+        """
+        分岐した側の記録で呼ぶ: これまでのファイルは今の件数までを読み、以後は別のファイルに書き出す
+        (新しいファイルは spill_path の拡張子の前に分岐ごとの番号を付けた名前)
+        """
+        if self.retention != "disk":
+            return
+        own = self._spilled - sum(count for _, count in self._inherited)
+        if own:
+            self._inherited.append((self.spill_path, own))
+        root, extension = os.path.splitext(self.spill_path)
+        self.spill_path = f"{root}.{uuid.uuid4().hex[:8]}{extension}"
+
+    def record(self, kind, quantity, price, value, date, stock_quantity, stock_value):
+        """1件記録"""
+        if self.retention == "off":
+            return
+        self._records.append(Movement(kind, quantity, price, value, date, stock_quantity, stock_value))
+        if self.retention == "disk" and len(self._records) >= self.spill_size:
+            self._spill()
+
+    def _spill(self):
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spill_path, "a", encoding="UTF-8") as file:
+            for movement in self._records:
+                file.write(json.dumps([_encode_date(value) if field == "date" else value
+                                       for field, value in zip(Movement._fields, movement)],
+                                      ensure_ascii=False))
+                file.write("\n")
+        self._spilled += len(self._records)
+        self._records = []
+
+    def movements(self):
+        """記録を Movement で返す(書き出し済みの分はファイルから順に読む)"""
+        own = self._spilled - sum(count for _, count in self._inherited)
+        for path, count in self._inherited + [(self.spill_path, own)]:
+            if not count:
+                continue
+            # 分岐元が同じファイルに追記していても、自分の記録の件数だけ読む
+            with open(path, "r", encoding="UTF-8") as file:
+                for line in islice(file, count):
+                    movement = Movement(*json.loads(line))
+                    yield movement._replace(date=_decode_date(movement.date))
+        for segment in self._segments:
+            yield from segment
+        yield from self._records
+
+    def __iter__(self):
+        """従来形式の記録 {"time", "description", "quantity", "value"} を返す"""
+        for movement in self.movements():
+            yield {
+                "time": movement.date,
+                "description": render_description(movement),
+                "quantity": movement.stock_quantity,
+                "value": movement.stock_value
+            }
+
+    def __getitem__(self, index):
+        return list(self)[index]
@@ -0,0 +1,136 @@
+"""プレイヤーをワーカープロセスに分けて時間経過を並列に処理する
+
+    with game_master.parallel(workers=8):
+        for _ in range(12):
+            game_master.advance_time(30)
+
+並列モードの間、各プレイヤーの帳簿・ポートフォリオ・保有資産・借入金台帳はワーカー側のシャード
+(プレイヤーの一部だけを持つGameMaster)が持ち、ワーカーは起動したまま毎回の処理を受け付ける。
+マスターに返すのは決算の要約などの小さな結果だけで、終了時にシャードを回収してマスターに戻す。
+並列モードの間はプレイヤーの操作(仕入・販売・建物の取得など)は行えない(時間経過の処理のみ)。
+"""
+import logging
+import multiprocessing
+import pickle
+
+from scripts import gamelog
+
+logger = logging.getLogger(__name__)
+
+# 並列に実行できるプレイヤーのメソッド
+PLAYER_METHODS = {"process_time", "apply_depreciation", "accrue_debt", "close_period"}
+
+
+def _summary(player):
+    """マスターに返す結果(直近の決算情報)"""
+    return player.ends[-1] if player.ends else None
+
+
+def _worker(conn, log_mode):
+    """ワーカープロセス: シャードを受け取り、終了の指示までコマンドを処理する"""
+    gamelog.configure(log_mode)
+    shard = pickle.loads(conn.recv_bytes())
+    while True:
+        command, args = conn.recv()
+        try:
+            if command == "call":
+                method, method_args, current_date = args
+                shard.current_date = current_date
+                for player in shard.players:
+                    getattr(player, method)(*method_args)
+                result = [_summary(player) for player in shard.players]
+            elif command == "collect":
+                result = shard
+            elif command == "stop":
+                break
+            else:
+                raise ValueError(f"無効なコマンド: {command}")
+        except Exception as error:
+            conn.send(("error", error))
+            continue
+        conn.send(("ok", result))
+        if command == "collect":
+            break
+    conn.close()
+
+
+class ParallelTicker:
+    """
+    プレイヤーのシャードを持つワーカープロセスの集まり
+
+    プレイヤーは登録順に workers 個のシャードへ振り分ける(i 番目のプレイヤーは i % workers 番目)。
+    """
+
+    def __init__(self, game_master, workers=None, log_mode="headless"):
+        """
+        :param game_master: 並列化するGameMaster
+        :param workers: ワーカープロセス数(省略時はCPU数。プレイヤー数より多くはしない)
+        :param log_mode: ワーカー内のログモード(gamelog.configure)
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers < 1:
+            raise ValueError("ワーカー数は1以上を指定してください。")
+        if game_master.market_engine is not None:
+            raise ValueError("市場価格の更新(market_engine)を使うゲームは並列モードにできません。")
+        self.game_master = game_master
+        workers = max(min(workers, len(game_master.players)), 1)
+        self.shards = [list(range(index, len(game_master.players), workers)) for index in range(workers)]
+        self.connections = []
+        self.processes = []
+        context = multiprocessing.get_context()
+        for indices in self.shards:
+            payload = game_master._pack_shard(indices)
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(child, log_mode), daemon=True)
+            process.start()
+            child.close()
+            parent.send_bytes(payload)
+            self.connections.append(parent)
+            self.processes.append(process)
+        logger.info("並列モードを開始しました (ワーカー: %s, プレイヤー: %s)", workers, len(game_master.players))
+
+    def _broadcast(self, command, args=None) -> list:
+        """全ワーカーにコマンドを送り、シャードごとの結果を返す"""
+        for conn in self.connections:
+            conn.send((command, args))
+        results = [conn.recv() for conn in self.connections]
+        for status, result in results:
+            if status == "error":
+                raise result
+        return [result for _, result in results]
+
+    def call(self, method: str, *args) -> dict:
+        """
+        全プレイヤーのメソッドをワーカーで実行
+
+        :return: プレイヤーの番号 -> 直近の決算情報
+        """
+        if method not in PLAYER_METHODS:
+            raise ValueError(f"並列に実行できないメソッド: {method}. 有効なメソッドは {', '.join(sorted(PLAYER_METHODS))} です。")
+        shard_results = self._broadcast("call", (method, args, self.game_master.current_date))
+        return {index: summary
+                for indices, summaries in zip(self.shards, shard_results)
+                for index, summary in zip(indices, summaries)}
+
+    def collect(self):
+        """シャードを回収してマスターに戻し、ワーカーを終了する"""
+        try:
+            for indices, shard in zip(self.shards, self._broadcast("collect")):
+                self.game_master._unpack_shard(indices, shard)
+        finally:
+            self.close()
+        logger.info("並列モードを終了しました。")
+
+    def close(self):
+        """ワーカーを終了(回収していないシャードの変更は失われる)"""
+        for conn in self.connections:
+            try:
+                conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
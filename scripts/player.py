@@ -1,15 +1,32 @@
 """
 プレイヤー＆ゲームマスタの記述
 """
+import contextlib
 from datetime import datetime, timedelta
+import functools
+import logging
+import pickle
 import uuid
 
+import numpy as np
+
 from scripts import (
     asset,
+    asset_table,
+    chunked,
+    clock,
+    debt,
+    journal,
     ledger,
-    manager
+    manager,
+    market,
+    parallel,
+    registry,
+    scheduler,
+    snapshot
     )
 
+logger = logging.getLogger(__name__)
 
 
 class GameMaster:
@@ -19,19 +36,56 @@ class GameMaster:
         "inventory": {"class": asset.Inventory, "description": "棚卸資産"}
     }
         
-    def __init__(self, start_date="2024-01-01"):
-        """ゲームマスターの初期化"""
-        self.current_date = datetime.strptime(start_date, "%Y-%m-%d")
+    ASSET_STORES = {"dict", "table"}
+
+    def __init__(self, start_date="2024-01-01", market_engine=None, asset_store="dict", seed=None,
+                 journal_engine="list", archive_dir=None):
+        """
+        ゲームマスターの初期化
+
+        :param market_engine: 時間経過ごとに市場価格を更新するMarketEngine(省略時は更新しない)
+        :param seed: ゲーム内の乱数のシード(market_engine を指定した場合はそのGeneratorを使う)
+        :param asset_store: 資産の保持方法
+                "dict":     資産オブジェクトをそのまま保持
+                "table":    有形固定資産を列指向のAssetTableに保持(大量の資産向け)
+        :param journal_engine: プレイヤーの仕訳帳の既定の格納方式(Ledger の journal_engine)
+        :param archive_dir: プレイヤーの決算済みの仕訳を封印する既定のディレクトリ(Ledger の archive_dir)
+        """
+        if asset_store not in self.ASSET_STORES:
+            raise ValueError(f"無効な資産ストア: {asset_store}. 有効な値は {', '.join(sorted(self.ASSET_STORES))} です。")
+        if journal_engine not in journal.JOURNAL_ENGINES:
+            raise ValueError(f"無効な仕訳帳エンジン: {journal_engine}. 有効なエンジンは {', '.join(journal.JOURNAL_ENGINES)} です。")
+        self.journal_engine = journal_engine
+        self.archive_dir = archive_dir
+        self.clock = clock.GameClock(datetime.strptime(start_date, "%Y-%m-%d"))
         self.players = []
-        self.event_log = []
-        self.asset_registry = {}  # 全資産の管理
+        self.event_log = chunked.SegmentedList()
+        self.asset_registry = asset_table.AssetTable() if asset_store == "table" else {}  # 全資産の管理
+        self.asset_index = registry.RegistryIndex()  # 所有者・クラス・名前による索引
+        self.scheduler = scheduler.Scheduler()  # 時刻付きイベント(時間経過の処理を登録するとadvance_timeはイベント駆動)
+        self.market_engine = market_engine
+        # ゲーム内の乱数(市場価格・市場売価)は全てこのGeneratorから引く
+        self.rng = market_engine.rng if market_engine is not None else np.random.default_rng(seed)
+        self.parallel_ticker = None  # 並列モードのワーカー(parallel.ParallelTicker)
+        self.last_settlements = {}   # プレイヤー名 -> 直近の決算情報(並列モードでワーカーから受け取る)
         
+    @property
+    def current_date(self) -> datetime:
+        """現在のゲーム内日時(資産と共有する時計の値)"""
+        return self.clock.current_date
+
+    @current_date.setter
+    def current_date(self, value: datetime):
+        self.clock.current_date = value
+
     def construct_instance(self, asset_type, name, *args, **kwargs) -> dict:
         """
         資産を生成しデータベースに登録
         :pram asset_type: 資産タイプ
                 "inventory":    棚卸資産
-                    :param  name:   名前
+                    :param  name:           名前
+                            valuation:      評価方法
+                            movement_log:   入出庫記録(MovementLog)
                 "tangible":     有形固定資産
                     :param  name:                   名前
                             value:                  取得価額
@@ -58,7 +112,9 @@ class GameMaster:
                 raise ValueError(f"無効な資産タイプ: {asset_type}")                
 
         self.asset_registry[asset_id] = asset_instance
-        print(f"資産 '{name}' (ID: {asset_id}, クラス: {asset_instance.__class__}) が登録されました。")
+        self.asset_index.add(asset_id, asset_instance.__class__, name, getattr(asset_instance, "owner", None))
+        asset_instance = self.asset_registry[asset_id]  # AssetTableではビューが返る
+        logger.info("資産 '%s' (ID: %s, クラス: %s) が登録されました。", name, asset_id, asset_instance.__class__)
         asset_info = {"ID": asset_id, "class": asset_instance.__class__, "instance": asset_instance}
         return asset_info
     
@@ -71,18 +127,33 @@ class GameMaster:
         
         return asset_instance
     
-    def _construct_inventory(self, name, valuation="FIFO") -> asset.Inventory:
-        asset_instance = asset.Inventory(name, quantity=0, price=0, valuation=valuation)
+    def _construct_inventory(self, name, valuation="FIFO", movement_log=None) -> asset.Inventory:
+        asset_instance = asset.Inventory(name, quantity=0, price=0, valuation=valuation,
+                                         clock=self.clock, movement_log=movement_log, rng=self.rng)
         return asset_instance
     
     def get_asset_by_id(self, asset_id) -> any:
         """資産IDを基に資産情報を照合＆取得"""
-        if asset_id not in self.asset_registry.keys():
-            raise IndexError(f"ID:'{id}'に該当するアセットが登録されていません")
+        if asset_id not in self.asset_registry:
+            raise IndexError(f"ID:'{asset_id}'に該当するアセットが登録されていません")
         asset_instance = self.asset_registry.get(asset_id)
         
         return asset_instance
 
+    def find_assets(self, owner=..., asset_class=None, name=None) -> list:
+        """
+        所有者・クラス・名前で資産IDを検索(索引を引くため全資産は走査しない)
+
+        :param owner: 所有者名(Noneは所有者なし)
+        :param asset_class: 資産クラス(サブクラスも含む)
+        :param name: 資産名
+        """
+        return self.asset_index.find(owner, asset_class, name)
+
+    def assign_owner(self, asset_id, owner):
+        """索引上の所有者を変更"""
+        self.asset_index.set_owner(asset_id, owner)
+
     def display_assets(self):
         """全資産を表示"""
         print("\n=== 登録済み資産 ===")
@@ -93,10 +164,16 @@ class GameMaster:
         """
         ゲーム全体の時間を進め、各プレイヤーや資産の状態を更新。
 
+        時間経過の処理(EVENT_KINDS)をスケジュールしていれば、期日の来たイベントだけを実行日の順に処理する
+        (イベント駆動)。そうでなければ期間中の custom イベントを実行した後、従来どおり1回分の処理を行う。
+
         :param days: 進める日数
         """
+        target = self.current_date + timedelta(days=days)
+        event_driven = self._time_events_scheduled()
+        self.scheduler.run_until(target.toordinal(), before=self._move_clock_to)
         # 時間を進める
-        self.current_date += timedelta(days=days)
+        self.current_date = target
 
         # イベントログに記録
         self.log_event({
@@ -104,17 +181,187 @@ class GameMaster:
             "event": f"{days}日進行",
             "details": {}
         })
+        if not event_driven:
+            self._tick(days)
 
+        logger.info("%s日間時間が進行しました。現在日時: %s", days, self.current_date.date())
+
+    def _tick(self, days: int):
+        """全プレイヤー・全資産の時間経過処理(従来の1回分の進行)"""
         # 各プレイヤーの時間経過処理を呼び出す
-        for player in self.players:
-            player.process_time(days)
+        self._for_each_player("process_time", days)
 
         # 各資産の時間経過処理(?)
         for asset_id, asset_instance in self.asset_registry.items():
             if hasattr(asset_instance, "update_with_time"):
                 asset_instance.update_with_time(days)
 
-        print(f"{days}日間時間が進行しました。現在日時: {self.current_date.strftime('%Y-%m-%d')}")
+        # 市場価格の更新
+        if self.market_engine is not None:
+            self.update_market_prices(days)
+
+    def _time_events_scheduled(self) -> bool:
+        """時間経過の処理(custom 以外のイベント)がスケジュールされているか"""
+        return any(event.kind in self.EVENT_KINDS for event in self.scheduler.events())
+
+    def _move_clock_to(self, day: int):
+        self.current_date = datetime.fromordinal(day)
+
+    EVENT_KINDS = {
+        "tick":         "従来の advance_time 1回分の処理(減価償却・利息・棚卸・決算・市場価格)",
+        "depreciation": "全プレイヤーの減価償却",
+        "interest":     "全プレイヤーの借入金の利息と約定返済",
+        "close":        "全プレイヤーの実地棚卸と決算",
+        "prices":       "市場価格の更新"
+    }
+
+    def schedule(self, kind: str, every: int = None, start: int = None, callback=None) -> scheduler.ScheduledEvent:
+        """
+        時刻付きイベントを登録
+        EVENT_KINDS のイベントを登録している間、advance_time は従来の一括処理を行わずイベント駆動になる
+        (custom イベントだけなら一括処理はそのまま行う)。
+
+        :param kind: EVENT_KINDS のいずれか、または "custom"
+        :param every: 繰り返す間隔(日)。Noneなら1回のみ
+        :param start: 初回の実行日(現在からの日数)。省略時は every 日後
+        :param callback: kind="custom" のとき callback(game_master, elapsed) で呼ぶ関数
+                         (save_snapshot / fork するゲームではモジュールレベルの関数にすること)
+        :return: 取り消しに使うイベント(self.scheduler.cancel(event))
+        """
+        if kind == "custom":
+            if callback is None:
+                raise ValueError("customイベントには callback を指定してください。")
+            handler = functools.partial(self._on_custom, callback)
+        elif kind in self.EVENT_KINDS:
+            handler = getattr(self, f"_on_{kind}")
+        else:
+            raise ValueError(f"無効なイベント: {kind}. 有効なイベントは {', '.join(self.EVENT_KINDS)}, custom です。")
+        if start is None:
+            if every is None:
+                raise ValueError("every か start のどちらかを指定してください。")
+            start = every
+        today = self.current_date.toordinal()
+        return self.scheduler.schedule(today + start, handler, kind, every, previous_time=today)
+
+    def _on_custom(self, callback, day, elapsed):
+        callback(self, elapsed)
+
+    def _on_tick(self, day, elapsed):
+        self._tick(elapsed)
+
+    def _on_depreciation(self, day, elapsed):
+        self._for_each_player("apply_depreciation", elapsed)
+
+    def _on_interest(self, day, elapsed):
+        self._for_each_player("accrue_debt", elapsed)
+
+    def _on_close(self, day, elapsed):
+        self._for_each_player("close_period")
+
+    def _for_each_player(self, method: str, *args):
+        """全プレイヤーのメソッドを呼ぶ(並列モードではワーカーで実行し、決算の要約だけを受け取る)"""
+        if self.parallel_ticker is None:
+            for player in self.players:
+                getattr(player, method)(*args)
+            return
+        for index, summary in self.parallel_ticker.call(method, *args).items():
+            if summary is not None:
+                self.last_settlements[self.players[index].name] = summary
+
+    def start_parallel(self, workers: int = None, log_mode="headless"):
+        """
+        並列モードを開始: プレイヤーをワーカープロセスに振り分け、時間経過を並列に処理する
+        (終了するまでプレイヤーの操作は行えない)
+
+        :param workers: ワーカープロセス数(省略時はCPU数)
+        :param log_mode: ワーカー内のログモード
+        """
+        if self.parallel_ticker is not None:
+            raise ValueError("すでに並列モードです。")
+        self.parallel_ticker = parallel.ParallelTicker(self, workers, log_mode)
+
+    def stop_parallel(self):
+        """並列モードを終了し、ワーカーのプレイヤーと資産をマスターに戻す"""
+        if self.parallel_ticker is None:
+            raise ValueError("並列モードではありません。")
+        try:
+            self.parallel_ticker.collect()
+        finally:
+            self.parallel_ticker = None
+
+    @contextlib.contextmanager
+    def parallel(self, workers: int = None, log_mode="headless"):
+        """with文で並列モードを使う(ブロックを抜けるとプレイヤーと資産を回収する)"""
+        self.start_parallel(workers, log_mode)
+        try:
+            yield self
+        except BaseException:
+            # 処理が失敗したときはシャードを回収せず、並列モード開始時の状態のまま戻る
+            self.parallel_ticker.close()
+            self.parallel_ticker = None
+            raise
+        self.stop_parallel()
+
+    def _pack_shard(self, indices) -> bytes:
+        """指定したプレイヤーとその保有資産だけを持つシャードを作り、シリアライズする"""
+        shard = GameMaster(asset_store="table" if isinstance(self.asset_registry, asset_table.AssetTable) else "dict",
+                           journal_engine=self.journal_engine, archive_dir=self.archive_dir)
+        shard.clock = self.clock
+        shard.rng = self.rng
+        shard.players = [self.players[index] for index in indices]
+        for player in shard.players:
+            for asset_info in player.portfolio:
+                shard.asset_registry[asset_info["ID"]] = self.asset_registry[asset_info["ID"]]
+        try:
+            for player in shard.players:
+                player._bind(shard)
+            return pickle.dumps(shard, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for player in shard.players:
+                player._bind(self)
+
+    def _unpack_shard(self, indices, shard):
+        """ワーカーから回収したシャードのプレイヤーと保有資産をマスターに戻す"""
+        for index, player in zip(indices, shard.players):
+            for asset_info in player.portfolio:
+                self.asset_registry[asset_info["ID"]] = shard.asset_registry[asset_info["ID"]]
+            player._bind(self)
+            self.players[index] = player
+
+    def _on_prices(self, day, elapsed):
+        self.update_market_prices(elapsed)
+
+    def update_market_prices(self, days=1):
+        """登録済みの全資産の市場価格をMarketEngineでまとめて更新"""
+        if self.market_engine is None:
+            self.market_engine = market.MarketEngine(seed=self.rng)
+        if isinstance(self.asset_registry, asset_table.AssetTable):
+            self.asset_registry.refresh_market(self.market_engine, days)
+        else:
+            self.market_engine.refresh(self.asset_registry.values(), days)
+
+    def save_snapshot(self, path) -> dict:
+        """ゲーム全体をスナップショットファイルに保存(snapshot.save)"""
+        header = snapshot.save(self, path)
+        logger.info("スナップショットを保存しました: %s (%s)", path, header["date"])
+        return header
+
+    @staticmethod
+    def load_snapshot(path) -> "GameMaster":
+        """スナップショットファイルからゲーム全体を復元(snapshot.load)"""
+        game_master = snapshot.load(path)
+        logger.info("スナップショットを読み込みました: %s (%s)", path, game_master.get_current_date())
+        return game_master
+
+    def fork(self) -> "GameMaster":
+        """
+        ゲームを分岐させる(what-if 用)
+        決算済みの期間・仕訳帳のここまでの取引・イベントログなど以後変更されない履歴は元のゲームと共有し、
+        分岐後に変わりうる状態(残高・資産・在庫・借入金・時計など)だけを複製する。
+        """
+        branch = snapshot.fork(self)
+        logger.info("ゲームを分岐しました (%s)", self.get_current_date())
+        return branch
 
     def log_event(self, event):
         """
@@ -123,7 +370,7 @@ class GameMaster:
         :param event: 記録するイベントデータ
         """
         self.event_log.append(event)
-        print(f"イベント記録: {event}")
+        logger.info("イベント記録: %s", event)
 
     def get_current_date(self):
         """
@@ -137,25 +384,36 @@ class GameMaster:
 class Player:
     """Playerクラス
     """
-    def __init__(self, name: chr, game_master: GameMaster, initial_cash=5000):
+    def __init__(self, name: chr, game_master: GameMaster, initial_cash=5000, keep_purchase_book=True,
+                 journal_engine=None, archive_dir=None):
+        """
+        :param keep_purchase_book: 仕入帳(product_lists)に全ての仕入を残すか
+                                   (棚卸調整は商品ごとの当期仕入高 period_purchases を使うため必須ではない)
+        :param journal_engine: 仕訳帳の格納方式("list" / "columnar"。省略時は GameMaster の既定)
+        :param archive_dir: 決算済みの仕訳を封印するディレクトリ(省略時は GameMaster の既定)
+        """
         self.name = name
         self.game_master = game_master
-        self.ledger_manager = ledger.Ledger(current_date=game_master.current_date)
+        self.ledger_manager = ledger.Ledger(current_date=game_master.current_date,
+                                            journal_engine=journal_engine or game_master.journal_engine,
+                                            archive_dir=archive_dir or game_master.archive_dir)
         # 各マネージャーオブジェクトの設定
         self.building_manager = manager.BuildingManager(game_master, self)
         self.purchase_manager = manager.PurchaseManager(game_master,self)
         self.sales_manager = manager.SalesManager(game_master, self)
+        self.finance_manager = manager.FinanceManager(game_master, self)
         
         # Playerの保持するアセット情報
-        self.portfolio = []  # e.g. list({"ID": id, "instance": asset_instance})
-        self.product_lists = []
-        self.ends = []  # 決算情報
+        self.portfolio = registry.Portfolio()  # 資産ID -> {"ID": id, "instance": asset_instance}
+        self.product_lists = chunked.SegmentedList() if keep_purchase_book else None  # 仕入帳
+        self.period_purchases = {}  # 商品ID -> 未調整の当期仕入高(棚卸調整と決算でリセット)
+        self.debt_book = debt.DebtBook(game_master.clock)  # 借入金台帳
+        self.ends = chunked.SegmentedList()  # 決算情報
 
         # 初期現金の設定
-        self.ledger_manager.execute_transaction([
-            ("現金", initial_cash),
-            ("資本金", -initial_cash)
-        ], description=f"会社設立 資本金: {initial_cash:,}")
+        self.ledger_manager.post(
+            self.ledger_manager.templates["capital"], initial_cash,
+            description=f"会社設立 資本金: {initial_cash:,}")
 
     def process_time(self, days: int):
         """
@@ -163,110 +421,79 @@ class Player:
 
         :param days: 時間経過の日数
         """
+        # 資産の種類ごとに処理する(ポートフォリオは種類別に分けて保持している)
+        self.apply_depreciation(days)
+        # 他の資産タイプに対応したロジックを追加する場合はここに記述
+        self.accrue_debt(days)
+        self.close_period()
+
+        logger.info("[%s]時間経過が処理されました (%s日)。", self.name, days)
+
+    def _bind(self, game_master: GameMaster):
+        """所属するGameMaster(並列モードのシャードなど)を付け替え、保有資産をその資産データベースから引き直す"""
+        self.game_master = game_master
+        for manager_obj in (self.building_manager, self.purchase_manager, self.sales_manager, self.finance_manager):
+            manager_obj.game_master = game_master
+        self.debt_book.clock = game_master.clock
+        portfolio = registry.Portfolio()
         for asset_info in self.portfolio:
-            asset_obj: asset.Asset = asset_info.get("instance")
-            asset_id: chr = asset_info.get("ID")
-
-            # Tangible 資産の場合は減価償却を実行
-            if isinstance(asset_obj, asset.Tangible):
-                depreciation = asset_obj.apply_depreciation(days)
-                self.ledger_manager.execute_transaction([
-                    ("減価償却費", depreciation),
-                    ("減価償却累計額", -depreciation)
-                ], description=f"{asset_obj.name} の減価償却 ({days}日)")
-
-            # Inventory: 実地棚卸の手続きを実行
-            if isinstance(asset_obj, asset.Inventory):
-                self.perform_inventory_audit(product_id=asset_id)
-                
-            # 他の資産タイプに対応したロジックを追加する場合はここに記述
-            
+            asset_instance = game_master.asset_registry[asset_info["ID"]]
+            if hasattr(asset_instance, "clock"):
+                asset_instance.clock = game_master.clock
+            if hasattr(asset_instance, "rng"):
+                asset_instance.rng = game_master.rng
+            portfolio.append({**asset_info, "instance": asset_instance})
+        self.portfolio = portfolio
+
+    def _sync_date(self):
+        """帳簿の日付をゲーム内時間に合わせる"""
+        self.ledger_manager.current_date = self.game_master.current_date
+
+    def apply_depreciation(self, days: int):
+        """Tangible: 減価償却をまとめて計算し、資産ごとに仕訳"""
+        self._sync_date()
+        depreciation_template = self.ledger_manager.templates["depreciation"]
+        tangibles = list(self.portfolio.tangibles.values())
+        for asset_obj, depreciation in zip(tangibles, asset.apply_depreciation_batch(tangibles, days).tolist()):
+            self.ledger_manager.post(
+                depreciation_template, depreciation,
+                description=f"{asset_obj.name} の減価償却 ({days}日)")
+
+    def accrue_debt(self, days: int):
+        """借入金の利息と約定返済を計上"""
+        self._sync_date()
+        if len(self.debt_book):
+            self.finance_manager.post_accruals(days)
+
+    def close_period(self):
+        """Inventory の実地棚卸を行い、帳簿を締める"""
+        self._sync_date()
+        for asset_id in list(self.portfolio.inventories):
+            self.perform_inventory_audit(product_id=asset_id)
+
         # ledger の〆切
         end = self.ledger_manager.execute_settlement()
+        self.period_purchases.clear()
         self.ends.append({"date": self.game_master.current_date,
                           "end" : end})
 
-        print(f"[{self.name}]時間経過が処理されました ({days}日)。")
-
     def aquire_building(self, asset_id: chr, value: int):
-        """建物の(登録＆)取得"""
-        target : asset.Building = self.game_master.get_asset_by_id(asset_id)
-
-        if value <= 0:
-            raise ValueError("取得価額は0より大きくなければなりません")
-
-        # 所有者の登録
-        target.set_owner(self.name)
-
-        asset_info = {"ID": asset_id, "instance": target}
-        self.portfolio.append(asset_info)
-
-        self.ledger_manager.execute_transaction([
-            ("建物", target.value),
-            ("現金", -target.value)
-        ], description=f"建物の取得　建物名：{target.name}")
-        
-        print(f"Building instance type: {type(target)}")
+        """建物の(登録＆)取得(BuildingManager に委譲)"""
+        self.building_manager.aquire_building(asset_id, value)
 
     def dispose_building(self, asset_id: str, sales_price: int = None):
-        """
-        プレイヤーが所有する建物を売却または除却する。
-        
-        :param asset_id: 売却対象の資産ID
-        :param sales_price: 売却価額 (デフォルトは建物の市場価値)
-        """
-        # 対象資産を取得
-        asset_info = next((item for item in self.portfolio if item["ID"] == asset_id), None)
-
-        if not asset_info:
-            raise ValueError(f"指定された資産ID({asset_id})はポートフォリオに存在しません。")
-
-        # 資産インスタンスを取得
-        target_asset : asset.Building = asset_info.get("instance")
-
-        if not isinstance(target_asset, asset.Building):
-            raise ValueError("指定された資産は建物ではありません。")
-
-        # 売却価額の設定 (デフォルトは市場価値)
-        if sales_price is None:
-            sales_price = target_asset.market_value
-
-        # 簿価と売却損益の計算
-        book_value = target_asset.value
-        accumulated_depreciation = target_asset.accumulated_depreciation
-        net_book_value = book_value - accumulated_depreciation
-
-        if sales_price >= net_book_value:
-            gain = sales_price - net_book_value
-            self.ledger_manager.execute_transaction([
-                ("現金", sales_price),
-                ("建物", -book_value),
-                ("減価償却累計額", accumulated_depreciation),
-                ("固定資産売却益", -gain)
-            ], description=f"建物の売却: {target_asset.name}")
-        else:
-            loss = net_book_value - sales_price
-            self.ledger_manager.execute_transaction([
-                ("現金", sales_price),
-                ("建物", -book_value),
-                ("減価償却累計額", accumulated_depreciation),
-                ("固定資産売却損", loss)
-            ], description=f"建物の売却: {target_asset.name}")
-
-        # ポートフォリオから削除
-        self.portfolio = [item for item in self.portfolio if item["ID"] != asset_id]
-
-        print(f"建物 '{target_asset.name}' が売却されました。")
-        
-    
+        """プレイヤーが所有する建物を売却または除却する(BuildingManager に委譲)"""
+        self.building_manager.dispose_building(asset_id, sales_price)
+
     def redister_product(self, product_id:chr) -> asset.Inventory:
         """商品の登録"""
         product : asset.Inventory = self.game_master.get_asset_by_id(product_id)
         
-        asset_info = {"ID" : product_id, "asset_type": product.__class__, "name": product.name}
+        asset_info = {"ID" : product_id, "asset_type": product.__class__, "name": product.name, "instance": product}
         self.portfolio.append(asset_info)
+        self.game_master.assign_owner(product_id, self.name)
         
-        print(f"[{self.name}]**商品が登録されました** 商品名：{product.name}")
+        logger.info("[%s]**商品が登録されました** 商品名：%s", self.name, product.name)
         return product
             
     def purchase_product(self, product_id:chr,
@@ -279,48 +506,54 @@ class Player:
         product.add_inventory(quantity, price, fringe_cost)
         purchase_cost = quantity * price + fringe_cost
         # 仕入帳、勘定元帳への記入
-        self.product_lists.append({"name": product.name, "quantity": purchase_cost})
-        self.ledger_manager.execute_transaction([
-            ("仕入", purchase_cost),
-            ("現金", -purchase_cost)
-        ], description=f"商品の仕入れ　商品名：{product.name} 個数：{quantity} 単価：{price}")
+        self.record_purchase(product_id, product, purchase_cost)
+        self.ledger_manager.post(
+            self.ledger_manager.templates["purchase"], purchase_cost,
+            description=f"商品の仕入れ　商品名：{product.name} 個数：{quantity} 単価：{price}")
         
     def sale_product(self, product_id:chr, 
                      quantity:int, sales_price:int = None, revert:int = 0):
         """商品の販売"""
         product : asset.Inventory = self.game_master.get_asset_by_id(product_id) 
         if sales_price:
-            print(f"[{self.name},{product.name}]**売価が更新されました**　更新後：{sales_price}")
+            logger.info("[%s,%s]**売価が更新されました**　更新後：%s", self.name, product.name, sales_price)
             if sales_price <= 0 :
-                print("警告：売価が0以下になっています") 
+                logger.warning("警告：売価が0以下になっています")
         else:
             sales_price = product.sales_price
         
         product.subtract_inventory(quantity, sales_price)   
         sale_value = quantity * sales_price - revert 
         # 勘定元帳への記入
-        self.ledger_manager.execute_transaction([
-            ("現金", sale_value),
-            ("売上高", -sale_value)
-        ],  description=f"商品の売上 商品名：{product.name} 個数：{quantity} 単価：{product.sales_price}")
+        self.ledger_manager.post(
+            self.ledger_manager.templates["sale"], sale_value,
+            description=f"商品の売上 商品名：{product.name} 個数：{quantity} 単価：{product.sales_price}")
         
+    def record_purchase(self, product_id: chr, product: asset.Inventory, purchase_cost):
+        """仕入高を商品ごとの当期仕入高に加算し、仕入帳があれば記入"""
+        self.period_purchases[product_id] = self.period_purchases.get(product_id, 0) + purchase_cost
+        if self.product_lists is not None:
+            self.product_lists.append({"ID": product_id, "name": product.name, "quantity": purchase_cost})
+
     def perform_inventory_audit(self, product_id:chr, loss:int=0):
         """棚卸調整と売上原価計算"""
         product : asset.Inventory = self.game_master.get_asset_by_id(product_id)  
         inventory_shortage, appraisal_loss, new_value, initial_value = product.perform_inventory_adjustment(loss)
 
         # 売上原価計算
-        total_purchase = sum(item["quantity"] for item in self.product_lists if item["name"] == product.name)
-        cost_of_sales = initial_value + total_purchase - new_value - inventory_shortage - appraisal_loss
-
-        # 勘定元帳への記録・決算作業の実行
-        self.ledger_manager.execute_transaction([
-            ("売上原価", cost_of_sales),
-            ("仕入", -total_purchase),
-            ("棚卸減耗", inventory_shortage),
-            ("商品評価損", appraisal_loss),
-            ("棚卸資産", new_value)
-        ], description=f"棚卸調整 商品: {product.name}")
+        # 総平均法・移動平均法の原価は浮動小数になるため、1円単位に丸めて売上原価を差額で求める
+        # (棚卸資産の残高は直近の棚卸の簿価を丸めた値になる)
+        total_purchase = self.period_purchases.pop(product_id, 0)
+        inventory_shortage, appraisal_loss = round(inventory_shortage), round(appraisal_loss)
+        inventory_change = round(new_value) - round(initial_value)
+        cost_of_sales = total_purchase - inventory_shortage - appraisal_loss - inventory_change
+
+        # 勘定元帳への記録・決算作業の実行(棚卸資産は前回の棚卸からの増減を計上)
+        amounts = (cost_of_sales, -total_purchase, inventory_shortage, appraisal_loss, inventory_change)
+        if any(amounts):
+            self.ledger_manager.post(
+                self.ledger_manager.templates["inventory_audit"], amounts,
+                description=f"棚卸調整 商品: {product.name}")
         
         product.update_initial_value()
         
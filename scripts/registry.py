@@ -0,0 +1,154 @@
+"""資産の索引(所有者・クラス・名前)とプレイヤーのポートフォリオ"""
+from scripts import asset
+
+
+class RegistryIndex:
+    """
+    GameMaster.asset_registry の二次索引
+    所有者 -> 資産ID、クラス -> 資産ID、名前 -> 資産ID を、登録順を保つdict(順序付き集合)で持つ。
+    資産IDごとの逆引きも持つため、所有者の変更や削除は O(1)。
+    """
+
+    def __init__(self):
+        self.by_owner = {}
+        self.by_class = {}
+        self.by_name = {}
+        self._keys = {}  # 資産ID -> (所有者, クラス, 名前)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, asset_id):
+        return asset_id in self._keys
+
+    @staticmethod
+    def _add(index, key, asset_id):
+        index.setdefault(key, {})[asset_id] = None
+
+    @staticmethod
+    def _discard(index, key, asset_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(asset_id, None)
+            if not ids:
+                del index[key]
+
+    def add(self, asset_id, asset_class, name, owner=None):
+        """資産を索引に追加"""
+        if asset_id in self._keys:
+            self.remove(asset_id)
+        self._keys[asset_id] = (owner, asset_class, name)
+        self._add(self.by_owner, owner, asset_id)
+        self._add(self.by_class, asset_class, asset_id)
+        self._add(self.by_name, name, asset_id)
+
+    def set_owner(self, asset_id, owner):
+        """所有者を変更(Noneで所有者なし)"""
+        old_owner, asset_class, name = self._keys[asset_id]
+        self._discard(self.by_owner, old_owner, asset_id)
+        self._add(self.by_owner, owner, asset_id)
+        self._keys[asset_id] = (owner, asset_class, name)
+
+    def owner_of(self, asset_id):
+        return self._keys[asset_id][0]
+
+    def remove(self, asset_id):
+        """資産を索引から削除"""
+        owner, asset_class, name = self._keys.pop(asset_id)
+        self._discard(self.by_owner, owner, asset_id)
+        self._discard(self.by_class, asset_class, asset_id)
+        self._discard(self.by_name, name, asset_id)
+
+    def find(self, owner=..., asset_class=None, name=None) -> list:
+        """
+        条件に合う資産IDを登録順で返す(指定した条件は全て満たすもの)
+
+        :param owner: 所有者名(Noneは所有者なし。省略時は条件にしない)
+        :param asset_class: クラス(サブクラスも含む)
+        :param name: 資産名
+        """
+        candidates = []
+        if owner is not ...:
+            candidates.append(self.by_owner.get(owner, {}))
+        if asset_class is not None:
+            ids = {}
+            for registered_class, class_ids in self.by_class.items():
+                if issubclass(registered_class, asset_class):
+                    ids.update(class_ids)
+            candidates.append(ids)
+        if name is not None:
+            candidates.append(self.by_name.get(name, {}))
+        if not candidates:
+            return list(self._keys)
+        # 最も小さい集合を走査して残りで絞り込む
+        candidates.sort(key=len)
+        smallest, rest = candidates[0], candidates[1:]
+        return [asset_id for asset_id in smallest if all(asset_id in ids for ids in rest)]
+
+
+class Portfolio:
+    """
+    プレイヤーの保有資産
+    資産ID -> {"ID", "instance", ...} のdictで持ち、追加・検索・削除は O(1)。
+    時間経過の処理に使うため、資産を種類(有形固定資産 / 棚卸資産 / その他)ごとにも分けて持つ。
+    反復すると従来のリストと同じく資産情報のdictを登録順に返す。
+    """
+    PARTITIONS = (("tangible", asset.Tangible), ("inventory", asset.Inventory))
+
+    def __init__(self):
+        self._entries = {}
+        self._partitions = {kind: {} for kind, _ in self.PARTITIONS}
+        self._partitions["other"] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def __contains__(self, asset_id):
+        return asset_id in self._entries
+
+    def _kind(self, asset_instance):
+        for kind, asset_class in self.PARTITIONS:
+            if isinstance(asset_instance, asset_class):
+                return kind
+        return "other"
+
+    def append(self, asset_info: dict):
+        """資産情報 {"ID": 資産ID, "instance": 資産, ...} を追加"""
+        asset_id = asset_info["ID"]
+        if asset_id in self._entries:
+            self.remove(asset_id)
+        self._entries[asset_id] = asset_info
+        self._partitions[self._kind(asset_info.get("instance"))][asset_id] = asset_info.get("instance")
+
+    def get(self, asset_id, default=None) -> dict:
+        """資産情報を取得"""
+        return self._entries.get(asset_id, default)
+
+    def remove(self, asset_id) -> dict:
+        """
+        資産を削除して資産情報を返す
+
+        :raises ValueError: ポートフォリオに存在しない場合
+        """
+        asset_info = self._entries.pop(asset_id, None)
+        if asset_info is None:
+            raise ValueError(f"指定された資産ID({asset_id})はポートフォリオに存在しません。")
+        for partition in self._partitions.values():
+            if partition.pop(asset_id, None) is not None:
+                break
+        return asset_info
+
+    def partition(self, kind) -> dict:
+        """種類ごとの 資産ID -> 資産 ("tangible", "inventory", "other")"""
+        return self._partitions[kind]
+
+    @property
+    def tangibles(self) -> dict:
+        return self._partitions["tangible"]
+
+    @property
+    def inventories(self) -> dict:
+        return self._partitions["inventory"]
@@ -0,0 +1,107 @@
+"""時刻付きイベントの優先度付きキュー"""
+import heapq
+import itertools
+
+
+class ScheduledEvent:
+    """
+    予定されたイベント1件(time, previous_time は序数日付)
+
+    interval を持つイベントは実行のたびに同じオブジェクトを interval 日後へ積み直すため、
+    登録時に受け取ったイベントでいつでも取り消せる。
+    """
+    __slots__ = ("time", "seq", "kind", "callback", "interval", "previous_time", "cancelled")
+
+    def __init__(self, time, seq, kind, callback, interval=None, previous_time=None):
+        self.time = time
+        self.seq = seq
+        self.kind = kind
+        self.callback = callback
+        self.interval = interval
+        self.previous_time = time if previous_time is None else previous_time
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.time, self.seq) < (other.time, other.seq)
+
+    def __repr__(self):
+        return f"<ScheduledEvent {self.kind} day={self.time} interval={self.interval}>"
+
+
+class Scheduler:
+    """
+    イベントを実行日の順に処理するスケジューラー(heapq)
+
+    同じ日のイベントは登録順に実行する(繰り返しのイベントも最初の登録順を保つ)。
+    取り消したイベントはキューに残し、先頭に来たときに捨てる。
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._seq = itertools.count()
+        self._pending = 0  # 取り消されていないイベントの数
+
+    def __len__(self):
+        return self._pending
+
+    def schedule(self, time, callback, kind="custom", interval=None, previous_time=None) -> ScheduledEvent:
+        """
+        イベントを登録
+
+        :param time: 実行日(序数日付)
+        :param callback: callback(day, elapsed) の形で呼ばれる関数
+                         (day: 実行日、elapsed: 前回の実行(初回は previous_time)からの日数)
+        :param kind: イベントの種類
+        :param interval: 繰り返す間隔(日)。Noneなら1回のみ
+        :param previous_time: 初回の elapsed の起点(省略時は time)
+        """
+        if interval is not None and interval <= 0:
+            raise ValueError("繰り返しの間隔は1日以上を指定してください。")
+        event = ScheduledEvent(time, next(self._seq), kind, callback, interval, previous_time)
+        heapq.heappush(self._queue, event)
+        self._pending += 1
+        return event
+
+    def cancel(self, event: ScheduledEvent):
+        """イベントを取り消す(繰り返しのイベントは以降の全ての回)"""
+        if not event.cancelled:
+            event.cancelled = True
+            self._pending -= 1
+
+    def _drop_cancelled(self):
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+
+    def next_time(self):
+        """次のイベントの実行日(なければNone)"""
+        self._drop_cancelled()
+        return self._queue[0].time if self._queue else None
+
+    def run_until(self, until, before=None) -> int:
+        """
+        until 日までに実行日が来るイベントを順に実行し、実行した数を返す
+
+        :param before: 各イベントの直前に before(day) を呼ぶ(時計を実行日に合わせるなど)
+        """
+        count = 0
+        while True:
+            self._drop_cancelled()
+            if not self._queue or self._queue[0].time > until:
+                return count
+            event = heapq.heappop(self._queue)
+            day, elapsed = event.time, event.time - event.previous_time
+            if event.interval is None:
+                self._pending -= 1
+            else:
+                event.previous_time = day
+                event.time = day + event.interval
+                heapq.heappush(self._queue, event)
+            if before is not None:
+                before(day)
+            event.callback(day, elapsed)
+            count += 1
+
+    def events(self, kind=None) -> list:
+        """待機中のイベントを実行順で返す"""
+        return sorted(event for event in self._queue
+                      if not event.cancelled and (kind is None or event.kind == kind))
@@ -0,0 +1,221 @@
+"""ゲーム全体(GameMaster・プレイヤー・帳簿・資産・イベントログ)のスナップショット
+
+ファイル構成:
+    MAGIC(8) | ヘッダー長(uint64) | ヘッダー(JSON) | 64バイト境界までの詰め物 | pickle | バッファ列
+オブジェクトのグラフは pickle プロトコル5で書き、列指向の仕訳・原価層・資産テーブル・借入金台帳の
+配列(array.array / NumPy配列)は pickle の外に生のバイト列(バッファ)として64バイト境界に並べる。
+ヘッダーにはバージョン、ゲーム内日付、pickle とバッファの位置(データ部の先頭からの相対位置)を持つ。
+
+読み込みはファイルをメモリマップ(書き込み時コピー)し、バッファはコピーせずに pickle に渡す。
+NumPy配列はマップしたページをそのまま使い、書き換えたページだけがプロセス内で複製される。
+array.array はマップから1回の memcpy で復元する。
+
+アーカイブ済みの仕訳(ArchiveSegment)や退避済みの入出庫記録はファイルのパスだけを保存するため、
+それらのファイルは別に残しておく必要がある。
+
+fork() は同じ仕組みでゲームをメモリ上で分岐させる。以後変更されない履歴(仕訳帳の既存の取引、
+決算振替、決算情報、イベントログ、仕入帳、入出庫記録、共有の勘定科目表)はセグメントに封じ、
+列(仕訳帳・勘定ごとの索引・原価層)は埋まったチャンクを、pickle の persistent_id で参照だけを渡して
+分岐間で共有する。複製するのは末尾の書きかけの部分とそれ以外の状態だけなので、分岐の手間は
+履歴の長さにほとんど依存しない。
+"""
+import array
+import gc
+import io
+import json
+import mmap
+import pickle
+import struct
+
+MAGIC = b"ACSGSNAP"
+VERSION = 5  # 2: 仕訳帳・索引・原価層をチャンクに、履歴のリストをセグメントに分けて保持
+            # 3: 償却表が定率法の残存率を1年あたりで持つ
+            # 4: 列指向の仕訳帳が最近の摘要を dict で共有する
+            # 5: 入出庫記録が分岐元から引き継いだファイルを持つ
+ALIGNMENT = 64
+MIN_BUFFER_SIZE = 4096  # これより小さい配列は pickle の中にそのまま書く
+
+
+def _restore_array(typecode, buffer):
+    restored = array.array(typecode)
+    restored.frombytes(buffer)
+    return restored
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """array.array をバッファとして書き出す Pickler"""
+
+    def reducer_override(self, obj):
+        if type(obj) is array.array:
+            return _restore_array, (obj.typecode, pickle.PickleBuffer(obj))
+        return NotImplemented
+
+
+class _SharingPickler(pickle.Pickler):
+    """shared に含まれるオブジェクトを複製せず、参照(id)だけを書き出す Pickler"""
+
+    def __init__(self, file, shared):
+        super().__init__(file, protocol=5)
+        self._shared = shared
+
+    def persistent_id(self, obj):
+        key = id(obj)
+        return key if key in self._shared else None
+
+
+class _SharingUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared):
+        super().__init__(file)
+        self._shared = shared
+
+    def persistent_load(self, key):
+        return self._shared[key]
+
+
+def _padding(offset):
+    return -offset % ALIGNMENT
+
+
+def save(game_master, path) -> dict:
+    """
+    ゲーム全体をスナップショットファイルに保存し、ヘッダーを返す
+
+    :raises ValueError: 並列モード中など、保存できない状態の場合
+    """
+    if getattr(game_master, "parallel_ticker", None) is not None:
+        raise ValueError("並列モード中は保存できません。stop_parallel() の後で保存してください。")
+    buffers = []
+
+    def keep_out_of_band(buffer):
+        # 戻り値が真ならpickleの中に書かれる
+        if buffer.raw().nbytes < MIN_BUFFER_SIZE:
+            return True
+        buffers.append(buffer)
+        return False
+
+    with open(path, "wb") as file:
+        stream = io.BytesIO()
+        try:
+            _SnapshotPickler(stream, protocol=5, buffer_callback=keep_out_of_band).dump(game_master)
+        except (pickle.PicklingError, TypeError, AttributeError) as error:
+            raise ValueError(f"スナップショットに保存できないオブジェクトがあります: {error}") from error
+        payload = stream.getbuffer()
+
+        # バッファの位置はデータ部の先頭からの相対位置で持つ
+        layout = []
+        offset = len(payload)
+        for buffer in buffers:
+            offset += _padding(offset)
+            layout.append([offset, buffer.raw().nbytes])
+            offset += buffer.raw().nbytes
+        header = {
+            "version": VERSION,
+            "date": game_master.get_current_date(),
+            "players": [player.name for player in game_master.players],
+            "pickle_length": len(payload),
+            "buffers": layout,
+            "data_length": offset
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("UTF-8")
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(header_bytes)))
+        file.write(header_bytes)
+        file.write(bytes(_padding(len(MAGIC) + 8 + len(header_bytes))))
+        file.write(payload)
+        position = len(payload)
+        for (start, length), buffer in zip(layout, buffers):
+            file.write(bytes(start - position))
+            file.write(buffer.raw())
+            position = start + length
+    return header
+
+
+def read_header(path) -> tuple:
+    """
+    ヘッダーとデータ部の開始位置を読む
+
+    :raises ValueError: スナップショットでない場合、または対応していないバージョンの場合
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"スナップショットファイルではありません: {path}")
+        (header_length,) = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(header_length).decode("UTF-8"))
+    if header.get("version") != VERSION:
+        raise ValueError(f"対応していないスナップショットのバージョンです: {header.get('version')} (対応: {VERSION})")
+    data_offset = len(MAGIC) + 8 + header_length
+    return header, data_offset + _padding(data_offset)
+
+
+def _loads(loader):
+    # 大量のオブジェクトを一度に作るため、途中で循環GCが何度も走らないよう止めておく
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return loader()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def load(path):
+    """スナップショットファイルからゲーム全体(GameMaster)を復元"""
+    header, data_offset = read_header(path)
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    data = memoryview(mapped)[data_offset:]
+    buffers = [data[start:start + length] for start, length in header["buffers"]]
+    return _loads(lambda: pickle.loads(data[:header["pickle_length"]], buffers=buffers))
+
+
+def shared_history(game_master) -> dict:
+    """
+    分岐間で共有する(以後変更されない)オブジェクトを id -> オブジェクト で集める
+    仕訳帳・入出庫記録は既存の記録をセグメントに封じてから共有し、列(チャンク)は埋まったチャンクだけを共有する。
+    ファイルに書き出す入出庫記録は、分岐時点までの行を分岐間で共有する(以後の記録は分岐ごとに別のファイル)。
+
+    :raises ValueError: 共有できない状態の資産がある場合
+    """
+    shared = {}
+    for segment in game_master.event_log.freeze():
+        shared[id(segment)] = segment
+    for player in game_master.players:
+        frozen = player.ledger_manager.freeze_history() + player.ends.freeze()
+        if player.product_lists is not None:
+            frozen.extend(player.product_lists.freeze())
+        for obj in frozen:
+            shared[id(obj)] = obj
+    for asset_instance in game_master.asset_registry.values():
+        if not hasattr(asset_instance, "freeze_history"):
+            continue
+        try:
+            frozen = asset_instance.freeze_history()
+        except ValueError as error:
+            raise ValueError(f"資産 '{asset_instance.name}' を分岐できません: {error}") from error
+        for obj in frozen:
+            shared[id(obj)] = obj
+    return shared
+
+
+def fork(game_master):
+    """
+    ゲームを分岐させる(変更されない履歴は共有し、それ以外を複製したGameMasterを返す)
+
+    :raises ValueError: 並列モード中など、分岐できない状態の場合
+    """
+    if getattr(game_master, "parallel_ticker", None) is not None:
+        raise ValueError("並列モード中は分岐できません。stop_parallel() の後で分岐してください。")
+    shared = shared_history(game_master)
+    stream = io.BytesIO()
+    try:
+        _SharingPickler(stream, shared).dump(game_master)
+    except (pickle.PicklingError, TypeError, AttributeError) as error:
+        raise ValueError(f"分岐できないオブジェクトがあります: {error}") from error
+    stream.seek(0)
+    branch = _loads(_SharingUnpickler(stream, shared).load)
+    for player in branch.players:
+        player.ledger_manager.start_branch()
+    for asset_instance in branch.asset_registry.values():
+        if hasattr(asset_instance, "start_branch"):
+            asset_instance.start_branch()
+    return branch
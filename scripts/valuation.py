@@ -0,0 +1,146 @@
+"""棚卸資産の評価方法ごとの売上原価を、入出庫の列からまとめて計算する"""
+from collections import namedtuple
+
+import numpy as np
+
+# 評価結果: 評価方法、払出ごとの単価、払出ごとの原価、売上原価の合計、期末数量、期末簿価
+ValuationResult = namedtuple(
+    "ValuationResult",
+    ["method", "unit_costs", "costs", "total_cost", "ending_quantity", "ending_value"]
+)
+
+METHODS = ("FIFO", "MAM", "GAM")
+
+
+def _prepare(quantities, prices, fringe_costs, initial_quantity, initial_price):
+    """期首在庫を先頭の仕入として加えた入出庫の列を作る"""
+    quantities = np.asarray(quantities)
+    prices = np.asarray(prices)
+    if quantities.shape != prices.shape:
+        raise ValueError("quantities と prices の長さが一致しません。")
+    fringe_costs = np.zeros(len(quantities)) if fringe_costs is None else np.asarray(fringe_costs)
+    quantities = np.concatenate([[initial_quantity], quantities])
+    prices = np.concatenate([[initial_price], prices])
+    fringe_costs = np.concatenate([[0], fringe_costs])
+    return quantities, prices, fringe_costs
+
+
+def _check_stock(quantities):
+    """払出の時点で在庫が足りているか(Inventoryと同じく不足ならValueError)"""
+    stock = np.cumsum(quantities)
+    shortage = np.flatnonzero(stock < 0)
+    if len(shortage):
+        raise ValueError(f"在庫不足です。{shortage[0] - 1}番目の払出を引き出せません。")
+    return stock
+
+
+def replay_fifo(quantities, prices, fringe_costs=None, initial_quantity=0, initial_price=0) -> ValuationResult:
+    """
+    先入先出法で入出庫の列を再生
+
+    仕入の数量と原価の累計を並べ、払出の累計数量を二分探索して各払出の原価を一度に求める。
+    Inventory と同じく付随費用は簿価には含め、原価層(払出原価)には含めない。
+    """
+    quantities, prices, fringe_costs = _prepare(quantities, prices, fringe_costs, initial_quantity, initial_price)
+    _check_stock(quantities)
+    purchases = quantities > 0
+    sales = quantities < 0
+
+    layer_quantities = quantities[purchases]
+    layer_prices = prices[purchases]
+    cum_quantities = np.concatenate([[0], np.cumsum(layer_quantities)])
+    cum_costs = np.concatenate([[0], np.cumsum(layer_quantities * layer_prices)])
+
+    sold = -quantities[sales]
+    cum_sold = np.cumsum(sold)
+    # 累計払出数量を含む層と、その直前までの累計
+    layer = np.maximum(np.searchsorted(cum_quantities, cum_sold, side="left"), 1) - 1
+    consumed = cum_costs[layer] + (cum_sold - cum_quantities[layer]) * layer_prices[layer]
+    costs = np.diff(np.concatenate([[0], consumed]))
+    return _result("FIFO", sold, costs, quantities, prices, fringe_costs)
+
+
+def replay_moving_average(quantities, prices, fringe_costs=None, initial_quantity=0, initial_price=0,
+                          method="MAM") -> ValuationResult:
+    """
+    移動平均法で入出庫の列を再生
+
+    簿価の推移は 仕入: V += 仕入額、払出: V *= (残数量 / 払出前数量) の線形漸化式になる。
+    在庫が0になる払出で区切ったグループごとに、係数の累積積を対数で持ち
+    (np.logaddexp.accumulate)、グループ内を一度に解く。
+    Inventory の総平均法(GAM)は合計数量・金額を払出のたびに簿価と同じだけ減らすため、
+    払出単価は移動平均法と同じになる。method="GAM" でもこの計算を使う。
+    """
+    quantities, prices, fringe_costs = _prepare(quantities, prices, fringe_costs, initial_quantity, initial_price)
+    stock = _check_stock(quantities)
+    purchases = quantities > 0
+    sales = quantities < 0
+    before = stock - quantities  # 各入出庫の直前の数量
+
+    added = np.where(purchases, quantities * prices + fringe_costs, 0).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.where(sales, stock / before, 1.0)
+    empty = sales & (stock == 0)
+
+    values = np.zeros(len(quantities))
+    # 在庫が0になった直後の入出庫からグループを始める
+    starts = np.concatenate([[0], np.flatnonzero(empty) + 1])
+    ends = np.concatenate([np.flatnonzero(empty) + 1, [len(quantities)]])
+    for start, end in zip(starts, ends):
+        if start >= end:
+            continue
+        group = slice(start, end)
+        group_factor = factor[group].copy()
+        if empty[end - 1]:
+            group_factor[-1] = 1.0  # 0になる払出の後の簿価は下で0にする
+        log_product = np.cumsum(np.log(group_factor))
+        with np.errstate(divide="ignore"):
+            log_terms = np.log(added[group]) - log_product
+        values[group] = np.exp(log_product + np.logaddexp.accumulate(log_terms))
+        if empty[end - 1]:
+            values[end - 1] = 0.0
+
+    previous = np.concatenate([[0.0], values[:-1]])
+    costs = (previous - values)[sales]
+    return _result(method, -quantities[sales], costs, quantities, prices, fringe_costs)
+
+
+def _result(method, sold, costs, quantities, prices, fringe_costs) -> ValuationResult:
+    purchased_value = (quantities[quantities > 0] * prices[quantities > 0]).sum() + fringe_costs.sum()
+    total_cost = costs.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_costs = np.where(sold > 0, costs / sold, 0)
+    return ValuationResult(method, unit_costs, costs, total_cost,
+                           quantities.sum(), purchased_value - total_cost)
+
+
+REPLAYERS = {
+    "FIFO": replay_fifo,
+    "MAM": replay_moving_average,
+    "GAM": lambda *args, **kwargs: replay_moving_average(*args, method="GAM", **kwargs)
+}
+
+
+def replay(quantities, prices, method="FIFO", fringe_costs=None,
+           initial_quantity=0, initial_price=0) -> ValuationResult:
+    """
+    1商品の入出庫の列を評価方法に従って再生
+
+    :param quantities: 入出庫ごとの数量(仕入は正、払出は負)
+    :param prices: 入出庫ごとの仕入単価(払出の行は使わない)
+    :param method: 評価方法 ("FIFO", "MAM", "GAM")
+    :param fringe_costs: 仕入ごとの付随費用
+    :param initial_quantity: 期首数量
+    :param initial_price: 期首単価
+    """
+    if method not in REPLAYERS:
+        raise ValueError(f"無効な評価方法: {method}. 有効な評価方法は {', '.join(METHODS)} です。")
+    return REPLAYERS[method](quantities, prices, fringe_costs,
+                             initial_quantity=initial_quantity, initial_price=initial_price)
+
+
+def compare(quantities, prices, fringe_costs=None, initial_quantity=0, initial_price=0,
+            methods=METHODS) -> dict:
+    """同じ入出庫の列を複数の評価方法で再生し、評価方法 -> ValuationResult を返す"""
+    return {method: replay(quantities, prices, method, fringe_costs, initial_quantity, initial_price)
+            for method in methods}
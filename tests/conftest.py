@@ -0,0 +1,28 @@
+"""テスト共通の設定"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import GameMaster, Player, gamelog  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def headless():
+    """テスト中はゲームのメッセージを出力しない"""
+    gamelog.configure("headless")
+    yield
+    gamelog.configure("console")
+
+
+@pytest.fixture
+def make_game():
+    """GameMaster とプレイヤーを作る: make_game("Player1", "Player2", asset_store="dict")"""
+    def make(*names, initial_cash=2000000, **kwargs):
+        game_master = GameMaster(**kwargs)
+        for name in names:
+            game_master.players.append(Player(name, game_master, initial_cash=initial_cash))
+        return game_master
+    return make
@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timedelta
+
+from scripts import archive, journal, ledger
+
+
+def _fill(tmp_path, days, **kwargs):
+    book = ledger.Ledger(current_date=datetime(2024, 1, 1), archive_dir=str(tmp_path), **kwargs)
+    book.post(book.templates["capital"], 1000000, description="設立")
+    for day in range(days):
+        book.current_date = datetime(2024, 1, 1) + timedelta(days=day + 1)
+        book.post(book.templates["purchase"], 100 + day, description=f"仕入 {day}")
+        book.execute_settlement()
+    return book
+
+
+def test_settlements_are_merged_into_large_segments(tmp_path):
+    book = _fill(tmp_path, 365)
+    # 既定では1日ごとの決算でファイルを作らない
+    assert len(os.listdir(tmp_path)) == 0
+    assert sum(1 for _ in book.iter_transactions()) == 366
+
+    book = _fill(tmp_path / "small", 100, archive_segment_size=40)
+    assert len(os.listdir(tmp_path / "small")) == 2  # 40件 + 40件(残り21件はメモリ)
+    amounts = [entry["updates"][0][1] for entry in book.iter_transactions()]
+    assert amounts == [1000000] + [100 + day for day in range(100)]
+
+
+def test_open_mappings_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "MAX_OPEN_SEGMENTS", 8)
+    book = _fill(tmp_path, 100, archive_segment_size=1)
+    assert len(book._former_transactions.segments) == 100
+    fds_before = len(os.listdir("/proc/self/fd"))
+    postings = book.get_account_postings("仕入")
+    assert [posting["amount"] for posting in postings if posting["description"] != "決算振替"] == \
+        [100 + day for day in range(100)]
+    assert len(archive._open_segments) <= 8
+    assert len(os.listdir("/proc/self/fd")) - fds_before <= 8
+
+
+def test_pending_entries_are_columnar(tmp_path):
+    book = _fill(tmp_path, 30)
+    pending = book._former_transactions._pending
+    assert isinstance(pending, journal.ColumnarJournal)
+    assert len(pending) == 31
+    assert book._former_transactions.entry(5)["description"] == "仕入 4"
+
+
+def test_non_string_descriptions_are_stored_as_text(tmp_path):
+    book = ledger.Ledger(current_date=datetime(2024, 1, 1), archive_dir=str(tmp_path), archive_segment_size=1)
+    book.post(book.templates["capital"], 1000000, description=12345)
+    book.execute_settlement()
+
+    assert len(book._former_transactions.segments) == 1
+    assert [entry["description"] for entry in book.iter_transactions()] == ["12345"]
+
+
+def test_game_master_archive_dir_is_used_by_players(tmp_path, make_game):
+    archived = make_game("A", archive_dir=str(tmp_path))
+    plain = make_game("A")
+    for game_master in (archived, plain):
+        player = game_master.players[0]
+        building_id = game_master.construct_instance("building", "OB", value=1000000, address="x")["ID"]
+        player.aquire_building(building_id, 1000000)
+        game_master.advance_time(3)
+
+    book = archived.players[0].ledger_manager
+    assert isinstance(book._former_transactions, archive.JournalArchive)
+    assert book._former_transactions.directory == str(tmp_path)
+    assert list(book.iter_transactions()) == list(plain.players[0].ledger_manager.iter_transactions())
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from scripts import asset, asset_table
+
+FIELDS = ("name", "owner", "value", "market_value", "acquisition_cost", "salvage_value", "useful_life",
+          "accumulated_depreciation", "elapsed_days", "method")
+
+
+def _new_asset(rng, index):
+    kind = rng.choice(["tangible", "building", "inventory"])
+    owner = rng.choice([None, "A", "B"])
+    if kind == "building":
+        return asset.Building(f"B{index}", rng.randint(1, 100) * 10000, owner, f"住所{index % 3}")
+    if kind == "tangible":
+        return asset.Machine(f"M{index}", rng.randint(1, 100) * 1000, owner,
+                             rng.choice(["straight_line", "accelerated"]), rng.randint(2, 10), 0.1)
+    return asset.Inventory(f"I{index}", quantity=0, price=0, valuation="FIFO")
+
+
+def _state(registry):
+    state = []
+    for asset_id in registry:
+        entry = registry[asset_id]
+        kind = next(cls for cls in (asset.Building, asset.Tangible, asset.Inventory) if isinstance(entry, cls))
+        fields = tuple(getattr(entry, name) for name in FIELDS) if kind is not asset.Inventory else (entry.name,)
+        state.append((asset_id, kind, fields, getattr(entry, "address", None)))
+    return state
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_asset_table_behaves_like_dict(seed):
+    rng = random.Random(seed)
+    table, plain = asset_table.AssetTable(), {}
+    for step in range(300):
+        operation = rng.random()
+        ids = list(plain)
+        if not ids or operation < 0.35:
+            asset_id = rng.randrange(60)  # 既存のIDへの登録(置き換え)も起こる
+            # テーブルは有形固定資産の状態を列に写すため、同じオブジェクトを渡しても独立に変化する
+            table[asset_id] = plain[asset_id] = _new_asset(rng, step)
+        elif operation < 0.5:
+            asset_id = rng.choice(ids)
+            del table[asset_id], plain[asset_id]
+        elif operation < 0.7:
+            # 同じIDへの書き戻し(並列モードでワーカーから受け取るときと同じ)
+            asset_id = rng.choice(ids)
+            table[asset_id] = table[asset_id]
+            plain[asset_id] = plain[asset_id]
+        else:
+            asset_id = rng.choice(ids)
+            if isinstance(plain[asset_id], asset.Tangible):
+                days = rng.randint(1, 400)
+                assert table[asset_id].apply_depreciation(days) == plain[asset_id].apply_depreciation(days)
+                table[asset_id].set_market_value(plain[asset_id].value)
+                plain[asset_id].set_market_value(plain[asset_id].value)
+
+        assert len(table) == len(plain)
+        assert _state(table) == _state(plain)
+    # 行は置き換えで増えず、使用中の行は列に収まる資産の数と一致する
+    assert len(table.rows()) == sum(isinstance(entry, asset.Tangible) for entry in plain.values())
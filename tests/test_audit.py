@@ -0,0 +1,111 @@
+import pytest
+
+from scripts import Player
+
+# 最初の棚卸調整後の残高試算表(変更前の実装で同じ手順を実行した結果。棚卸の仕訳は1円単位に丸めるため誤差1円まで)
+BASELINE_TRIAL_BALANCES = {
+    ("FIFO", 0): {"現金": 99570, "売上高": -1200, "棚卸資産": 830, "売上原価": 800, "資本金": -100000},
+    ("FIFO", 2): {"現金": 99570, "売上高": -1200, "棚卸資産": 830, "売上原価": 800, "資本金": -100000},
+    ("GAM", 0): {"現金": 99570, "売上高": -1200, "棚卸資産": 760.6666666666666, "売上原価": 869.3333333333334,
+                 "資本金": -100000},
+    ("MAM", 2): {"現金": 99570, "売上高": -1200, "棚卸資産": 760.6666666666666, "売上原価": 652.0,
+                 "棚卸減耗": 217.33333333333334, "資本金": -100000},
+}
+
+
+def _trade(game_master, valuation):
+    player = game_master.players[0]
+    product_id = game_master.construct_instance("inventory", "P", valuation=valuation)["ID"]
+    player.redister_product(product_id)
+    product = game_master.get_asset_by_id(product_id)
+    player.purchase_product(product_id, 10, 100)
+    player.purchase_product(product_id, 5, 120, fringe_cost=30)
+    product.update_sales_price(150)
+    player.sale_product(product_id, 8)
+    return player, product_id, product
+
+
+def _trial_balance(player):
+    summary = player.ledger_manager._get_trial_balance()
+    summary = summary[0] if isinstance(summary, tuple) else summary
+    return {name: balance for name, balance in summary.items() if balance}
+
+
+@pytest.mark.parametrize("valuation, loss", sorted(BASELINE_TRIAL_BALANCES))
+def test_first_audit_matches_baseline_trial_balance(make_game, valuation, loss):
+    game_master = make_game("A", initial_cash=100000)
+    player, product_id, _ = _trade(game_master, valuation)
+    player.perform_inventory_audit(product_id, loss)
+
+    assert _trial_balance(player) == pytest.approx(BASELINE_TRIAL_BALANCES[valuation, loss], abs=1)
+
+
+@pytest.mark.parametrize("valuation", ["FIFO", "GAM", "MAM"])
+def test_later_audits_post_change_in_inventory(make_game, valuation):
+    # 2回目以降の棚卸は前回からの増減を計上し、棚卸資産の残高は直近の簿価(1円単位)になる
+    game_master = make_game("A", initial_cash=100000)
+    player, product_id, product = _trade(game_master, valuation)
+    player.perform_inventory_audit(product_id, 0)
+    player.purchase_product(product_id, 6, 110)
+    player.sale_product(product_id, 4)
+    player.perform_inventory_audit(product_id, 1)
+
+    balances = _trial_balance(player)
+    assert balances["棚卸資産"] == round(product.value)
+    purchases = 10 * 100 + 5 * 120 + 30 + 6 * 110
+    expenses = sum(balances.get(name, 0) for name in ("売上原価", "棚卸減耗", "商品評価損"))
+    assert expenses == purchases - round(product.value)
+    assert player.ledger_manager.is_balanced()
+
+
+
+def _audit_purchases(player):
+    """棚卸調整の仕訳で振り替えた仕入高: 商品名 -> 金額の列"""
+    audits = {}
+    for entry in player.ledger_manager.iter_transactions():
+        if entry["description"].startswith("棚卸調整 商品: "):
+            name = entry["description"][len("棚卸調整 商品: "):]
+            audits.setdefault(name, []).append(-dict(entry["updates"])["仕入"])
+    return audits
+
+
+def test_purchase_accumulator_matches_purchase_book_scan(make_game):
+    game_master = make_game("A", initial_cash=10 ** 7)
+    player = game_master.players[0]
+    product_ids = [game_master.construct_instance("inventory", name)["ID"] for name in ("P", "Q", "R")]
+    for product_id in product_ids:
+        player.redister_product(product_id)
+
+    expected = {}
+    for period in range(4):
+        start = len(player.product_lists)
+        for index in range(12):
+            product_id = product_ids[(index * (period + 1)) % 3]
+            buyer = player if index % 2 else player.purchase_manager
+            buyer.purchase_product(product_id, 1 + index, 100 + period, fringe_cost=index % 3)
+        # 変更前の実装: 仕入帳を商品名で走査(当期分)
+        for product_id in product_ids:
+            name = game_master.get_asset_by_id(product_id).name
+            total = sum(item["quantity"] for item in player.product_lists[start:] if item["name"] == name)
+            if total:
+                expected.setdefault(name, []).append(total)
+        player.close_period()
+
+    assert _audit_purchases(player) == expected
+    assert player.period_purchases == {}
+
+
+def test_purchase_accumulator_separates_products_with_same_name(make_game):
+    game_master = make_game()
+    player = Player("A", game_master, initial_cash=10 ** 7, keep_purchase_book=False)
+    game_master.players.append(player)
+    first, second = (game_master.construct_instance("inventory", "P")["ID"] for _ in range(2))
+    player.redister_product(first)
+    player.redister_product(second)
+    player.purchase_product(first, 2, 100)
+    player.purchase_product(second, 3, 100)
+
+    assert player.product_lists is None
+    assert player.period_purchases == {first: 200, second: 300}
+    player.close_period()
+    assert sorted(_audit_purchases(player)["P"]) == [200, 300]
@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.mark.parametrize("asset_store", ["dict", "table"])
+def test_resold_building_starts_new_cost_basis(make_game, asset_store):
+    game_master = make_game("A", "B", initial_cash=10 ** 7, asset_store=asset_store)
+    seller, buyer = game_master.players
+    building_id = game_master.construct_instance("building", "OB", value=1000000, address="x")["ID"]
+
+    seller.aquire_building(building_id, 1000000)
+    game_master.advance_time(365)
+    seller.dispose_building(building_id, 900000)
+    buyer.aquire_building(building_id, 800000)
+    game_master.advance_time(365)
+
+    end = buyer.ends[-1]["end"]
+    assert end["建物"] == 800000
+    assert end["減価償却累計額"] == -20000  # 800000 / 40年
+    assert buyer.ledger_manager.is_balanced()
+
+    buyer.dispose_building(building_id, 700000)
+    game_master.advance_time(1)
+    end = buyer.ends[-1]["end"]
+    assert end["建物"] == 0
+    assert end["減価償却累計額"] == 0
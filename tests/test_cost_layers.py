@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from scripts import asset, cost_layers
+
+
+def _list_walk_cost(layers, quantity):
+    """従来の実装: 古い層から順に数量を払い出して総原価を求める"""
+    total = 0
+    while quantity:
+        take = min(quantity, layers[0]["quantity"])
+        total += take * layers[0]["price"]
+        layers[0]["quantity"] -= take
+        quantity -= take
+        if layers[0]["quantity"] == 0:
+            layers.pop(0)
+    return total
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_list_walk(monkeypatch, seed):
+    monkeypatch.setattr(cost_layers.FifoCostLayers, "CHUNK_SIZE", 8)  # 消費し切ったチャンクを捨てさせる
+    rng = random.Random(seed)
+    fifo, layers = cost_layers.FifoCostLayers(), []
+    for _ in range(500):
+        stock = sum(layer["quantity"] for layer in layers)
+        if not stock or rng.random() < 0.5:
+            quantity = rng.randint(1, 30)
+            price = rng.randint(1, 200) if seed % 4 else rng.choice([rng.randint(1, 200), rng.uniform(1, 200)])
+            fifo.push(quantity, price)
+            layers.append({"quantity": quantity, "price": price})
+        else:
+            quantity = rng.randint(0, stock)
+            assert fifo.pop_cost(quantity) == pytest.approx(_list_walk_cost(layers, quantity), abs=1e-6)
+        assert [layer["quantity"] for layer in fifo] == [layer["quantity"] for layer in layers]
+        assert [layer["price"] for layer in fifo] == pytest.approx([layer["price"] for layer in layers])
+        assert fifo.quantity == sum(layer["quantity"] for layer in layers)
+        assert len(fifo) == len(layers)
+
+
+def test_integer_prices_are_exact():
+    fifo = cost_layers.FifoCostLayers()
+    for price in range(1, 2001):
+        fifo.push(3, price)
+    assert fifo.pop_cost(3000) == sum(3 * price for price in range(1, 1001))
+    assert fifo.pop_cost(1) == 1001
+
+
+def test_shortage_leaves_layers_unchanged():
+    fifo = cost_layers.FifoCostLayers()
+    fifo.push(5, 100)
+    with pytest.raises(ValueError):
+        fifo.pop_cost(6)
+    assert list(fifo) == [{"quantity": 5, "price": 100}]
+    assert fifo.pop_cost(0) == 0
+
+
+def test_fractional_quantities_switch_to_float(monkeypatch):
+    monkeypatch.setattr(cost_layers.FifoCostLayers, "CHUNK_SIZE", 4)
+    rng = random.Random(7)
+    fifo, layers = cost_layers.FifoCostLayers(), []
+    for step in range(200):
+        stock = sum(layer["quantity"] for layer in layers)
+        if stock < 1 or rng.random() < 0.5:
+            quantity = rng.randint(1, 30) if step < 20 else round(rng.uniform(0.5, 30), 2)
+            price = rng.randint(1, 200)
+            fifo.push(quantity, price)
+            layers.append({"quantity": quantity, "price": price})
+        else:
+            quantity = round(rng.uniform(0, stock), 2)
+            assert fifo.pop_cost(quantity) == pytest.approx(_list_walk_cost(layers, quantity), abs=1e-6)
+            layers = [layer for layer in layers if layer["quantity"] > 1e-9]
+        assert fifo.quantity == pytest.approx(sum(layer["quantity"] for layer in layers), abs=1e-6)
+    assert fifo._quantities.typecode == fifo._cum_quantities.typecode == "d"
+
+
+def test_integral_float_quantities_stay_integer():
+    fifo = cost_layers.FifoCostLayers()
+    fifo.push(2.0, 100)
+    fifo.push(3, 100.0)
+    assert fifo._quantities.typecode == fifo._prices.typecode == "q"
+    assert fifo.pop_cost(4) == 400
+
+
+def test_inventory_accepts_fractional_quantity():
+    product = asset.Inventory("A", quantity=0, price=0, valuation="FIFO")
+    product.add_inventory(2.5, 100)
+    product.add_inventory(1, 120)
+    product.subtract_inventory(3)
+    assert product.quantity == pytest.approx(0.5)
+    assert product.value == pytest.approx(0.5 * 120)
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+from scripts import clock, debt
+
+
+def _debt(player):
+    return -player.ledger_manager.get_balance("借入金")
+
+
+def test_bullet_loan_is_repaid_at_maturity(make_game):
+    game_master = make_game("P1")
+    player = game_master.players[0]
+    player.finance_manager.borrow("bank", 1000000, rate=0.0365, term_days=365)
+
+    for _ in range(12):
+        game_master.advance_time(30)
+    assert _debt(player) == round(player.debt_book.balance_at()) > 1000000
+
+    game_master.advance_time(30)  # 期日(365日後)を過ぎる
+    lump_sum = 1000000 * 1.0001 ** 365
+    assert _debt(player) == 0
+    assert player.debt_book.balance_at() == pytest.approx(0, abs=1e-6)
+    assert player.ledger_manager.get_balance("現金") == 2000000 + 1000000 - round(lump_sum)
+
+
+def test_bullet_loan_matches_single_period_schedule():
+    book = debt.DebtBook(clock.GameClock(datetime(2024, 1, 1)))
+    loan = book.borrow("bank", 500000, 0.05, term_days=90)
+    [(day, payment, interest, principal, balance)] = list(book.schedule(loan))
+    assert day == datetime(2024, 1, 1).toordinal() + 90
+    assert payment == pytest.approx(500000 * (1 + 0.05 / 365) ** 90)
+    assert balance == pytest.approx(0, abs=1e-6)
+
+
+def test_term_days_only_for_bullet_loans():
+    book = debt.DebtBook(clock.GameClock(datetime(2024, 1, 1)))
+    with pytest.raises(ValueError):
+        book.borrow("bank", 1000, 0.01, periods=12, term_days=360)
+    with pytest.raises(ValueError):
+        book.borrow("bank", 1000, 0.01, term_days=0)
+
+
+def test_repay_uses_the_same_rounded_amount(make_game):
+    game_master = make_game("P1")
+    player = game_master.players[0]
+    loan = player.finance_manager.borrow("bank", 1000000, rate=0.02)
+    game_master.advance_time(45)
+
+    player.finance_manager.repay(loan, 300000.6)
+    game_master.advance_time(30)
+    assert _debt(player) == round(player.debt_book.balance_at())
+
+    remaining = round(player.debt_book.balance_at())
+    with pytest.raises(ValueError):
+        player.finance_manager.repay(loan, remaining + 1)
+    player.finance_manager.repay(loan, remaining)
+    game_master.advance_time(30)
+    assert _debt(player) == 0
+    assert not player.debt_book.columns["active"][loan]
@@ -0,0 +1,111 @@
+import logging
+
+import pytest
+
+from scripts import asset, asset_table, gamelog
+
+
+def _machines(count=12):
+    """耐用年数・残存価額・償却方法を変えた機械"""
+    return [
+        asset.Machine(f"M{index}", 100000 * (index + 1), None,
+                      "accelerated" if index % 2 else "straight_line",
+                      useful_life=2 + index % 5, salvage_value_ratio=(index % 3) / 10)
+        for index in range(count)
+    ]
+
+
+@pytest.mark.parametrize("useful_life, first_year", [(5, 400000), (4, 500000), (10, 200000)])
+def test_declining_balance_first_year_matches_rate(useful_life, first_year):
+    machine = asset.Machine("M", 1000000, None, "accelerated", useful_life)
+
+    assert machine.apply_depreciation(365) == first_year
+
+
+def test_declining_balance_second_year_applies_rate_to_book_value():
+    machine = asset.Machine("M", 1000000, None, "accelerated", 5)
+    machine.apply_depreciation(365)
+
+    assert machine.apply_depreciation(365) == 240000  # 600000 × 40%
+
+
+def test_declining_balance_stops_at_salvage_value():
+    machine = asset.Machine("M", 1000000, None, "accelerated", 2, salvage_value_ratio=0.1)
+
+    assert machine.apply_depreciation(1) == 900000
+    assert machine.apply_depreciation(365) == 0
+    assert machine.value == 100000
+
+
+@pytest.mark.parametrize("method", ["straight_line", "accelerated"])
+def test_daily_steps_match_single_step(method):
+    daily = asset.Machine("M", 1000000, None, method, 5, salvage_value_ratio=0.1)
+    yearly = asset.Machine("M", 1000000, None, method, 5, salvage_value_ratio=0.1)
+
+    total = sum(daily.apply_depreciation(1) for _ in range(365))
+
+    assert total == yearly.apply_depreciation(365)
+    assert daily.accumulated_depreciation == yearly.accumulated_depreciation
+    assert daily.value == yearly.value
+
+
+def test_batch_and_table_match_per_asset_path():
+    expected, batched, viewed = _machines(), _machines(), _machines()
+    table = asset_table.AssetTable()
+    for index, machine in enumerate(viewed):
+        table[index] = machine
+    views = [table[index] for index in range(len(viewed))]
+
+    for days in (1, 30, 365, 400, 3650):
+        amounts = [machine.apply_depreciation(days) for machine in expected]
+        assert asset.apply_depreciation_batch(batched, days).tolist() == amounts
+        assert asset.apply_depreciation_batch(views, days).tolist() == amounts
+
+    for machine, other, view in zip(expected, batched, views):
+        assert other.accumulated_depreciation == machine.accumulated_depreciation
+        assert view.accumulated_depreciation == machine.accumulated_depreciation
+        assert view.value == machine.value
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _depreciating_game(make_game):
+    game_master = make_game("A", initial_cash=10 ** 8)
+    player = game_master.players[0]
+    for index in range(5):
+        building_id = game_master.construct_instance("building", f"B{index}", value=1000000, address="x")["ID"]
+        player.aquire_building(building_id, 1000000)
+    return game_master
+
+
+def test_headless_emits_nothing(make_game, capsys):
+    game_master = _depreciating_game(make_game)
+    handler = _Records()
+    logging.getLogger(gamelog.ROOT_LOGGER).addHandler(handler)
+    try:
+        game_master.advance_time(30)
+    finally:
+        logging.getLogger(gamelog.ROOT_LOGGER).removeHandler(handler)
+
+    assert handler.records == []
+    assert capsys.readouterr().out == ""
+
+
+def test_per_asset_depreciation_is_debug(make_game, capsys):
+    game_master = _depreciating_game(make_game)
+    capsys.readouterr()
+    gamelog.configure("console")
+    game_master.advance_time(3)
+    assert "減価償却が適用されました" not in capsys.readouterr().out
+
+    machine = asset.Machine("M", 1000000, None, "straight_line", 5)
+    gamelog.configure("console", level=logging.DEBUG)
+    machine.apply_depreciation(365)
+    assert "M の減価償却が適用されました" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import tracemalloc
+
+import pytest
+
+from scripts import cost_layers, journal, ledger, movement_log
+
+
+def _trade(game_master, days, sales=20):
+    player = game_master.players[0]
+    product_id = player.product_id
+    for _ in range(days):
+        for index in range(sales):
+            player.purchase_product(product_id, 10, 50 + index % 7)
+            player.sale_product(product_id, 5, 90)
+        game_master.advance_time(1)
+
+
+@pytest.fixture
+def trading_game(make_game):
+    def make(journal_engine="list", days=60):
+        game_master = make_game("P1", initial_cash=10 ** 9, journal_engine=journal_engine, seed=1)
+        player = game_master.players[0]
+        player.product_id = game_master.construct_instance("inventory", "A")["ID"]
+        player.redister_product(player.product_id)
+        building_id = game_master.construct_instance("building", "B", value=100000, address="x")["ID"]
+        player.aquire_building(building_id, 100000)
+        _trade(game_master, days)
+        return game_master
+    return make
+
+
+def _state(game_master):
+    player = game_master.players[0]
+    book = player.ledger_manager
+    product = game_master.get_asset_by_id(player.product_id)
+    return (list(book._transactions), [end["end"] for end in player.ends], list(product.transactions.movements()),
+            list(product.inventory_data), len(game_master.event_log), [purchase["quantity"] for purchase in player.product_lists],
+            book.get_account_postings("現金")[-5:], book.balance_as_of(game_master.current_date))
+
+
+@pytest.mark.parametrize("journal_engine", ["list", "columnar"])
+def test_branches_are_isolated(trading_game, monkeypatch, journal_engine):
+    monkeypatch.setattr(journal.ColumnarJournal, "CHUNK_SIZE", 256)
+    monkeypatch.setattr(cost_layers.FifoCostLayers, "CHUNK_SIZE", 64)
+    game_master = trading_game(journal_engine)
+    before = _state(game_master)
+
+    branch = game_master.fork()
+    assert _state(branch) == before
+    _trade(branch, 30, sales=3)
+    assert _state(game_master) == before  # 分岐側の進行は元のゲームに影響しない
+
+    _trade(game_master, 30, sales=7)
+    reference = trading_game(journal_engine)
+    _trade(reference, 30, sales=7)
+    assert _state(game_master) == _state(reference)
+    assert _state(branch) != _state(game_master)
+
+
+def test_history_is_shared_between_branches(trading_game, monkeypatch):
+    monkeypatch.setattr(journal.ColumnarJournal, "CHUNK_SIZE", 256)
+    monkeypatch.setattr(ledger.Ledger, "POSTING_CHUNK_SIZE", 256)
+    game_master = trading_game("columnar")
+    branch = game_master.fork()
+    original, forked = game_master.players[0], branch.players[0]
+
+    chunks = original.ledger_manager._transactions._amount.chunks
+    assert chunks and all(a is b for a, b in zip(chunks, forked.ledger_manager._transactions._amount.chunks))
+    assert original.ends.segments[0] is forked.ends.segments[0]
+    product, forked_product = (gm.get_asset_by_id(original.product_id) for gm in (game_master, branch))
+    assert product.transactions._segments[0] is forked_product.transactions._segments[0]
+    assert original.ledger_manager._account_postings[0].chunks[0] is forked.ledger_manager._account_postings[0].chunks[0]
+
+
+def _fork_bytes(game_master):
+    game_master.fork()  # 既存の履歴を封じておく
+    tracemalloc.start()
+    branch = game_master.fork()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert branch.players
+    return used
+
+
+@pytest.mark.parametrize("journal_engine", ["list", "columnar"])
+def test_fork_cost_does_not_grow_with_history(trading_game, journal_engine):
+    short = _fork_bytes(trading_game(journal_engine, days=20))
+    long = _fork_bytes(trading_game(journal_engine, days=400))
+    assert long < 2 * short + 500000
+
+
+def test_fork_with_movement_log_on_disk(make_game, tmp_path):
+    game_master = make_game("P1")
+    log = movement_log.MovementLog("disk", spill_path=str(tmp_path / "movements.jsonl"), spill_size=2)
+    product_id = game_master.construct_instance("inventory", "A", movement_log=log)["ID"]
+    player = game_master.players[0]
+    player.redister_product(product_id)
+    for _ in range(3):
+        player.purchase_product(product_id, 10, 100)
+
+    branch = game_master.fork()
+    before = list(log.movements())
+    player.purchase_product(product_id, 5, 100)
+    branch.players[0].purchase_product(product_id, 7, 100)
+
+    original_log = game_master.get_asset_by_id(product_id).transactions
+    branch_log = branch.get_asset_by_id(product_id).transactions
+    assert branch_log.spill_path != original_log.spill_path
+    assert list(original_log.movements())[:len(before)] == before
+    assert list(branch_log.movements())[:len(before)] == before
+    assert [movement.quantity for movement in original_log.movements()][len(before):] == [5]
+    assert [movement.quantity for movement in branch_log.movements()][len(before):] == [7]
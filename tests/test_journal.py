@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from scripts import Player, journal, ledger
+
+
+@pytest.fixture
+def chart():
+    return ledger.load_chart_of_accounts()
+
+
+def _fill(book, count):
+    base = datetime(2024, 1, 1)
+    for index in range(count):
+        timestamp = base + timedelta(days=index // 10)
+        amount = index / 4 if index % 7 == 0 else index
+        book.append([("現金", amount), ("売上高", -amount)], f"販売 {index % 3}", timestamp)
+        if index % 5 == 0:
+            book.extend([([("仕入", 10), ("現金", -10)], "仕入"), ([("現金", 1), ("資本金", -1)], "増資")], timestamp)
+
+
+def test_columnar_matches_list(chart, monkeypatch):
+    monkeypatch.setattr(journal.ColumnarJournal, "CHUNK_SIZE", 16)  # チャンクの境界をまたがせる
+    monkeypatch.setattr(journal._TextColumn, "INTERN_SIZE", 2)  # 共有から外れた摘要を追記し直させる
+    listed, columnar = journal.ListJournal(chart), journal.ColumnarJournal(chart)
+    _fill(listed, 300)
+    _fill(columnar, 300)
+
+    assert len(columnar) == len(listed) == 420
+    assert list(columnar) == list(listed)
+    assert columnar.entry(123) == listed.entry(123)
+    assert len(columnar._amount.chunks) > 1 and len(columnar._descriptions.chunks) > 1
+
+    columns = columnar.columns()
+    rows = [(tx_id, name, amount, entry["timestamp"].toordinal())
+            for tx_id, entry in enumerate(listed) for name, amount in entry["updates"]]
+    assert columns["tx_id"].tolist() == [row[0] for row in rows]
+    assert columns["account"].tolist() == [chart.ids[row[1]] for row in rows]
+    assert columns["amount"].tolist() == [row[2] for row in rows]
+    assert columns["date"].tolist() == [row[3] for row in rows]
+
+
+def test_undated_and_empty_columns(chart):
+    book = journal.ColumnarJournal(chart)
+    assert book.column("tx_id").tolist() == []
+    book.append_ids([0, 6], [5, -5], "x", "ゲーム内時間")
+    assert book.column("date").tolist() == [0, 0]
+    assert book.entry(0)["timestamp"] == "ゲーム内時間"
+    with pytest.raises(ValueError):
+        book.column("description")
+
+
+def _bytes_per_posting(engine, chart, descriptions):
+    tracemalloc.start()
+    book = journal.JOURNAL_ENGINES[engine](chart)
+    base = datetime(2024, 1, 1)
+    for index in range(20000):
+        book.append_ids([0, 6], [index, -index], descriptions(index), base + timedelta(days=index // 50))
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / (2 * len(book))
+
+
+def test_columnar_memory(chart):
+    repeated = lambda index: "建物 の減価償却 (1日)"
+    unique = lambda index: f"商品 A 販売 数量：{index % 97} 単価：{index}"
+    assert _bytes_per_posting("list", chart, repeated) > 8 * _bytes_per_posting("columnar", chart, repeated)
+    assert _bytes_per_posting("list", chart, unique) > 4 * _bytes_per_posting("columnar", chart, unique)
+
+
+def test_columnar_unique_description_budget(chart):
+    # 摘要が全て異なっても、摘要の共有テーブルは頭打ちになり仕訳行あたりのバイト数は一定に収まる
+    unique = lambda index: f"商品 A 販売 数量：{index % 97} 単価：{index}"
+    assert _bytes_per_posting("columnar", chart, unique) < 64
+
+
+def test_columnar_interns_interleaved_descriptions(chart):
+    book = journal.ColumnarJournal(chart)
+    descriptions = ["支払利息の計上 (1日)", "借入金の約定返済 (1日)", "建物 の減価償却 (1日)"]
+    for index in range(300):
+        book.append_ids([0, 6], [index, -index], descriptions[index % 3], datetime(2024, 1, 1))
+
+    assert len(book._descriptions) == 3
+    assert [book.entry(index)["description"] for index in range(6)] == descriptions * 2
+
+
+def test_player_journal_engine(make_game):
+    game_master = make_game("P1", journal_engine="columnar")
+    player = game_master.players[0]
+    assert isinstance(player.ledger_manager._transactions, journal.ColumnarJournal)
+
+    reference = make_game("P1")
+    for game in (game_master, reference):
+        building_id = game.construct_instance("building", "OB", value=1000000, address="x")["ID"]
+        game.players[0].aquire_building(building_id, 1000000)
+        game.advance_time(30)
+    assert list(player.ledger_manager._transactions) == list(reference.players[0].ledger_manager._transactions)
+
+    other = Player("P2", reference, journal_engine="columnar")
+    assert isinstance(other.ledger_manager._transactions, journal.ColumnarJournal)
+    with pytest.raises(ValueError):
+        make_game(journal_engine="unknown")
+
+
+def _entries():
+    base = datetime(2024, 1, 30)
+    entries = [{"updates": [("現金", 100 + day), ("売上高", -(100 + day))],
+                "description": f"売上, \"{day}\"日目\n明細",
+                "timestamp": base + timedelta(days=day)} for day in range(5)]
+    entries.append({"updates": [("現金", 2.5), ("資本金", -2.5)], "description": "", "timestamp": "ゲーム内時間"})
+    return entries
+
+
+def test_write_jsonl_round_trip():
+    buffer = io.StringIO()
+    entries = _entries()
+    assert journal.write_jsonl(entries, buffer) == len(entries)
+
+    records = [json.loads(line) for line in buffer.getvalue().splitlines()]
+    assert [record["description"] for record in records] == [entry["description"] for entry in entries]
+    assert [[tuple(update) for update in record["updates"]] for record in records] == \
+        [entry["updates"] for entry in entries]
+    assert [datetime.fromisoformat(record["timestamp"]) for record in records[:-1]] == \
+        [entry["timestamp"] for entry in entries[:-1]]
+    assert records[-1]["timestamp"] == "ゲーム内時間"
+
+
+def test_write_csv_round_trip():
+    buffer = io.StringIO(newline="")
+    entries = _entries()
+    assert journal.write_csv(entries, buffer) == len(entries)
+
+    buffer.seek(0)
+    rows = list(csv.DictReader(buffer))
+    assert len(rows) == sum(len(entry["updates"]) for entry in entries)
+    for row in rows:
+        entry = entries[int(row["tx_no"])]
+        assert (row["account"], float(row["amount"])) in entry["updates"]
+        assert row["description"] == entry["description"]
+        assert row["timestamp"] == journal._format_timestamp(entry["timestamp"])
+
+
+def test_filter_entries_by_date_is_inclusive():
+    entries = _entries()
+    days = lambda selected: [entry["timestamp"].day for entry in selected]
+
+    assert days(journal.filter_entries(entries, start="2024-01-31", end=date(2024, 2, 2))) == [31, 1, 2]
+    assert days(journal.filter_entries(entries, start=datetime(2024, 2, 1, 23, 59))) == [1, 2, 3]
+    assert days(journal.filter_entries(entries, end="2024-01-30")) == [30]
+    # 日付のない取引は日付で絞り込んだときだけ除く
+    assert len(list(journal.filter_entries(entries))) == len(entries)
+    assert [entry["description"] for entry in journal.filter_entries(entries, account="資本金")] == [""]
+
+
+def test_export_transactions_filters_across_settlement(tmp_path):
+    book = ledger.Ledger(current_date=datetime(2024, 1, 1))
+    for day in range(10):
+        book.current_date = datetime(2024, 1, 1) + timedelta(days=day)
+        book.post(book.templates["sale"], 100 + day, description=f"売上 {day}")
+        if day % 3 == 2:
+            book.execute_settlement()
+
+    path = tmp_path / "journal.jsonl"
+    assert book.export_transactions(str(path), start="2024-01-03", end="2024-01-07") == 5
+    amounts = [json.loads(line)["updates"][0][1] for line in path.read_text(encoding="UTF-8").splitlines()]
+    assert amounts == [102, 103, 104, 105, 106]
+    with pytest.raises(ValueError):
+        book.export_transactions(io.StringIO(), format="xml")
@@ -0,0 +1,193 @@
+from datetime import date
+
+import pytest
+
+from scripts import ledger
+
+
+def _balances(book):
+    return {name: book.get_balance(name) for name in book._chart.names}
+
+
+def test_daily_settlement_keeps_checkpoint_interval(make_game):
+    game_master = make_game("P1", initial_cash=10 ** 7)
+    player = game_master.players[0]
+    building_id = game_master.construct_instance("building", "OB", value=3650000, address="x")["ID"]
+    player.aquire_building(building_id, 3650000)
+    book = player.ledger_manager
+
+    history = {}
+    for _ in range(365):
+        game_master.advance_time(1)
+        history[game_master.current_date.date()] = _balances(book)
+
+    assert len(book._closings) == 365
+    assert len(book._checkpoints) <= 365 // book.checkpoint_interval + 2
+    for day, expected in history.items():
+        assert book.balance_as_of(day) == expected
+
+
+def test_balance_as_of_replays_closings_between_checkpoints():
+    book = ledger.Ledger(current_date=date(2024, 1, 1), checkpoint_interval=30)
+    book.execute_transaction([("現金", 1000), ("資本金", -1000)], "設立")
+    book.current_date = date(2024, 1, 5)
+    book.execute_transaction([("現金", 300), ("売上高", -300)], "売上")
+    book.execute_settlement()
+    after_closing = _balances(book)
+    book.current_date = date(2024, 1, 9)
+    book.execute_transaction([("現金", 200), ("売上高", -200)], "売上")
+
+    assert len(book._checkpoints) == 2  # 初期値と1月1日のみ(決算では取らない)
+    assert book.balance_as_of("2024-01-04")["売上高"] == 0
+    assert book.balance_as_of("2024-01-04")["現金"] == 1000
+    assert book.balance_as_of("2024-01-05") == after_closing
+    assert book.balance_as_of("2024-01-08") == after_closing
+    assert book.balance_as_of("2024-01-09")["売上高"] == -200
+    assert book.balance_as_of("2024-01-09")["利益剰余金"] == -300
+
+
+def test_balance_as_of_with_undated_entries():
+    book = ledger.Ledger()  # 日付のないゲーム内時間
+    book.execute_transaction([("現金", 1000), ("資本金", -1000)], "設立")
+    book.execute_transaction([("現金", 300), ("売上高", -300)], "売上")
+    book.execute_settlement()
+    book.execute_transaction([("現金", 50), ("売上高", -50)], "売上")
+
+    assert book.balance_as_of("2024-01-01") == _balances(book)
+    assert book.balance_as_of("2024-01-01")["利益剰余金"] == -300
+
+
+def _state(book):
+    return (list(book._balances), dict(book._category_totals), book._total_balance, book._version,
+            book._tx_count, len(book._transactions), list(book._transactions),
+            [len(index) for index in book._account_postings])
+
+
+@pytest.mark.parametrize("journal_engine", ["list", "columnar"])
+@pytest.mark.parametrize("bad_item", [
+    ([("現金", 100), ("存在しない勘定", -100)], "不明な勘定"),
+    ([("現金", 100), ("売上高", -90)], "貸借不一致"),
+    [("現金", 100)],
+])
+def test_failed_batch_changes_nothing(journal_engine, bad_item):
+    book = ledger.Ledger(current_date=date(2024, 1, 1), journal_engine=journal_engine)
+    book.execute_transaction([("現金", 1000), ("資本金", -1000)], "設立")
+    before = _state(book)
+
+    batch = [([("現金", 300), ("売上高", -300)], "売上"), [("仕入", 50), ("現金", -50)], bad_item]
+    with pytest.raises(ValueError):
+        book.execute_transactions(batch)
+
+    assert _state(book) == before
+    book.execute_transactions(batch[:2])
+    assert book.get_balance("現金") == 1250
+
+
+def _recomputed_totals(book):
+    totals = {category: 0 for category in ledger.Account.VALID_CATEGORIES}
+    for spec, balance in zip(book._chart.specs, book._balances):
+        totals[spec.category] += balance
+    return totals, sum(book._balances)
+
+
+@pytest.mark.parametrize("journal_engine", ["list", "columnar"])
+def test_running_totals_match_recomputation(journal_engine):
+    book = ledger.Ledger(current_date=date(2024, 1, 1), journal_engine=journal_engine)
+    book.post(book.templates["capital"], 1000000, description="設立")
+    for day in range(1, 40):
+        book.current_date = date(2024, 1, 1 + day % 28)
+        book.post(book.templates["purchase"], 1000 + day)
+        book.execute_transaction([("現金", 1500 + day), ("売上高", -(1500 + day))], "売上")
+        book.execute_transactions([[("減価償却費", 10), ("減価償却累計額", -10)],
+                                   ([("支払利息", 3), ("借入金", -3)], "利息")])
+        if day % 10 == 0:
+            book.execute_settlement()
+        totals, total_balance = _recomputed_totals(book)
+        assert book._category_totals == totals
+        assert book._total_balance == total_balance == 0
+
+    book.execute_settlement()
+    totals, _ = _recomputed_totals(book)
+    assert book._category_totals == totals
+    assert totals["収益"] == totals["費用"] == 0
+
+
+def _statement_balance(statements, name):
+    for sections in statements.values():
+        for subcategories in sections.values():
+            for accounts in subcategories.values():
+                if name in accounts:
+                    return accounts[name]
+    raise KeyError(name)
+
+
+def test_statements_cache_is_invalidated_by_every_change():
+    book = ledger.Ledger(current_date=date(2024, 1, 1))
+    book.post(book.templates["capital"], 1000, description="設立")
+    cached = book.get_financial_statements()
+    assert book.get_financial_statements() is cached  # 残高が変わるまでは再利用
+
+    book.post(book.templates["sale"], 300)
+    statements = book.get_financial_statements()
+    assert statements is not cached
+    assert _statement_balance(statements, "現金") == 1300
+    assert _statement_balance(statements, "売上高") == -300
+
+    book.execute_transactions([[("仕入", 50), ("現金", -50)]])
+    assert _statement_balance(book.get_financial_statements(), "現金") == 1250
+
+    with pytest.raises(ValueError):
+        book.execute_transactions([[("仕入", 50), ("現金", -40)]])
+    assert book.get_financial_statements() is book.get_financial_statements()
+    assert _statement_balance(book.get_financial_statements(), "現金") == 1250
+
+    book.execute_settlement()
+    statements = book.get_financial_statements()
+    assert _statement_balance(statements, "売上高") == 0
+    assert _statement_balance(statements, "利益剰余金") == -250
+
+    book.add_account(ledger.Account("預金", "貸借対照表", "資産", "流動資産"))
+    assert _statement_balance(book.get_financial_statements(), "預金") == 0
+
+
+@pytest.mark.parametrize("journal_engine", ["list", "columnar"])
+@pytest.mark.parametrize("archived", [False, True])
+def test_account_postings_match_linear_scan(tmp_path, journal_engine, archived):
+    book = ledger.Ledger(current_date=date(2024, 1, 1), journal_engine=journal_engine,
+                         archive_dir=str(tmp_path) if archived else None, archive_segment_size=7)
+    book.post(book.templates["capital"], 100000, description="設立")
+    for day in range(1, 25):
+        book.current_date = date(2024, 1, day)
+        book.post(book.templates["sale"], 100 * day, description=f"売上 {day}")
+        if day % 2:
+            book.post(book.templates["purchase"], 30 * day, description=f"仕入 {day}")
+        if day % 5 == 0:
+            book.execute_settlement()
+
+    entries = list(book.iter_transactions())
+    closings = list(book._closings)
+    for name in ("現金", "売上高", "仕入", "利益剰余金"):
+        account_id = book._chart.id_of(name)
+        # 索引: 取引は通し番号、決算振替は負の番号で発生順に並ぶ
+        expected_markers = []
+        closing_index = 0
+        for tx_index, entry in enumerate(entries):
+            while closing_index < len(closings) and closings[closing_index][0] <= tx_index:
+                if closings[closing_index][2].get(account_id):
+                    expected_markers.append(-(closing_index + 1))
+                closing_index += 1
+            if any(line_name == name for line_name, _ in entry["updates"]):
+                expected_markers.append(tx_index)
+        for index in range(closing_index, len(closings)):
+            if closings[index][2].get(account_id):
+                expected_markers.append(-(index + 1))
+        assert list(book._account_postings[account_id]) == expected_markers
+
+        postings = book.get_account_postings(name)
+        scanned = [(entry["timestamp"], amount, entry["description"])
+                   for entry in entries for line_name, amount in entry["updates"] if line_name == name]
+        assert [(posting["timestamp"], posting["amount"], posting["description"])
+                for posting in postings if posting["description"] != "決算振替"] == scanned
+        assert sum(1 for posting in postings if posting["description"] == "決算振替") == \
+            sum(1 for closing in closings if closing[2].get(account_id))
+        assert (postings[-1]["balance"] if postings else 0) == book.get_balance(name)
@@ -0,0 +1,28 @@
+from scripts import GameMaster, Player, market
+
+
+def _play(seed, **kwargs):
+    game_master = GameMaster(seed=seed, **kwargs)
+    player = Player("P", game_master, initial_cash=10 ** 6)
+    game_master.players.append(player)
+    product_id = game_master.construct_instance("inventory", "A")["ID"]
+    player.redister_product(product_id)
+    player.purchase_product(product_id, 100, 50)
+    for _ in range(20):
+        player.sale_product(product_id, 2, 60)  # 売価の更新で市場売価を引き直す
+    game_master.update_market_prices()
+    game_master.advance_time(30)
+    return player.ends[-1]["end"], game_master.get_asset_by_id(product_id).market_sales_price
+
+
+def test_same_seed_gives_same_game():
+    assert _play(7) == _play(7)
+    assert _play(7, market_engine=None) == _play(7)
+
+
+def test_market_engine_generator_is_shared():
+    engine = market.MarketEngine(seed=3)
+    game_master = GameMaster(market_engine=engine)
+    product = game_master.get_asset_by_id(game_master.construct_instance("inventory", "A")["ID"])
+    assert game_master.rng is engine.rng
+    assert product.rng is engine.rng
@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+
+from scripts import GameMaster, Player, market, montecarlo
+
+
+def scenario(replica, rng):
+    game_master = GameMaster(market_engine=market.MarketEngine(seed=rng))
+    player = Player("P1", game_master, initial_cash=1000000)
+    game_master.players.append(player)
+    product_id = game_master.construct_instance("inventory", "A")["ID"]
+    player.redister_product(product_id)
+    player.purchase_product(product_id, int(rng.integers(100, 200)), 50)
+    player.sale_product(product_id, int(rng.integers(10, 100)), int(rng.integers(40, 120)))
+    player.sale_product(product_id, random.randint(1, 5), 45)  # random モジュールも種で決まる
+    game_master.advance_time(30)
+    return game_master
+
+
+def _samples(result):
+    return {account: values.tolist() for account, values in result.samples["P1"].items()}
+
+
+def test_same_seed_is_reproducible():
+    first = montecarlo.run_batch(scenario, 30, seed=1, workers=1)
+    second = montecarlo.run_batch(scenario, 30, seed=1, workers=1)
+    assert first.replicas == second.replicas == 30
+    assert _samples(first) == _samples(second)
+    assert np.ptp(first.samples["P1"]["当期純利益"]) > 0  # 各回は別の種
+
+
+def test_worker_count_does_not_change_results():
+    serial = montecarlo.run_batch(scenario, 20, seed=5, workers=1)
+    pooled = montecarlo.run_batch(scenario, 20, seed=5, workers=2, chunksize=3)
+    assert _samples(serial) == _samples(pooled)
+    assert serial.stats["P1"]["現金"] == pooled.stats["P1"]["現金"]
+
+
+def test_aggregator_pads_missing_accounts():
+    aggregator = montecarlo.Aggregator()
+    aggregator.add({"P1": {"現金": 1.0}})
+    aggregator.add({"P1": {"現金": 2.0, "借入金": 5.0}})
+    aggregator.add({"P1": {"借入金": 7.0}})
+    result = aggregator.result()
+    assert result.samples["P1"]["現金"].tolist() == [1.0, 2.0, 0.0]
+    assert result.samples["P1"]["借入金"].tolist() == [0.0, 5.0, 7.0]
+    assert result.stats["P1"]["借入金"].mean == 4.0
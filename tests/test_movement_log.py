@@ -0,0 +1,74 @@
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+
+from scripts import movement_log
+
+
+def _record(log, count, start=0):
+    base = datetime(2024, 1, 1)
+    for index in range(start, start + count):
+        log.record("add", index, 100, 100 * index, base + timedelta(days=index), index, 100 * index)
+
+
+def _reference(count):
+    log = movement_log.MovementLog("all")
+    _record(log, count)
+    return list(log.movements())
+
+
+def test_ring_keeps_latest_records():
+    log = movement_log.MovementLog("ring", maxlen=4)
+    _record(log, 10)
+
+    assert len(log) == 4
+    assert list(log.movements()) == _reference(10)[-4:]
+    assert [record["quantity"] for record in log] == [6, 7, 8, 9]
+    assert log.freeze() == []
+
+
+def test_off_records_nothing():
+    log = movement_log.MovementLog("off")
+    _record(log, 10)
+
+    assert len(log) == 0
+    assert list(log) == []
+    assert log.freeze() == []
+
+
+def test_disk_spills_and_reads_back(tmp_path):
+    path = tmp_path / "movements.jsonl"
+    log = movement_log.MovementLog("disk", spill_path=str(path), spill_size=3)
+    _record(log, 7)
+
+    assert len(path.read_text(encoding="UTF-8").splitlines()) == 6
+    assert len(log._records) == 1
+    assert len(log) == 7
+    assert list(log.movements()) == _reference(7)
+    assert log[2]["description"] == movement_log.render_description(_reference(7)[2])
+
+
+def test_disk_requires_spill_path():
+    with pytest.raises(ValueError):
+        movement_log.MovementLog("disk")
+    with pytest.raises(ValueError):
+        movement_log.MovementLog("forever")
+
+
+def test_disk_branch_shares_prefix_and_writes_own_file(tmp_path):
+    path = tmp_path / "movements.jsonl"
+    original = movement_log.MovementLog("disk", spill_path=str(path), spill_size=2)
+    _record(original, 5)
+    assert original.freeze() == []  # 書き出していない記録もファイルに移す
+
+    branch = copy.deepcopy(original)
+    branch.start_branch()
+    _record(original, 3, start=5)
+    _record(branch, 4, start=100)
+
+    assert branch.spill_path != original.spill_path
+    assert list(original.movements()) == _reference(8)
+    extra = movement_log.MovementLog("all")
+    _record(extra, 4, start=100)
+    assert list(branch.movements()) == _reference(5) + list(extra.movements())
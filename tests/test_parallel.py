@@ -0,0 +1,96 @@
+import pytest
+
+from scripts import GameMaster, Player, market
+
+
+def _build(asset_store):
+    game_master = GameMaster(asset_store=asset_store)
+    for index in range(5):
+        player = Player(f"P{index}", game_master, initial_cash=3000000)
+        game_master.players.append(player)
+        building_id = game_master.construct_instance("building", f"B{index}", value=1000000 + index * 1000,
+                                                     address="x")["ID"]
+        player.aquire_building(building_id, 1000000)
+        product_id = game_master.construct_instance("inventory", f"I{index}",
+                                                    valuation="MAM" if index % 2 else "FIFO")["ID"]
+        player.redister_product(product_id)
+        player.purchase_product(product_id, 100 + index, 50)
+        player.sale_product(product_id, 30, 120)
+        player.finance_manager.borrow("bank", 500000, 0.03, periods=12)
+    return game_master
+
+
+def _state(game_master):
+    return [(player.name,
+             [(end["date"], end["end"]) for end in player.ends],
+             [(entry["description"], entry["updates"]) for entry in player.ledger_manager._transactions],
+             sorted(asset_info["instance"].value for asset_info in player.portfolio),
+             player.debt_book.balance_at())
+            for player in game_master.players]
+
+
+@pytest.mark.parametrize("asset_store", ["dict", "table"])
+def test_parallel_matches_serial(asset_store):
+    serial, parallel = _build(asset_store), _build(asset_store)
+    for _ in range(4):
+        serial.advance_time(30)
+
+    with parallel.parallel(workers=2):
+        for _ in range(2):
+            parallel.advance_time(30)
+        assert set(parallel.last_settlements) == {f"P{index}" for index in range(5)}
+    for _ in range(2):
+        parallel.advance_time(30)  # 回収後は通常どおり進められる
+
+    assert _state(parallel) == _state(serial)
+    for player in parallel.players:
+        assert player.game_master is parallel
+        for asset_info in player.portfolio:
+            assert parallel.asset_registry[asset_info["ID"]].value == asset_info["instance"].value
+
+
+def test_parallel_with_scheduled_events():
+    serial, parallel = _build("dict"), _build("dict")
+    for game_master in (serial, parallel):
+        game_master.schedule("depreciation", every=30)
+        game_master.schedule("interest", every=30)
+        game_master.schedule("close", every=90)
+    serial.advance_time(180)
+    with parallel.parallel(workers=3):
+        parallel.advance_time(180)
+    assert _state(parallel) == _state(serial)
+
+
+def test_failure_discards_worker_state():
+    game_master = _build("dict")
+    before = _state(game_master)
+    with pytest.raises(RuntimeError):
+        with game_master.parallel(workers=2):
+            game_master.advance_time(30)
+            raise RuntimeError("中断")
+    assert game_master.parallel_ticker is None
+    # 帳簿は並列モード開始時のまま(時計は進んでいるので借入金の残高は比べない)
+    assert [state[:4] for state in _state(game_master)] == [state[:4] for state in before]
+
+
+def test_parallel_rejects_market_engine():
+    game_master = GameMaster(market_engine=market.MarketEngine(seed=1))
+    game_master.players.append(Player("P1", game_master))
+    with pytest.raises(ValueError):
+        game_master.start_parallel(workers=2)
+
+
+def test_parallel_sessions_reuse_asset_table_rows():
+    game_master = _build("table")
+    registry = game_master.asset_registry
+    rows = registry.size
+    views = {asset_id: registry[asset_id] for asset_id in registry if type(registry._index[asset_id]) is int}
+    for _ in range(3):
+        with game_master.parallel(workers=2):
+            game_master.advance_time(10)
+
+    assert registry.size == len(registry.rows()) == rows
+    # 並列モード前のビューも、ワーカーから書き戻した行をそのまま指す
+    for asset_id, view in views.items():
+        assert view == registry[asset_id]
+        assert view.accumulated_depreciation == registry[asset_id].accumulated_depreciation > 0
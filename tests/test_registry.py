@@ -0,0 +1,61 @@
+import pytest
+
+from scripts import asset, registry
+
+
+@pytest.mark.parametrize("asset_store", ["dict", "table"])
+def test_find_assets_matches_registry_scan(make_game, asset_store):
+    game_master = make_game("A", "B", initial_cash=10 ** 8, asset_store=asset_store)
+    first, second = game_master.players
+    for index in range(6):
+        building_id = game_master.construct_instance("building", f"OB{index % 2}", value=100000, address="x")["ID"]
+        (first if index % 3 else second).aquire_building(building_id, 100000)
+        product_id = game_master.construct_instance("inventory", f"P{index % 2}")["ID"]
+        first.redister_product(product_id)
+    game_master.construct_instance("tangible", "M", 300000, 5, 0.1, "accelerated")
+
+    def scan(owner=..., asset_class=None, name=None):
+        return [asset_id for asset_id, asset_obj in game_master.asset_registry.items()
+                if (owner is ... or game_master.asset_index.owner_of(asset_id) == owner)
+                and (asset_class is None or isinstance(asset_obj, asset_class))
+                and (name is None or asset_obj.name == name)]
+
+    queries = [{"owner": "A"}, {"owner": "B"}, {"owner": None}, {"asset_class": asset.Tangible},
+               {"asset_class": asset.Building, "owner": "A"}, {"name": "OB1"},
+               {"owner": "A", "asset_class": asset.Inventory, "name": "P0"}]
+    for query in queries:
+        assert game_master.find_assets(**query) == scan(**query)
+
+
+def test_disposal_updates_portfolio_and_index(make_game):
+    game_master = make_game("A", initial_cash=10 ** 7)
+    player = game_master.players[0]
+    building_id = game_master.construct_instance("building", "OB", value=1000000, address="x")["ID"]
+    product_id = game_master.construct_instance("inventory", "P")["ID"]
+    player.aquire_building(building_id, 1000000)
+    player.redister_product(product_id)
+
+    assert list(player.portfolio.tangibles) == [building_id]
+    assert list(player.portfolio.inventories) == [product_id]
+
+    player.dispose_building(building_id, 900000)
+    assert building_id not in player.portfolio
+    assert player.portfolio.tangibles == {}
+    assert game_master.find_assets(owner="A") == [product_id]
+    assert game_master.find_assets(owner=None) == [building_id]
+    with pytest.raises(ValueError):
+        player.dispose_building(building_id, 900000)
+
+
+def test_portfolio_iterates_in_insertion_order():
+    portfolio = registry.Portfolio()
+    infos = [{"ID": index, "instance": asset.Building(f"B{index}", 100, None, "x")} for index in range(5)]
+    for info in infos:
+        portfolio.append(info)
+    portfolio.remove(2)
+    portfolio.append(infos[2])
+
+    assert [info["ID"] for info in portfolio] == [0, 1, 3, 4, 2]
+    assert list(portfolio.tangibles) == [0, 1, 3, 4, 2]
+    with pytest.raises(ValueError):
+        portfolio.remove(7)
@@ -0,0 +1,92 @@
+import pytest
+
+from scripts import GameMaster, Player, market
+
+
+def _build(players=2):
+    game_master = GameMaster(market_engine=market.MarketEngine(seed=3))
+    for index in range(players):
+        player = Player(f"P{index}", game_master, initial_cash=5000000)
+        game_master.players.append(player)
+        building_id = game_master.construct_instance("building", f"B{index}", 1000000 * (index + 1), "x")["ID"]
+        player.aquire_building(building_id, 1000000)
+        machine_id = game_master.construct_instance("tangible", f"M{index}", 300000, 5, 0.1, "accelerated")["ID"]
+        player.aquire_building(machine_id, 300000)
+        product_id = game_master.construct_instance("inventory", f"I{index}")["ID"]
+        player.redister_product(product_id)
+        player.purchase_product(product_id, 100, 50)
+        player.sale_product(product_id, 30, 90)
+        player.finance_manager.borrow("bank", 1000000, periods=24)
+    return game_master
+
+
+def _state(game_master):
+    accounts = ("現金", "減価償却累計額", "借入金", "利益剰余金")
+    balances = [[player.ledger_manager.get_balance(name) for name in accounts] for player in game_master.players]
+    return balances, [asset_obj.market_value for asset_obj in game_master.asset_registry.values()]
+
+
+def test_tick_event_matches_sweep():
+    sweep = _build()
+    for _ in range(24):
+        sweep.advance_time(30)
+
+    daily = _build()
+    daily.schedule("tick", every=30)
+    for _ in range(720):
+        daily.advance_time(1)
+
+    skipping = _build()
+    skipping.schedule("tick", every=30)
+    skipping.advance_time(720)
+
+    assert _state(sweep) == _state(daily) == _state(skipping)
+    assert [end["end"] for end in sweep.players[0].ends] == [end["end"] for end in daily.players[0].ends]
+
+
+def test_split_events_match_sweep():
+    sweep = _build()
+    for _ in range(2):
+        sweep.advance_time(360)
+
+    events = _build()
+    events.schedule("depreciation", every=30)
+    events.schedule("interest", every=30)
+    events.schedule("close", every=360)
+    events.schedule("prices", every=360)
+    for _ in range(720):
+        events.advance_time(1)
+
+    assert _state(sweep) == _state(events)
+
+
+def test_custom_event_keeps_sweep(make_game):
+    game_master = make_game("P1")
+    calls = []
+    game_master.schedule("custom", every=100, callback=lambda gm, elapsed: calls.append((gm.get_current_date(), elapsed)))
+
+    game_master.advance_time(365)
+
+    assert [day for day, _ in calls] == ["2024-04-10", "2024-07-19", "2024-10-27"]
+    assert all(elapsed == 100 for _, elapsed in calls)
+    assert len(game_master.players[0].ends) == 1  # 従来の一括処理(決算)も行われる
+    assert game_master.get_current_date() == "2024-12-31"
+
+
+def test_custom_event_on_target_day_runs_before_sweep(make_game):
+    game_master = make_game("P1")
+    seen = []
+    game_master.schedule("custom", start=30, callback=lambda gm, elapsed: seen.append(len(gm.players[0].ends)))
+    game_master.advance_time(30)
+    assert seen == [0]
+    assert len(game_master.players[0].ends) == 1
+
+
+def test_invalid_schedule(make_game):
+    game_master = make_game("P1")
+    with pytest.raises(ValueError):
+        game_master.schedule("unknown", every=1)
+    with pytest.raises(ValueError):
+        game_master.schedule("custom", every=1)
+    with pytest.raises(ValueError):
+        game_master.schedule("close")
@@ -0,0 +1,82 @@
+import json
+import struct
+
+import pytest
+
+from scripts import GameMaster, Player, ledger, market, snapshot
+
+
+def _custom(game_master, elapsed):
+    game_master.log_event({"date": game_master.get_current_date(), "event": "custom", "details": {"elapsed": elapsed}})
+
+
+def _build(tmp_path, asset_store="dict", journal_engine="list"):
+    game_master = GameMaster(market_engine=market.MarketEngine(seed=7), asset_store=asset_store,
+                             journal_engine=journal_engine)
+    for index in range(2):
+        player = Player(f"P{index}", game_master, initial_cash=10 ** 7)
+        game_master.players.append(player)
+        for number in range(3):
+            building_id = game_master.construct_instance("building", f"B{index}-{number}", value=1000000,
+                                                         address="x")["ID"]
+            player.aquire_building(building_id, 1000000)
+        product_id = game_master.construct_instance("inventory", f"I{index}")["ID"]
+        player.redister_product(product_id)
+        for day in range(50):
+            player.purchase_product(product_id, 10, 50 + day % 5)
+            player.sale_product(product_id, 6, 90)
+        player.finance_manager.borrow("bank", 1000000, 0.02, periods=12)
+    archived = game_master.players[1]
+    archived.ledger_manager = ledger.Ledger(current_date=game_master.current_date, archive_dir=str(tmp_path / "archive"),
+                                            archive_segment_size=4)
+    archived.ledger_manager.post(archived.ledger_manager.templates["capital"], 1000)
+    game_master.schedule("tick", every=30)
+    game_master.schedule("custom", every=45, callback=_custom)
+    game_master.advance_time(90)
+    return game_master
+
+
+def _state(game_master):
+    return ([(player.name, [end["end"] for end in player.ends], list(player.ledger_manager.iter_transactions()),
+              sorted(asset_info["instance"].value for asset_info in player.portfolio),
+              player.debt_book.balance_at())
+             for player in game_master.players],
+            [event["event"] for event in game_master.event_log],
+            sorted(getattr(asset_obj, "market_value", None) or 0 for asset_obj in game_master.asset_registry.values()),
+            game_master.get_current_date())
+
+
+@pytest.mark.parametrize("asset_store, journal_engine", [("dict", "list"), ("table", "columnar")])
+def test_round_trip(tmp_path, asset_store, journal_engine):
+    game_master = _build(tmp_path, asset_store, journal_engine)
+    path = tmp_path / "game.snap"
+    header = game_master.save_snapshot(path)
+    assert header["version"] == snapshot.VERSION
+    assert header["players"] == ["P0", "P1"]
+
+    restored = GameMaster.load_snapshot(path)
+    assert _state(restored) == _state(game_master)
+    assert all(player.game_master is restored for player in restored.players)
+
+    # 復元したゲームは元のゲームと同じように進む(乱数の状態・スケジュールも復元される)
+    for game in (game_master, restored):
+        game.advance_time(120)
+    assert _state(restored) == _state(game_master)
+
+
+def test_header_is_checked(tmp_path):
+    path = tmp_path / "bad.snap"
+    header = json.dumps({"version": snapshot.VERSION + 1}).encode("UTF-8")
+    path.write_bytes(snapshot.MAGIC + struct.pack("<Q", len(header)) + header)
+    with pytest.raises(ValueError):
+        GameMaster.load_snapshot(path)
+    path.write_bytes(b"NOTASNAP" + bytes(16))
+    with pytest.raises(ValueError):
+        snapshot.read_header(path)
+
+
+def test_save_rejects_unpicklable_callbacks(make_game, tmp_path):
+    game_master = make_game("P1")
+    game_master.schedule("custom", every=10, callback=lambda gm, elapsed: None)
+    with pytest.raises(ValueError):
+        game_master.save_snapshot(tmp_path / "game.snap")
@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+from scripts import asset, valuation
+
+
+def _sequence(seed, length=300):
+    rng = random.Random(seed)
+    quantities, prices, fringe_costs = [], [], []
+    stock = 20
+    for _ in range(length):
+        if stock and rng.random() < 0.45:
+            quantity = -rng.randint(1, stock)
+            price = fringe = 0
+        else:
+            quantity, price, fringe = rng.randint(1, 40), rng.randint(10, 300), rng.choice([0, 0, rng.randint(1, 50)])
+        stock += quantity
+        quantities.append(quantity)
+        prices.append(price)
+        fringe_costs.append(fringe)
+    if seed % 3 == 0:
+        quantities.append(-stock)  # 在庫を0にしてから仕入れ直す
+        prices.append(0)
+        fringe_costs.append(0)
+        quantities.append(15)
+        prices.append(120)
+        fringe_costs.append(0)
+    return quantities, prices, fringe_costs
+
+
+def _inventory_costs(method, quantities, prices, fringe_costs):
+    """Inventory に1件ずつ入出庫して、払出ごとの原価と期末の数量・簿価を得る"""
+    inventory = asset.Inventory("A", 20, 100, method)
+    for quantity, price, fringe in zip(quantities, prices, fringe_costs):
+        if quantity > 0:
+            inventory.add_inventory(quantity, price, fringe)
+        else:
+            inventory.subtract_inventory(-quantity)
+    costs = [movement.value for movement in inventory.transactions.movements() if movement.kind == "subtract"]
+    return costs, inventory.quantity, inventory.value
+
+
+@pytest.mark.parametrize("method", valuation.METHODS)
+@pytest.mark.parametrize("seed", range(6))
+def test_replay_matches_inventory(method, seed):
+    quantities, prices, fringe_costs = _sequence(seed)
+    costs, ending_quantity, ending_value = _inventory_costs(method, quantities, prices, fringe_costs)
+
+    result = valuation.replay(quantities, prices, method, fringe_costs, initial_quantity=20, initial_price=100)
+    assert result.costs == pytest.approx(costs, rel=1e-9, abs=1e-6)
+    assert result.total_cost == pytest.approx(sum(costs), rel=1e-9)
+    assert result.ending_quantity == ending_quantity
+    assert result.ending_value == pytest.approx(ending_value, rel=1e-9, abs=1e-6)
+    sold = -np.asarray([quantity for quantity in quantities if quantity < 0])
+    assert result.unit_costs == pytest.approx(np.asarray(costs) / sold, rel=1e-9, abs=1e-9)
+
+
+def test_replay_rejects_shortage():
+    with pytest.raises(ValueError):
+        valuation.replay([5, -10], [100, 0], "FIFO")
+    with pytest.raises(ValueError):
+        valuation.replay([5], [100, 0], "MAM")
+    with pytest.raises(ValueError):
+        valuation.replay([5], [100], "LIFO")
+
+
+def test_compare_returns_every_method():
+    results = valuation.compare([10, -4, 10, -8], [100, 0, 200, 0])
+    assert set(results) == set(valuation.METHODS)
+    assert results["FIFO"].total_cost == 4 * 100 + 6 * 100 + 2 * 200